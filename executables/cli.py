@@ -7,6 +7,7 @@ import struct
 import time
 import os
 
+from graphmassivizer.core.dataflow import codec_benchmark
 from graphmassivizer.infrastructure.simulation.lifecycle import Simulation
 from graphmassivizer.runtime.task_manager import main as task_manager_main
 from graphmassivizer.runtime.workload_manager import main as workload_manager_main
@@ -99,6 +100,13 @@ def wf():
 def wf_start():
 	start_workflow_manager()
 
+@main.command(name="benchmark-codecs")
+@click.argument("edgelists", nargs=-1, required=True)
+@click.option("--repeat", default=3, help="Runs per measurement, the fastest is reported.")
+def benchmark_codecs(edgelists, repeat):
+	"""Compare the compression codecs of persisted objects on edge list graphs."""
+	codec_benchmark.main([*edgelists, "--repeat", str(repeat)])
+
 @main.command()
 def simulate():
 	try: run_simulation()
@@ -1,20 +1,81 @@
 import requests
 import json
+import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# responses worth retrying: rate limited, or the server (or a proxy in front of it) is temporarily unavailable
+RETRY_STATUSES = (429, 502, 503, 504)
+
+def createSession(retries=3,backoff=0.5,poolSize=10):
+	"""A requests.Session keeping up to poolSize connections per host alive, shared by the connectors of one server.
+
+	Failed connections and RETRY_STATUSES responses are retried up to retries times, after backoff * 2^n seconds
+	(or the Retry-After the server asks for), POSTs included. A request that timed out or lost its connection
+	after it was sent is not retried, the server may still be running the query.
+	"""
+	retry = Retry(total=retries,read=0,other=0,backoff_factor=backoff,status_forcelist=RETRY_STATUSES,allowed_methods=None,raise_on_status=False)
+	adapter = HTTPAdapter(pool_connections=poolSize,pool_maxsize=poolSize,max_retries=retry)
+	session = requests.Session()
+	session.mount("http://",adapter)
+	session.mount("https://",adapter)
+	return session
 
 class GraphDatabaseConnector:
 
-	def __init__(self,endpoint):
+	def __init__(self,endpoint,session=None,timeout=(5,300)):
+		"""
+		:param session: session to send the requests with, e.g. shared with the other endpoints of the server. A new one if None.
+		:param timeout: (connect, read) timeout in seconds of every request to this endpoint.
+		"""
 		self.endpoint = endpoint
+		self.ownsSession = session is None
+		self.session = createSession() if session is None else session
+		self.timeout = timeout
 
 	def curl(self,headers=None,data=None,checkInterval=10,timeout=6000000):
+		"""Sends the query and returns the body of the result.
+
+		Long queries are polled until they finish, for at most timeout seconds: a 202 Accepted with a Location
+		header is polled at that location, a 204 No Content by sending the query again. The interval between
+		polls doubles from one second up to checkInterval.
+
+		:raises requests.HTTPError: if the query failed, after retries.
+		:raises TimeoutError: if the result was not ready within timeout seconds.
+		"""
+		return self.__request(headers,data,checkInterval,timeout).content
 
-		with requests.post(self.endpoint, headers=headers, data=data) as response:
+	def stream(self,headers=None,data=None,checkInterval=10,timeout=6000000):
+		"""Like curl, but returns the response once its headers arrived. Its body is read as it is downloaded,
+		e.g. from response.raw, and the response must be closed (it is a context manager)."""
+		response = self.__request(headers,data,checkInterval,timeout,stream=True)
+		# transparently decompress a gzip or deflate body
+		response.raw.decode_content = True
+		return response
 
-			timer = 0
-			while response.status_code == 204: # adding hacky wait loop for long processes
-				time.sleep(checkInterval)
-				timer += checkInterval
-				if timer > timeout: break
-				if response.status_code == 200: break
+	def __request(self,headers,data,checkInterval,timeout,stream=False):
+		deadline = time.monotonic() + timeout
+		interval = min(1,checkInterval)
+		pollUrl = None
+		response = self.session.post(self.endpoint,headers=headers,data=data,timeout=self.timeout,stream=stream)
+		while response.status_code in (202,204):
+			# releases the connection of a streamed response
+			response.close()
+			if response.status_code == 202 and "Location" in response.headers:
+				pollUrl = requests.compat.urljoin(response.url,response.headers["Location"])
+			if time.monotonic() + interval > deadline:
+				raise TimeoutError(f"No result from {self.endpoint} within {timeout} seconds")
+			time.sleep(interval)
+			interval = min(interval * 2,checkInterval)
+			if pollUrl is not None:
+				response = self.session.get(pollUrl,headers=headers,timeout=self.timeout,stream=stream)
+			else:
+				response = self.session.post(self.endpoint,headers=headers,data=data,timeout=self.timeout,stream=stream)
+		if not response.ok:
+			response.close()
+		response.raise_for_status()
+		return response
 
-			return response.content
+	def close(self):
+		if self.ownsSession:
+			self.session.close()
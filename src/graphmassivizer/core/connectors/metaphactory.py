@@ -1,14 +1,28 @@
+import asyncio
 import re
-from graphmassivizer.core.connectors.graphDatabaseConnector import GraphDatabaseConnector
+import weakref
+from graphmassivizer.core.connectors.graphDatabaseConnector import GraphDatabaseConnector, createSession
+from graphmassivizer.core.dataflow.csr_graph import CSRGraph
+from graphmassivizer.core.dataflow.csv_ingest import read_edge_csv
 
 class MetaphactoryConnector:
 
 	coauthor = "/rest/qaas/coauthorGraphQuery"
 	workflow = "/rest/qaas/workflowQuery"
 
-	def __init__(self,metaphactoryAddress="http://localhost:10214/"):
+	def __init__(self,metaphactoryAddress="http://localhost:10214/",timeouts=None,poolSize=10):
+		"""
+		:param timeouts: (connect, read) timeout in seconds per endpoint path, e.g. {MetaphactoryConnector.coauthor: (5, 600)}.
+		:param poolSize: connections kept alive, at least the number of queries run concurrently.
+		"""
 		self.metaphactoryAddress = metaphactoryAddress
-		self.endpoints = {self.coauthor:GraphDatabaseConnector(self.metaphactoryAddress+self.coauthor),self.workflow:GraphDatabaseConnector(self.metaphactoryAddress+self.workflow)}
+		# one pool of kept-alive connections for all endpoints, so that repeated queries skip the TCP/TLS setup
+		self.session = createSession(poolSize=poolSize)
+		timeouts = timeouts or {}
+		self.endpoints = {endpoint:GraphDatabaseConnector(self.metaphactoryAddress+endpoint,self.session,timeouts.get(endpoint,(5,300))) for endpoint in (self.coauthor,self.workflow)}
+
+	def close(self):
+		self.session.close()
 
 	def workflowQuery(self,IRI):
 		headers = {
@@ -22,6 +36,14 @@ class MetaphactoryConnector:
 		return self.endpoints[self.workflow].curl(headers,data)
 
 	def coauthorQuery(self,topic,author):
+		return self.endpoints[self.coauthor].curl(*self.__coauthorRequest(topic,author))
+
+	def coauthorGraph(self,topic,author) -> CSRGraph:
+		"""The coauthor graph, parsed from the CSV result while it is downloaded."""
+		with self.endpoints[self.coauthor].stream(*self.__coauthorRequest(topic,author)) as response:
+			return read_edge_csv(response.raw)
+
+	def __coauthorRequest(self,topic,author):
 		headers = {
 			'Accept': 'text/csv',
 			'Content-Type': 'application/x-www-form-urlencoded',
@@ -32,4 +54,81 @@ class MetaphactoryConnector:
 			'inputAuthor': author,
 		}
 
-		return self.endpoints[self.coauthor].curl(headers,data)
+		return headers,data
+
+
+class AsyncMetaphactoryConnector:
+	"""Asyncio variant of MetaphactoryConnector, whose queries run concurrently instead of one after the other.
+
+	Each query runs on a worker thread over the pooled connections of the underlying MetaphactoryConnector,
+	at most concurrency of them at a time per event loop. A query whose caller is cancelled counts against the
+	limit until its thread finished.
+	"""
+
+	def __init__(self,metaphactoryAddress="http://localhost:10214/",concurrency=8,timeouts=None,connector=None):
+		"""
+		:param connector: MetaphactoryConnector to send the queries with, a new one if None.
+		"""
+		self.connector = connector or MetaphactoryConnector(metaphactoryAddress,timeouts,poolSize=concurrency)
+		self.concurrency = concurrency
+		# a semaphore belongs to the loop it is first used in
+		self.limits = weakref.WeakKeyDictionary()
+
+	async def __query(self,query,*args):
+		loop = asyncio.get_running_loop()
+		if loop not in self.limits:
+			self.limits[loop] = asyncio.Semaphore(self.concurrency)
+		limit = self.limits[loop]
+		await limit.acquire()
+		try:
+			future = asyncio.ensure_future(asyncio.to_thread(query,*args))
+		except BaseException:
+			limit.release()
+			raise
+		# a cancelled caller does not stop the worker thread, which keeps its connection busy, the slot is freed with the thread
+		future.add_done_callback(lambda done: self.__release(limit,done))
+		return await asyncio.shield(future)
+
+	@staticmethod
+	def __release(limit,future):
+		limit.release()
+		# retrieves the error of a query nobody waits for anymore, so that it is not logged as unhandled
+		if not future.cancelled():
+			future.exception()
+
+	async def workflowQuery(self,IRI):
+		return await self.__query(self.connector.workflowQuery,IRI)
+
+	async def coauthorQuery(self,topic,author):
+		return await self.__query(self.connector.coauthorQuery,topic,author)
+
+	async def coauthorGraph(self,topic,author):
+		return await self.__query(self.connector.coauthorGraph,topic,author)
+
+	async def workflowAndCoauthorQuery(self,IRI,topic,author):
+		"""The results of the workflow and the coauthor graph query, sent concurrently."""
+		return await asyncio.gather(self.workflowQuery(IRI),self.coauthorQuery(topic,author))
+
+	async def workflowAndCoauthorGraph(self,IRI,topic,author):
+		"""The result of the workflow query and the parsed coauthor graph, queried concurrently."""
+		return await asyncio.gather(self.workflowQuery(IRI),self.coauthorGraph(topic,author))
+
+	async def coauthorQueries(self,queries):
+		"""Runs the coauthor query of every (topic, author) in queries and yields ((topic, author), result) as they complete.
+
+		Queries not started yet when the consumer stops iterating are cancelled. Running ones finish on their worker
+		thread and hold their slot of the concurrency limit until then.
+		"""
+		async def query(topic,author):
+			return (topic,author),await self.coauthorQuery(topic,author)
+
+		tasks = [asyncio.ensure_future(query(topic,author)) for topic,author in queries]
+		try:
+			for completed in asyncio.as_completed(tasks):
+				yield await completed
+		finally:
+			for task in tasks:
+				task.cancel()
+
+	def close(self):
+		self.connector.close()
@@ -1,23 +1,103 @@
-from graphmassivizer.core.dataflow.graph_wrapper import GraphWrapper
+from graphmassivizer.core.dataflow.execution_plan import PlanStep
+from graphmassivizer.core.dataflow.graph_wrapper import GraphDelta, GraphWrapper
+from graphmassivizer.core.dataflow.object_wrapper import ObjectWrapper
 from abc import ABC, abstractmethod
 import networkx as nx
 
 class BGO:
+    # Identifies the implementation, e.g. in result cache keys. Defaults to the class name if not set.
+    implementationId = None
+    # Whether process_delta can update the result for a previous version of the input instead of recomputing it.
+    supports_delta = False
+    # Whether process_graphs can combine several inputs, i.e. the BGO can consume the outputs of several workflow steps.
+    supports_multiple_inputs = False
+
     def execute(self, data_manager, object_handle, dry_run=False):
-        """Execute some transformation on the graph and return a new GraphWrapper."""
+        """Execute some transformation on the graph and return the handle of the result.
+
+        ``object_handle`` may be a list of handles if ``supports_multiple_inputs`` is set, the result is
+        stored below the first of them. With ``dry_run`` nothing is executed, only the handle is returned
+        (see plan for a description of the execution).
+        """
+        if dry_run:
+            return self.get_output_handle(object_handle)
+
+        if isinstance(object_handle, list):
+            if not self.supports_multiple_inputs:
+                raise ValueError(f"{type(self).__name__} does not support multiple inputs")
+            output_handle = self.get_output_handle(object_handle)
+            new_graph = self.process_graphs([data_manager.load_object(handle).get_object() for handle in object_handle])
+            data_manager.persist_object(ObjectWrapper(new_graph, output_handle))
+            return output_handle
+
         output_handle = object_handle.get_outcome_paths(self)
+        # TODO: listen to Zk if the data is available.
+        # TODO: When available, execute the code below.
+        input_graph = data_manager.load_object(object_handle).get_object()
+        new_graph = self.process_graph(input_graph)
+        data_manager.persist_object(ObjectWrapper(new_graph, output_handle))
+        return output_handle
+
+    def execute_delta(self, data_manager, object_handle, previous_output, delta: GraphDelta):
+        """Execute on a new version of a graph, given the result for its parent version and the delta between them.
 
-        if not dry_run:
-            # TODO: listen to Zk if the data is available.
-            # TODO: When available, execute the code below.
-            input_graph = data_manager.load_object(object_handle)
+        The result is persisted with its own delta against ``previous_output``, so steps consuming it can
+        be updated incrementally as well.
+        """
+        output_handle = object_handle.get_outcome_paths(self)
+        previous_graph = data_manager.load_object(previous_output).get_object()
+        previous_version = data_manager.get_metadata(previous_output)
+        input_graph = data_manager.load_object(object_handle).get_object()
+        new_graph = self.process_delta(input_graph, previous_graph, delta)
+        if new_graph is None:
             new_graph = self.process_graph(input_graph)
-            data_manager.persist_object(GraphWrapper(new_graph, output_handle))
-        else:
-            print("BGO({}) -> {}".format())
 
+        if isinstance(new_graph, nx.Graph) and not new_graph.is_multigraph():
+            new_graph = GraphWrapper(new_graph, previous_version.version + 1, previous_version.graph_id,
+                                     GraphDelta.between(previous_graph, new_graph))
+        data_manager.persist_object(ObjectWrapper(new_graph, output_handle))
         return output_handle
 
+    def get_output_handle(self, object_handle):
+        """Handle the result of executing on ``object_handle`` (or the first of a list of handles) is stored under."""
+        if isinstance(object_handle, list):
+            object_handle = object_handle[0]
+        return object_handle.get_outcome_paths(self)
+
+    def plan(self, data_manager, object_handle, estimator=None, input_bytes=None, cached=False) -> PlanStep:
+        """Describe the execution on ``object_handle`` (or a list of handles) without running it.
+
+        :param estimator: called as ``estimator(implementationId, input_bytes)``, returns the estimated runtime in
+            seconds and peak memory in bytes (either may be None), e.g. Optimizer_1.estimate.
+        :param input_bytes: expected (total) size of the input if it is not stored yet, stored inputs use their actual size.
+        """
+        implementation_id = self.implementationId or type(self).__name__
+        handles = object_handle if isinstance(object_handle, list) else [object_handle]
+        if all(data_manager.exists(handle) for handle in handles):
+            input_bytes = sum(data_manager.get_object_size(handle) for handle in handles)
+        runtime, memory = estimator(implementation_id, input_bytes) if estimator is not None else (None, None)
+        return PlanStep(implementation_id, implementation_id, object_handle, self.get_output_handle(object_handle),
+                        input_bytes, runtime, memory, cached)
+
+    def get_args(self) -> dict:
+        """Arguments the result depends on besides the input graph."""
+        return {}
+
     @abstractmethod
     def process_graph(self, graph) -> nx.Graph:
         pass
+
+    def process_graphs(self, graphs: list) -> nx.Graph:
+        """Combine the outputs of several steps, in the order of the step's dependencies.
+
+        Only called if ``supports_multiple_inputs`` is set.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support multiple inputs")
+
+    def process_delta(self, graph, previous_result, delta: GraphDelta):
+        """Update ``previous_result`` (computed on the parent version of ``graph``) to ``graph``.
+
+        Only called if ``supports_delta`` is set. Must not modify ``previous_result``, returns None if
+        the result has to be recomputed with process_graph, e.g. because the delta is too large.
+        """
+        return None
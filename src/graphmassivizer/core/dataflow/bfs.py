@@ -0,0 +1,65 @@
+from collections import deque
+
+import networkx as nx
+
+from graphmassivizer.core.dataflow.BGO import BGO
+from graphmassivizer.core.dataflow.graph_wrapper import GraphDelta
+
+
+class DepthLimitedBFS(BGO):
+    """Hop distances from ``source`` up to ``depth_limit``.
+
+    The result is a graph of the reached nodes, each with its distance as "depth" attribute. Unlike a
+    BFS tree it does not depend on the traversal order, so it can be updated for a new version of the input:
+    added edges can only shorten distances, which is propagated from their endpoints. Removing an edge
+    that lies on no shortest path changes nothing, removing one that may (its endpoints are one level
+    apart) falls back to a full traversal.
+    """
+    implementationId = "DepthLimitedBFS"
+    supports_delta = True
+
+    def __init__(self, source, depth_limit=None):
+        self.source = source
+        self.depth_limit = depth_limit
+
+    def get_args(self) -> dict:
+        return {"source": self.source, "depth_limit": self.depth_limit}
+
+    def process_graph(self, graph) -> nx.Graph:
+        depths = nx.single_source_shortest_path_length(graph, self.source, cutoff=self.depth_limit)
+        return self.__result(depths)
+
+    def process_delta(self, graph, previous_result, delta: GraphDelta):
+        depths = {node: data["depth"] for node, data in previous_result.nodes(data=True)}
+        if depths.get(self.source) != 0:
+            return None
+
+        def directions(u, v):
+            return ((u, v),) if graph.is_directed() else ((u, v), (v, u))
+
+        for u, v in delta.get_removed_edges():
+            for a, b in directions(u, v):
+                if a in depths and depths.get(b) == depths[a] + 1:
+                    return None
+
+        queue = deque()
+
+        def relax(a, b):
+            if a in depths and (self.depth_limit is None or depths[a] < self.depth_limit) \
+                    and depths[a] + 1 < depths.get(b, float("inf")):
+                depths[b] = depths[a] + 1
+                queue.append(b)
+
+        for u, v, _ in delta.get_added_edges():
+            for a, b in directions(u, v):
+                relax(a, b)
+        while queue:
+            a = queue.popleft()
+            for b in graph.adj[a]:
+                relax(a, b)
+        return self.__result(depths)
+
+    def __result(self, depths) -> nx.Graph:
+        result = nx.Graph()
+        result.add_nodes_from((node, {"depth": depth}) for node, depth in depths.items())
+        return result
@@ -0,0 +1,123 @@
+"""Compression ratio, encode and decode speed of the persistence codecs on graphs.
+
+Both persisted layouts are measured: columnar Arrow tables (with compressed IPC buffers) and
+compressed pickle streams. The results can be turned into CodecProfiles for a CodecPolicy::
+
+    python -m graphmassivizer.core.dataflow.codec_benchmark tests/resources/subgraph.edgelist
+"""
+import argparse
+import os
+import pickle
+import time
+
+import networkx as nx
+import pyarrow as pa
+
+from graphmassivizer.core.dataflow.codecs import CODECS, CodecProfile, ipc_write_options
+from graphmassivizer.core.dataflow.graph_format import ArrowGraphFormat
+
+
+def _best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _encode_tables(tables, codec):
+    encoded = []
+    for table in tables:
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_file(sink, table.schema, options=ipc_write_options(codec)) as writer:
+            writer.write_table(table)
+        encoded.append(sink.getvalue())
+    return encoded
+
+
+def _decode_tables(buffers):
+    return [pa.ipc.open_file(buffer).read_all() for buffer in buffers]
+
+
+def _encode_pickle(data, codec):
+    sink = pa.BufferOutputStream()
+    stream = sink if codec == "none" else pa.CompressedOutputStream(sink, codec)
+    stream.write(data)
+    if stream is not sink:
+        stream.close()  # flushes the compressed frame into the sink
+    return [sink.getvalue()]
+
+
+def _decode_pickle(buffers, codec):
+    source = pa.BufferReader(buffers[0])
+    return (source if codec == "none" else pa.CompressedInputStream(source, codec)).read()
+
+
+def benchmark(graph: nx.Graph, name="graph", codecs=None, repeat=3) -> list:
+    """One result row per layout and codec: sizes in bytes, speeds in raw MB per second."""
+    codecs = [codec for codec in (codecs or CODECS) if codec == "none" or pa.Codec.is_available(codec)]
+    payloads = {
+        "columnar": (ArrowGraphFormat.to_tables(graph), _encode_tables, lambda buffers, codec: _decode_tables(buffers)),
+        "pickle": (pickle.dumps(graph), _encode_pickle, _decode_pickle),
+    }
+    rows = []
+    for layout, (payload, encode, decode) in payloads.items():
+        raw_bytes = sum(buffer.size for buffer in encode(payload, "none"))
+        for codec in codecs:
+            encode_time, buffers = _best_time(lambda: encode(payload, codec), repeat)
+            decode_time, _ = _best_time(lambda: decode(buffers, codec), repeat)
+            size = sum(buffer.size for buffer in buffers)
+            rows.append({
+                "graph": name, "layout": layout, "codec": codec, "raw_bytes": raw_bytes, "bytes": size,
+                "ratio": size / raw_bytes, "encode_mb_s": raw_bytes / encode_time / 1e6,
+                "decode_mb_s": raw_bytes / decode_time / 1e6,
+            })
+    return rows
+
+
+def profiles(rows, layout="columnar") -> dict:
+    """Average CodecProfiles over the benchmarked graphs, net of the cost of the uncompressed layout."""
+    profiles = {}
+    for codec in {row["codec"] for row in rows if row["layout"] == layout}:
+        ratios, encode_times, decode_times, sizes = [], [], [], []
+        for row in rows:
+            if row["layout"] != layout or row["codec"] != codec:
+                continue
+            baseline = next(r for r in rows if r["graph"] == row["graph"] and r["layout"] == layout and r["codec"] == "none")
+            mb = row["raw_bytes"] / 1e6
+            ratios.append(row["ratio"])
+            sizes.append(row["raw_bytes"])
+            encode_times.append(max(mb / row["encode_mb_s"] - mb / baseline["encode_mb_s"], 0.0))
+            decode_times.append(max(mb / row["decode_mb_s"] - mb / baseline["decode_mb_s"], 0.0))
+
+        def speed(times):
+            return sum(sizes) / sum(times) if sum(times) > 0 else float("inf")
+
+        profiles[codec] = CodecProfile(sum(ratios) / len(ratios), speed(encode_times), speed(decode_times))
+    return profiles
+
+
+def format_rows(rows) -> str:
+    lines = [f"{'graph':<24} {'layout':<9} {'codec':<5} {'raw MB':>8} {'MB':>8} {'ratio':>6} {'enc MB/s':>9} {'dec MB/s':>9}"]
+    for row in rows:
+        lines.append(f"{row['graph'][:24]:<24} {row['layout']:<9} {row['codec']:<5} {row['raw_bytes'] / 1e6:>8.2f} "
+                     f"{row['bytes'] / 1e6:>8.2f} {row['ratio']:>6.3f} {row['encode_mb_s']:>9.1f} {row['decode_mb_s']:>9.1f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("edgelists", nargs="+", help="graphs in NetworkX edge list format, e.g. coauthor graphs")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, the fastest is reported")
+    args = parser.parse_args(argv)
+
+    rows = []
+    for path in args.edgelists:
+        rows.extend(benchmark(nx.read_edgelist(path), os.path.basename(path), repeat=args.repeat))
+    print(format_rows(rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import math
+
+import pyarrow as pa
+
+CODECS = ("none", "lz4", "zstd")
+# suffix of compressed pickles
+EXTENSIONS = {"none": "", "lz4": ".lz4", "zstd": ".zst"}
+
+
+class CodecProfile:
+    def __init__(self, ratio: float, encode_speed: float, decode_speed: float):
+        """Performance of a codec on persisted objects.
+        :param ratio: compressed size divided by the raw size.
+        :param encode_speed: raw bytes compressed per second.
+        :param decode_speed: raw bytes decompressed per second.
+        """
+        self.ratio = ratio
+        self.encode_speed = encode_speed
+        self.decode_speed = decode_speed
+
+
+# Ballpark figures for coauthor graph tables on one core, measure the actual ones with codec_benchmark.
+DEFAULT_PROFILES = {
+    "none": CodecProfile(1.0, math.inf, math.inf),
+    "lz4": CodecProfile(0.55, 600e6, 2000e6),
+    "zstd": CodecProfile(0.4, 200e6, 700e6),
+}
+
+
+class CodecPolicy:
+    """Selects the compression codec of objects persisted by a DataManager.
+
+    ``codecs`` maps object classes (or class names) to a codec, e.g. ``{nx.Graph: "lz4", "dict": "none"}``,
+    subclasses inherit the codec of their base class. For other objects the codec is ``default``, unless
+    the ``bandwidth`` to the store (bytes per second) is given: then the codec with the lowest estimated
+    time to compress, transfer (write and read back) and decompress an object is used.
+    """
+
+    def __init__(self, codecs=None, default="none", bandwidth=None, profiles=None):
+        self.codecs = dict(codecs or {})
+        self.default = default
+        self.bandwidth = bandwidth
+        self.profiles = dict(DEFAULT_PROFILES if profiles is None else profiles)
+        for codec in [default, *self.codecs.values(), *self.profiles]:
+            check_codec(codec)
+
+    def choose(self, obj) -> str:
+        for cls in type(obj).__mro__:
+            for key in (cls, cls.__name__):
+                if key in self.codecs:
+                    return self.codecs[key]
+        if self.bandwidth is None:
+            return self.default
+        return min(self.profiles, key=lambda codec: self.estimate_time(codec, 1 << 20))
+
+    def estimate_time(self, codec: str, size: int) -> float:
+        """Estimated seconds to compress, write, read and decompress ``size`` raw bytes."""
+        profile = self.profiles[codec]
+        return size / profile.encode_speed + 2 * size * profile.ratio / self.bandwidth + size / profile.decode_speed
+
+
+def check_codec(codec: str) -> str:
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec '{codec}', expected one of {CODECS}")
+    if codec != "none" and not pa.Codec.is_available(codec):
+        raise ValueError(f"Codec '{codec}' is not available in this pyarrow build")
+    return codec
+
+
+def ipc_write_options(codec: str) -> pa.ipc.IpcWriteOptions:
+    """Options for Arrow IPC files whose buffers are compressed with ``codec``."""
+    return pa.ipc.IpcWriteOptions(compression=None if codec == "none" else check_codec(codec))
+
+
+def open_output_stream(fs, path: str, codec: str):
+    """Stream writing ``path`` through ``codec``, see open_input_stream."""
+    sink = fs.open_output_stream(path)
+    return sink if codec == "none" else pa.CompressedOutputStream(sink, check_codec(codec))
+
+
+def open_input_stream(fs, path: str, codec: str):
+    source = fs.open_input_stream(path)
+    return source if codec == "none" else pa.CompressedInputStream(source, check_codec(codec))
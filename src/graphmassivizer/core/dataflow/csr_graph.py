@@ -0,0 +1,175 @@
+import networkx as nx
+import numpy as np
+import pyarrow as pa
+
+INT32_MAX = np.iinfo(np.int32).max
+# node labels that an Arrow array stores and gives back unchanged
+LABEL_TYPES = (str, int, float, bytes)
+
+
+class CSRGraph:
+    """Immutable graph in compressed sparse row layout.
+
+    The neighbours of node ``i`` are ``indices[offsets[i]:offsets[i + 1]]``, with the matching
+    ``weights`` if the graph is weighted. Undirected edges are stored in both directions (self
+    loops once), like in the NetworkX adjacency. Nodes are identified by their position; the
+    original labels are kept in a compact Arrow array.
+
+    Offsets and indices are int32, which costs 4 bytes per stored edge (plus 8 for a weight)
+    instead of the hundreds of bytes of a NetworkX dict-of-dicts.
+    """
+
+    def __init__(self, offsets, indices, weights=None, labels=None, directed=False, weight_attribute="weight"):
+        self.offsets = np.ascontiguousarray(offsets, dtype=np.int32)
+        self.indices = np.ascontiguousarray(indices, dtype=np.int32)
+        self.weights = None if weights is None else np.ascontiguousarray(weights, dtype=np.float64)
+        self.labels = None if labels is None else (labels if isinstance(labels, pa.Array) else pa.array(labels))
+        self.directed = directed
+        self.weight_attribute = weight_attribute
+        self.__label_index = None
+
+        if len(self.offsets) == 0 or self.offsets[0] != 0 or self.offsets[-1] != len(self.indices):
+            raise ValueError("offsets must start at 0 and end at the number of stored edges")
+        if self.weights is not None and len(self.weights) != len(self.indices):
+            raise ValueError("weights and indices must have the same length")
+        if self.labels is not None and len(self.labels) != self.number_of_nodes():
+            raise ValueError("there must be exactly one label per node")
+
+    @staticmethod
+    def from_edge_arrays(sources, targets, num_nodes, weights=None, labels=None, directed=False,
+                         weight_attribute="weight") -> 'CSRGraph':
+        """Build a CSR graph from edge lists of node positions in ``[0, num_nodes)``.
+
+        :raises ValueError: if a position is outside of that range.
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        for ends in (sources, targets):
+            if len(ends) and (ends.min() < 0 or ends.max() >= num_nodes):
+                raise ValueError(f"Edge ends must be node positions in [0, {num_nodes}), "
+                                 f"got [{ends.min()}, {ends.max()}]")
+        weights = None if weights is None else np.asarray(weights, dtype=np.float64)
+        if not directed:
+            loops = sources == targets
+            sources, targets = np.concatenate([sources, targets[~loops]]), np.concatenate([targets, sources[~loops]])
+            if weights is not None:
+                weights = np.concatenate([weights, weights[~loops]])
+        CSRGraph.__check_size(num_nodes, len(sources))
+
+        order = np.argsort(sources, kind="stable")
+        offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=num_nodes), out=offsets[1:])
+        return CSRGraph(offsets, targets[order], None if weights is None else weights[order], labels, directed,
+                        weight_attribute)
+
+    @staticmethod
+    def from_networkx(graph: nx.Graph, weight=None) -> 'CSRGraph':
+        """Convert a (non multi-) graph, keeping the edge attribute ``weight`` (missing weights become 1.0).
+
+        :raises ValueError: if the node labels are not all of one of the LABEL_TYPES, e.g. the tuples of
+            ``nx.grid_2d_graph``. Such graphs can be relabeled with ``nx.convert_node_labels_to_integers``.
+        """
+        if graph.is_multigraph():
+            raise ValueError("Multigraphs cannot be converted to a CSRGraph")
+        labels = list(graph.nodes)
+        label_types = {type(label) for label in labels}
+        if len(label_types) > 1 or not label_types <= set(LABEL_TYPES):
+            raise ValueError(f"CSRGraph labels must all be of one of the types {[t.__name__ for t in LABEL_TYPES]}, "
+                             f"got {sorted(t.__name__ for t in label_types)}")
+        position = {label: i for i, label in enumerate(labels)}
+        adjacency = graph.adj
+
+        degrees = np.fromiter((len(adjacency[u]) for u in labels), dtype=np.int64, count=len(labels))
+        CSRGraph.__check_size(len(labels), int(degrees.sum()))
+        offsets = np.zeros(len(labels) + 1, dtype=np.int64)
+        np.cumsum(degrees, out=offsets[1:])
+        indices = np.fromiter((position[v] for u in labels for v in adjacency[u]), dtype=np.int32, count=offsets[-1])
+        weights = None
+        if weight is not None:
+            weights = np.fromiter((data.get(weight, 1.0) for u in labels for data in adjacency[u].values()),
+                                  dtype=np.float64, count=offsets[-1])
+        try:
+            labels = pa.array(labels)
+        except (OverflowError, pa.ArrowException) as e:
+            raise ValueError(f"The node labels cannot be stored in a CSRGraph: {e}") from e
+        return CSRGraph(offsets, indices, weights, labels, graph.is_directed(), weight or "weight")
+
+    def to_networkx(self) -> nx.Graph:
+        graph = nx.DiGraph() if self.directed else nx.Graph()
+        labels = self.get_labels()
+        graph.add_nodes_from(labels)
+        sources = np.repeat(np.arange(self.number_of_nodes()), self.degree())
+        edges = zip((labels[i] for i in sources.tolist()), (labels[i] for i in self.indices.tolist()))
+        if self.weights is None:
+            graph.add_edges_from(edges)
+        else:
+            graph.add_weighted_edges_from(((u, v, w) for (u, v), w in zip(edges, self.weights.tolist())),
+                                          weight=self.weight_attribute)
+        return graph
+
+    def get_labels(self) -> list:
+        """Node labels by position, the positions themselves for unlabeled graphs."""
+        return list(range(self.number_of_nodes())) if self.labels is None else self.labels.to_pylist()
+
+    def index_of(self, label) -> int:
+        """Position of the node with the given label."""
+        if self.labels is None:
+            return label
+        if self.__label_index is None:
+            self.__label_index = {value: i for i, value in enumerate(self.labels.to_pylist())}
+        return self.__label_index[label]
+
+    def number_of_nodes(self) -> int:
+        return len(self.offsets) - 1
+
+    def number_of_edges(self) -> int:
+        if self.directed:
+            return len(self.indices)
+        loops = int(np.count_nonzero(self.indices == self.sources()))
+        return (len(self.indices) + loops) // 2
+
+    def is_directed(self) -> bool:
+        return self.directed
+
+    def degree(self) -> np.ndarray:
+        """(Out-)degree of every node."""
+        return np.diff(self.offsets)
+
+    def sources(self) -> np.ndarray:
+        """Source position of every stored edge, aligned with ``indices``."""
+        return np.repeat(np.arange(self.number_of_nodes(), dtype=np.int32), self.degree())
+
+    def neighbors(self, node: int) -> np.ndarray:
+        return self.indices[self.offsets[node]:self.offsets[node + 1]]
+
+    def bfs_levels(self, source: int, depth_limit=None) -> np.ndarray:
+        """Hop distance of every node from ``source`` (-1 if unreachable within ``depth_limit``)."""
+        levels = np.full(self.number_of_nodes(), -1, dtype=np.int32)
+        levels[source] = 0
+        frontier = np.array([source], dtype=np.int32)
+        depth = 0
+        while len(frontier) and (depth_limit is None or depth < depth_limit):
+            starts = self.offsets[frontier].astype(np.int64)
+            counts = self.offsets[frontier + 1] - starts
+            # positions of all adjacency entries of the frontier, without a Python level loop
+            entries = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            reached = np.unique(self.indices[entries])
+            frontier = reached[levels[reached] < 0]
+            depth += 1
+            levels[frontier] = depth
+        return levels
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the arrays of the graph."""
+        size = self.offsets.nbytes + self.indices.nbytes
+        if self.weights is not None:
+            size += self.weights.nbytes
+        if self.labels is not None:
+            size += self.labels.nbytes
+        return size
+
+    @staticmethod
+    def __check_size(num_nodes, num_entries):
+        if num_nodes + 1 > INT32_MAX or num_entries > INT32_MAX:
+            raise ValueError("Graph is too large for int32 offsets and indices")
@@ -0,0 +1,92 @@
+import csv
+import io
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+from graphmassivizer.core.dataflow.csr_graph import CSRGraph
+
+
+class _ChunkStream(io.RawIOBase):
+    """Readable stream over an iterator of byte chunks, e.g. ``Response.iter_content``."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self.buffer:
+            self.buffer = next(self.chunks, None)
+            if self.buffer is None:
+                self.buffer = b""
+                return 0
+        n = min(len(b), len(self.buffer))
+        b[:n] = self.buffer[:n]
+        self.buffer = self.buffer[n:]
+        return n
+
+
+def read_edge_csv(source, directed=False, block_size=1 << 20) -> CSRGraph:
+    """Build a CSRGraph from a CSV edge list with a header row, e.g. ``author,coauthor``.
+
+    The first two columns are the labels of the source and target of each edge, further columns are
+    ignored. The CSV is parsed by pyarrow in blocks of ``block_size`` bytes while it is read, and each block
+    is turned into int32 node ids right away, so neither the whole text nor a graph of Python objects is held
+    in memory. Nodes are numbered as they are first seen, duplicate edges are stored once. A header without
+    rows, e.g. the result of a query without matches, is an empty graph.
+
+    :param source: a binary file-like object (e.g. the raw body of a streamed HTTP response), an iterator
+        of byte chunks, or bytes.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    if not hasattr(source, "read"):
+        source = io.BufferedReader(_ChunkStream(source))
+    elif not hasattr(source, "peek"):
+        # buffered to peek at the body, in chunks read from it: a urllib3 response closes itself at its end,
+        # which a BufferedReader directly around it reports as reading a closed file
+        raw = source
+        source = io.BufferedReader(_ChunkStream(iter(lambda: raw.read(block_size), b"")))
+
+    # the header is read here to know the columns, a stream cannot be rewound after pyarrow inferred them
+    names = next(csv.reader([source.readline().decode("utf-8-sig")]), [])
+    if len(names) < 2:
+        raise ValueError(f"Expected a header with at least two columns, got {names}")
+    # positional names, a header may repeat a name
+    names = [f"{i}" for i in range(len(names))]
+    if not source.peek(1):
+        # pyarrow rejects an empty body, a query without results is an empty graph
+        reader = []
+    else:
+        # node labels stay strings, even if they look like numbers
+        reader = pacsv.open_csv(source, read_options=pacsv.ReadOptions(block_size=block_size, column_names=names),
+                                convert_options=pacsv.ConvertOptions(column_types={name: pa.string() for name in names[:2]},
+                                                                     include_columns=names[:2]))
+
+    ids = {}
+    sources, targets = [], []
+    for batch in reader:
+        ends = pa.chunked_array([batch.column(0), batch.column(1)]).combine_chunks()
+        encoded = pc.dictionary_encode(ends)
+        # ids of this block's distinct labels, new labels are numbered on first appearance
+        block_ids = np.fromiter((ids.setdefault(label, len(ids)) for label in encoded.dictionary.to_pylist()),
+                                dtype=np.int64, count=len(encoded.dictionary))
+        edges = block_ids[encoded.indices.to_numpy(zero_copy_only=False)]
+        sources.append(edges[:batch.num_rows])
+        targets.append(edges[batch.num_rows:])
+
+    num_nodes = len(ids)
+    sources = np.concatenate(sources) if sources else np.empty(0, dtype=np.int64)
+    targets = np.concatenate(targets) if targets else np.empty(0, dtype=np.int64)
+    if not directed:
+        # an undirected edge listed in both directions is one edge
+        sources, targets = np.minimum(sources, targets), np.maximum(sources, targets)
+    keys = np.unique(sources * max(num_nodes, 1) + targets)
+    labels = pa.array(list(ids), type=pa.string())
+    return CSRGraph.from_edge_arrays(keys // max(num_nodes, 1), keys % max(num_nodes, 1), num_nodes,
+                                     labels=labels, directed=directed)
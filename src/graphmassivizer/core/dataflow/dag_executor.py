@@ -0,0 +1,165 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+import time
+
+
+def _run_step(step, input, dry_run):
+    # module level, so it can be sent to process pools
+    start = time.time()
+    started = time.perf_counter()
+    output = step.process(input, dry_run=dry_run)
+    return output, start, time.perf_counter() - started
+
+
+class StepTiming:
+    def __init__(self, start: float, duration: float):
+        """Wall clock start (epoch seconds) and duration (seconds) of a step."""
+        self.start = start
+        self.duration = duration
+
+    @property
+    def end(self) -> float:
+        return self.start + self.duration
+
+
+class ExecutionReport:
+    def __init__(self, steps, dependencies, outputs, timings, wall_time):
+        """Outputs and timings of a workflow execution, keyed by step."""
+        self.steps = steps
+        self.dependencies = dependencies
+        self.outputs = outputs
+        self.timings = timings
+        self.wall_time = wall_time
+        self.critical_path, self.critical_path_time = self.__critical_path()
+
+    def __critical_path(self):
+        # longest chain of dependent steps by accumulated duration; steps are topologically sorted
+        finish = {}
+        previous = {}
+        for step in self.steps:
+            predecessors = self.dependencies.get(step, [])
+            slowest = max(predecessors, key=lambda p: finish[p], default=None)
+            previous[step] = slowest
+            finish[step] = self.timings[step].duration + (finish[slowest] if slowest is not None else 0.0)
+        if not finish:
+            return [], 0.0
+        step = max(finish, key=finish.get)
+        total = finish[step]
+        path = []
+        while step is not None:
+            path.append(step)
+            step = previous[step]
+        return path[::-1], total
+
+    def summary(self) -> str:
+        lines = [f"{'step':<40} {'start':>9} {'duration':>9}"]
+        origin = min((timing.start for timing in self.timings.values()), default=0.0)
+        for step in sorted(self.steps, key=lambda s: self.timings[s].start):
+            timing = self.timings[step]
+            marker = " *" if step in self.critical_path else ""
+            lines.append(f"{step.name:<40} {timing.start - origin:>8.3f}s {timing.duration:>8.3f}s{marker}")
+        lines.append(f"wall time {self.wall_time:.3f}s, critical path (*) {self.critical_path_time:.3f}s")
+        return "\n".join(lines)
+
+
+class DAGExecutor:
+    """Runs workflow steps in dependency order on a thread or process pool.
+
+    A step is submitted as soon as all steps it depends on have finished, so independent
+    branches run concurrently. Steps without dependencies receive the workflow input, steps with
+    one dependency its output and steps with several dependencies the list of their outputs.
+
+    Unless ``use_processes`` is set, the output of a step is prefetched for its successors (see
+    DataManager.prefetch) as soon as it is finished, so its load overlaps with the steps that
+    still occupy the pool or that a successor waits for. Prefetched inputs that were not used
+    are released when the execution ends. With ``use_processes`` the steps (including their
+    DataManager and BGO) must be picklable.
+    """
+
+    def __init__(self, max_workers=None, use_processes=False):
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+
+    @staticmethod
+    def topological_order(steps, dependencies) -> list:
+        """Steps sorted so that every step comes after its dependencies, ties in the given order.
+
+        :raises ValueError: if a dependency is not one of the steps or the dependencies contain a cycle.
+        """
+        remaining = {step: len(dependencies.get(step, [])) for step in steps}
+        successors = DAGExecutor.__successors(steps, dependencies)
+        ready = [step for step in steps if remaining[step] == 0]
+        order = []
+        while ready:
+            step = ready.pop(0)
+            order.append(step)
+            for successor in successors[step]:
+                remaining[successor] -= 1
+                if remaining[successor] == 0:
+                    ready.append(successor)
+        if len(order) != len(steps):
+            raise ValueError("Workflow dependencies contain a cycle")
+        return order
+
+    def execute(self, steps, dependencies, input, dry_run=False) -> ExecutionReport:
+        order = self.topological_order(steps, dependencies)
+        successors = self.__successors(steps, dependencies)
+        remaining = {step: len(dependencies.get(step, [])) for step in steps}
+        outputs = {}
+        timings = {}
+
+        def step_input(step):
+            predecessors = dependencies.get(step, [])
+            if not predecessors:
+                return input
+            if len(predecessors) == 1:
+                return outputs[predecessors[0]]
+            return [outputs[p] for p in predecessors]
+
+        prefetch = not dry_run and not self.use_processes
+        prefetched = []
+
+        def submit(step):
+            running[pool.submit(_run_step, step, step_input(step), dry_run)] = step
+
+        pool_type = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        started = time.perf_counter()
+        running = {}
+        try:
+            with pool_type(max_workers=self.max_workers) as pool:
+                for step in order:
+                    if remaining[step] == 0:
+                        submit(step)
+                while running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        step = running.pop(future)
+                        try:
+                            output, start, duration = future.result()
+                        except BaseException:
+                            for pending in running:
+                                pending.cancel()
+                            raise
+                        outputs[step] = output
+                        timings[step] = StepTiming(start, duration)
+                        # the successors' loads overlap with the steps that are still running
+                        for successor in successors[step] if prefetch else []:
+                            successor.prefetch(output)
+                            prefetched.append((successor, output))
+                        for successor in successors[step]:
+                            remaining[successor] -= 1
+                            if remaining[successor] == 0:
+                                submit(successor)
+        finally:
+            for step, handle in prefetched:
+                step.release_prefetch(handle)
+        return ExecutionReport(order, dependencies, outputs, timings, time.perf_counter() - started)
+
+    @staticmethod
+    def __successors(steps, dependencies) -> dict:
+        successors = {step: [] for step in steps}
+        for step in steps:
+            for predecessor in dependencies.get(step, []):
+                if predecessor not in successors:
+                    raise ValueError(f"Step {step.name} depends on {predecessor.name}, which is not part of the workflow")
+                successors[predecessor].append(step)
+        return successors
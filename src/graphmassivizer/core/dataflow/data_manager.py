@@ -1,30 +1,332 @@
-from graphmassivizer.core.dataflow.object_wrapper import ObjectWrapper
+from graphmassivizer.core.dataflow.object_wrapper import LazyObjectWrapper, ObjectWrapper
 from graphmassivizer.core.dataflow.object_handle import ObjectHandle
+from graphmassivizer.core.dataflow.graph_format import ArrowGraphFormat, CSRGraphFormat
+from graphmassivizer.core.dataflow import codecs
+from graphmassivizer.core.dataflow.csr_graph import CSRGraph
+from graphmassivizer.core.dataflow.prefetcher import Prefetcher
+from graphmassivizer.core.dataflow.graph_wrapper import GraphMetadata, GraphWrapper
+import pyarrow as pa
+import pyarrow.fs as pafs
+import hashlib
 import pickle
 import os
+import uuid
 
 class DataManager:
-	def __init__(self, base_dir: str, fs):
+	HASH_FILE = "content.hash"
+	# version, parent and delta of graphs persisted from a GraphWrapper
+	LINEAGE_FILE = "lineage.pkl"
+	# content-addressed blobs, see put_blob
+	BLOB_DIR = "_blobs"
+	# objects are written here first and moved into place once complete, see persist_object
+	STAGING_DIR = "_staging"
+
+	def __init__(self, base_dir: str, fs, cache=None, prefetch_bytes=None, codec_policy: codecs.CodecPolicy = None):
+		"""
+		:param cache: optional TieredObjectCache that serves repeated loads from memory or a local disk copy.
+		:param prefetch_bytes: enables prefetch(), holding at most that many bytes of objects loaded ahead of use.
+		:param codec_policy: CodecPolicy choosing the compression of persisted objects, uncompressed if None.
+		"""
 		self.base_dir = base_dir
 		self.fs = fs
-		self.fs.create(base_dir)
+		self.cache = cache
+		self.codec_policy = codec_policy
+		self.prefetcher = None
+		if prefetch_bytes is not None:
+			self.prefetcher = Prefetcher(self.__load__, self.get_object_size, prefetch_bytes)
+		self.fs.create_dir(base_dir, recursive=True)
 
-	def __get_object_path__(self, object_handle: ObjectHandle):
+	def get_object_directory(self, object_handle: ObjectHandle, create=False):
+		"""Directory of the object's files in the store."""
 		directory = os.path.join(self.base_dir, object_handle.get_object_path())
-		os.makedirs(directory, exist_ok=True)
-		return os.path.join(directory, "object.pkl")
+		if create:
+			self.fs.create_dir(directory, recursive=True)
+		return directory
+
+	def __get_object_path__(self, object_handle: ObjectHandle, create=False, codec="none"):
+		return os.path.join(self.get_object_directory(object_handle, create), self.__get_pickle_name__(codec))
+
+	@staticmethod
+	def __get_pickle_name__(codec="none"):
+		return "object.pkl" + codecs.EXTENSIONS[codec]
+
+	def __find_pickle__(self, object_handle: ObjectHandle):
+		"""Path and codec of the object's pickle, (None, None) if it is not pickled."""
+		candidates = {self.__get_object_path__(object_handle, codec=codec): codec for codec in codecs.CODECS}
+		for info in self.fs.get_file_info(list(candidates)):
+			if info.type != pafs.FileType.NotFound:
+				return info.path, candidates[info.path]
+		return None, None
+
+	def __get_hash_path__(self, object_handle: ObjectHandle):
+		return os.path.join(self.get_object_directory(object_handle), self.HASH_FILE)
+
+	def __get_lineage_path__(self, object_handle: ObjectHandle):
+		return os.path.join(self.get_object_directory(object_handle), self.LINEAGE_FILE)
+
+	def __delete_file__(self, path):
+		if self.fs.get_file_info(path).type != pafs.FileType.NotFound:
+			self.fs.delete_file(path)
+
+	def __invalidate__(self, object_handle: ObjectHandle):
+		if self.cache is not None:
+			self.cache.invalidate(object_handle)
+		if self.prefetcher is not None:
+			self.prefetcher.discard(object_handle)
+
+	def __get_blob_path__(self, digest: str):
+		return os.path.join(self.base_dir, self.BLOB_DIR, digest[:2], digest)
+
+	def put_blob(self, data: bytes) -> str:
+		"""Store raw bytes under their SHA-256 hex digest, which is returned. Blobs are immutable, storing one again is a no-op."""
+		digest = hashlib.sha256(data).hexdigest()
+		path = self.__get_blob_path__(digest)
+		if self.fs.get_file_info(path).type == pafs.FileType.NotFound:
+			self.fs.create_dir(os.path.dirname(path), recursive=True)
+			with self.fs.open_output_stream(path) as f:
+				f.write(data)
+		return digest
+
+	def get_blob(self, digest: str) -> bytes:
+		""":raises FileNotFoundError: if no blob with that digest is stored."""
+		with self.fs.open_input_stream(self.__get_blob_path__(digest)) as f:
+			return f.read()
+
+	def is_local(self) -> bool:
+		"""Whether the store lives on the local disk, in which case columnar objects are memory-mapped on load."""
+		return isinstance(self.fs, pafs.LocalFileSystem)
+
+	def persist_object(self, object_wrapper: ObjectWrapper, partitions=None, partitioning="hash"):
+		"""Persist a object to the directory specified by the ObjectHandle.
+
+		Plain NetworkX graphs are written as columnar Arrow node/edge tables and CSRGraphs as their
+		raw arrays. Any other object (or a graph whose ids/attributes have no columnar representation) is pickled.
+		A GraphWrapper is persisted as its graph, together with its version, parent and delta (see load_delta).
+
+		:param partitions: split a columnar graph into that many partitions by source vertex, see load_object.
+		:param partitioning: "hash" or "range" assignment of vertices to partitions.
+		:raises ValueError: if partitions are requested for an object without columnar representation.
+			An object that cannot be written leaves the stored one untouched.
+		"""
+		object_handle = object_wrapper.get_object_handle()
+		obj = object_wrapper.get_object()
+		wrapper = None
+		if isinstance(obj, GraphWrapper):
+			wrapper, obj = obj, obj.graph
+		if partitions is not None and not ArrowGraphFormat.supports(obj):
+			raise ValueError(f"Objects of type {type(obj).__name__} cannot be partitioned")
+
+		# written completely before the stored object is touched
+		staging = os.path.join(self.base_dir, self.STAGING_DIR, uuid.uuid4().hex)
+		self.fs.create_dir(staging, recursive=True)
+		try:
+			content_hash = self.__write_object__(staging, object_handle, obj, partitions, partitioning, wrapper)
+			if wrapper is not None and wrapper.parent_id is not None:
+				lineage = {"version": wrapper.version, "parent_id": wrapper.parent_id, "delta": wrapper.delta}
+				with self.fs.open_output_stream(os.path.join(staging, self.LINEAGE_FILE)) as f:
+					f.write(pickle.dumps(lineage))
+			self.__swap_in__(staging, object_handle, content_hash)
+		finally:
+			self.fs.delete_dir(staging)
+
+		if self.cache is not None:
+			# the next step of a BGO chain usually reads what was just written
+			self.cache.put(object_handle, obj, content_hash, size=self.get_object_size(object_handle))
+
+	def __swap_in__(self, staging, object_handle: ObjectHandle, content_hash: str):
+		"""Replace the stored object's files with the ones written to ``staging``."""
+		directory = self.get_object_directory(object_handle, create=True)
+		self.__invalidate__(object_handle)
+		# drop the manifest and hash first so readers never combine them with a newer pickle (or half written tables)
+		self.__delete_file__(os.path.join(directory, ArrowGraphFormat.MANIFEST))
+		self.__delete_file__(self.__get_hash_path__(object_handle))
+		# as well as the rest, e.g. partition files of an earlier layout
+		for info in self.list_object_files(object_handle):
+			self.fs.delete_file(info.path)
+
+		# renames within the store, the manifest last so that it only appears with the tables it lists
+		staged = self.fs.get_file_info(pafs.FileSelector(staging))
+		for info in sorted(staged, key=lambda info: info.base_name == ArrowGraphFormat.MANIFEST):
+			self.fs.move(info.path, os.path.join(directory, info.base_name))
+		with self.fs.open_output_stream(self.__get_hash_path__(object_handle)) as f:
+			f.write(content_hash.encode())
+
+	def __write_object__(self, directory, object_handle: ObjectHandle, obj, partitions=None, partitioning="hash", wrapper=None) -> str:
+		codec = "none" if self.codec_policy is None else self.codec_policy.choose(obj)
+
+		def graph_id():
+			# the fingerprint of a wrapper is kept up to date, no need to hash the graph again
+			return (wrapper or GraphWrapper(obj)).get_metadata().graph_id
+
+		if isinstance(obj, CSRGraph) and partitions is None:
+			content_hash = graph_id()
+			CSRGraphFormat.write(self.fs, directory, obj, codec)
+			return content_hash
 
-	def persist_object(self, object_wrapper: ObjectWrapper):
-		"""Persist a object to the directory specified by the ObjectHandle."""
-		graph_path = self.__get_object_path__(object_wrapper.get_object_handle())
-		with self.fs.open_output_stream(graph_path) as f:
-			pickle.dump(object_wrapper.get_object(), f)
+		if ArrowGraphFormat.supports(obj):
+			try:
+				content_hash = graph_id()
+				ArrowGraphFormat.write(self.fs, directory, obj, partitions, partitioning, codec)
+				return content_hash
+			except (ValueError, TypeError, OverflowError, pa.ArrowException):
+				if partitions is not None:
+					raise
+				# not representable as columns, fall back to pickle
 
-	def load_object(self, object_handle: ObjectHandle) -> ObjectWrapper:
-		"""Load a object from the directory specified by the ObjectHandle."""
-		object_path = self.__get_object_path__(object_handle)
+		if partitions is not None:
+			raise ValueError(f"Objects of type {type(obj).__name__} cannot be partitioned")
 
-		with self.fs.open_input_stream(object_path) as f:
-			graph = pickle.load(f)
+		data = pickle.dumps(obj)
+		with codecs.open_output_stream(self.fs, os.path.join(directory, self.__get_pickle_name__(codec)), codec) as f:
+			f.write(data)
+		# keep the graph_id of a wrapper, it is what the lineage of derived versions refers to
+		return wrapper.get_metadata().graph_id if wrapper is not None else hashlib.sha256(data).hexdigest()
+
+	def get_content_hash(self, object_handle: ObjectHandle) -> str:
+		"""Returns the hash of the object's content, recorded when it was persisted.
+
+		The hash of an object persisted before hashes were recorded is computed from the stored object on every
+		call, without writing anything: reads have no side effects on the store.
+		"""
+		hash_path = self.__get_hash_path__(object_handle)
+		if self.fs.get_file_info(hash_path).type == pafs.FileType.NotFound:
+			return self.__compute_content_hash__(object_handle)
+		with self.fs.open_input_stream(hash_path) as f:
+			return f.read().decode()
+
+	def __compute_content_hash__(self, object_handle: ObjectHandle) -> str:
+		"""The hash __write_object__ returns for the stored object."""
+		if self.get_manifest(object_handle) is not None:
+			return GraphWrapper(self.load_from_store(object_handle).get_object()).get_metadata().graph_id
+		path, codec = self.__find_pickle__(object_handle)
+		if path is None:
+			raise FileNotFoundError(f"No object is stored at {object_handle.get_object_path()}")
+		digest = hashlib.sha256()
+		with codecs.open_input_stream(self.fs, path, codec) as f:
+			for chunk in iter(lambda: f.read(1 << 20), b""):
+				digest.update(chunk)
+		return digest.hexdigest()
+
+	def __read_lineage__(self, object_handle: ObjectHandle):
+		path = self.__get_lineage_path__(object_handle)
+		if self.fs.get_file_info(path).type == pafs.FileType.NotFound:
+			return None
+		with self.fs.open_input_stream(path) as f:
+			return pickle.loads(f.read())
+
+	def get_metadata(self, object_handle: ObjectHandle) -> GraphMetadata:
+		"""Content hash, version and parent of a stored object, the parent is None unless it was a derived GraphWrapper.
+
+		The parent_id of a columnar graph is the content hash of its parent, since both are the graph's fingerprint.
+		"""
+		lineage = self.__read_lineage__(object_handle) or {"version": 0, "parent_id": None}
+		return GraphMetadata(self.get_content_hash(object_handle), lineage["version"], lineage["parent_id"])
+
+	def load_delta(self, object_handle: ObjectHandle):
+		"""The GraphDelta turning the parent version into the stored graph, None if it has no parent."""
+		lineage = self.__read_lineage__(object_handle)
+		return None if lineage is None else lineage["delta"]
+
+	def exists(self, object_handle: ObjectHandle) -> bool:
+		"""Whether a complete object is stored for the ObjectHandle."""
+		directory = self.get_object_directory(object_handle)
+		return ArrowGraphFormat.exists(self.fs, directory) or self.__find_pickle__(object_handle)[0] is not None
+
+	def list_object_files(self, object_handle: ObjectHandle):
+		"""FileInfos of the object's files in the store."""
+		# Not recursive: the outputs of BGOs applied to an object live in subdirectories of it.
+		selector = pafs.FileSelector(self.get_object_directory(object_handle), allow_not_found=True)
+		return [info for info in self.fs.get_file_info(selector) if info.type == pafs.FileType.File]
+
+	def get_object_size(self, object_handle: ObjectHandle) -> int:
+		"""Number of bytes the object occupies in the store."""
+		return sum(info.size for info in self.list_object_files(object_handle))
+
+	def delete_object(self, object_handle: ObjectHandle):
+		"""Remove the object's files. Objects derived from it are kept."""
+		self.__invalidate__(object_handle)
+		for info in self.list_object_files(object_handle):
+			self.fs.delete_file(info.path)
+
+	def get_manifest(self, object_handle: ObjectHandle):
+		"""Manifest of a columnar object, None if the object is pickled."""
+		directory = self.get_object_directory(object_handle)
+		if not ArrowGraphFormat.exists(self.fs, directory):
+			return None
+		return ArrowGraphFormat.read_manifest(self.fs, directory)
+
+	def load_object(self, object_handle: ObjectHandle, columns=None, lazy=False, partitions=None) -> ObjectWrapper:
+		"""Load a object from the directory specified by the ObjectHandle.
+
+		:param columns: for columnar graphs, the node/edge attributes to load. All attributes are loaded if None.
+		:param lazy: return a LazyObjectWrapper that only loads the object when it is first accessed.
+		:param partitions: for partitioned graphs, the partitions to load: their vertices and the edges leaving them.
+			Only those partitions are read from the store, bypassing the cache and prefetching.
+		:raises ValueError: if partitions are requested for an object stored without columnar node/edge tables.
+		"""
+		if partitions is not None:
+			directory = self.get_object_directory(object_handle)
+			manifest = self.get_manifest(object_handle)
+			if manifest is None or manifest["format"] != ArrowGraphFormat.FORMAT:
+				if not self.exists(object_handle):
+					raise FileNotFoundError(f"No object is stored at {object_handle.get_object_path()}")
+				raise ValueError(f"Partitions of {object_handle.get_object_path()} cannot be loaded, "
+								 f"it is not stored as columnar node/edge tables")
+			graph = ArrowGraphFormat.read(self.fs, directory, columns, self.is_local(), manifest, partitions)
+			return ObjectWrapper(graph, object_handle)
+		if lazy:
+			return LazyObjectWrapper(self, object_handle, columns)
+		if self.prefetcher is not None:
+			prefetched = self.prefetcher.take(object_handle, columns)
+			if prefetched is not None:
+				return prefetched
+		return self.__load__(object_handle, columns)
+
+	def prefetch(self, object_handle: ObjectHandle, columns=None):
+		"""Start loading an object that is about to be used on a background I/O thread.
+
+		The next load_object call for it waits for (or picks up) the prefetched copy. Does nothing
+		if prefetching is disabled or the object does not fit the prefetch memory budget.
+		"""
+		if self.prefetcher is not None:
+			self.prefetcher.submit(object_handle, columns)
+
+	def release_prefetch(self, object_handle: ObjectHandle):
+		"""Drop prefetched copies of an object that will not be loaded after all, freeing their share of the budget."""
+		if self.prefetcher is not None:
+			self.prefetcher.discard(object_handle)
+
+	def __load__(self, object_handle: ObjectHandle, columns=None) -> ObjectWrapper:
+		if self.cache is not None:
+			return self.cache.load(self, object_handle, columns)
+		return self.load_from_store(object_handle, columns)
+
+	def load_from_store(self, object_handle: ObjectHandle, columns=None) -> ObjectWrapper:
+		"""Load the object from the store, bypassing the cache and the prefetcher."""
+		directory = self.get_object_directory(object_handle)
+		manifest = self.get_manifest(object_handle)
+		if manifest is not None:
+			if manifest["format"] == CSRGraphFormat.FORMAT:
+				graph = CSRGraphFormat.read(self.fs, directory, manifest, memory_map=self.is_local())
+			else:
+				graph = ArrowGraphFormat.read(self.fs, directory, columns, self.is_local(), manifest)
+			return ObjectWrapper(graph, object_handle)
+
+		path, codec = self.__find_pickle__(object_handle)
+		if path is None:
+			raise FileNotFoundError(f"No object is stored at {object_handle.get_object_path()}")
+		if self.is_local() and codec == "none":
+			# unpickle straight from the mapped pages instead of reading the file into a copy first
+			with pa.memory_map(path) as f:
+				graph = pickle.loads(f.read_buffer())
+		else:
+			with codecs.open_input_stream(self.fs, path, codec) as f:
+				graph = pickle.load(f)
 
 		return ObjectWrapper(graph, object_handle)
+
+	def load_table(self, object_handle: ObjectHandle, table="edges", columns=None, partitions=None) -> pa.Table:
+		"""Load the raw node or edge table of a columnar graph without building a NetworkX graph."""
+		directory = self.get_object_directory(object_handle)
+		manifest = ArrowGraphFormat.read_manifest(self.fs, directory)
+		return ArrowGraphFormat.read_table(self.fs, directory, manifest, table, columns, self.is_local(), partitions)
@@ -0,0 +1,71 @@
+from graphmassivizer.core.dataflow.object_handle import ObjectHandle
+
+
+class PlanStep:
+    def __init__(self, name: str, implementation_id: str, input_handle: ObjectHandle, output_handle: ObjectHandle,
+                 input_bytes=None, estimated_runtime=None, estimated_memory=None, cached=False):
+        """A step of an ExecutionPlan.
+        :param input_bytes: stored size of the input, None if it is unknown (e.g. not computed yet).
+        :param estimated_runtime: seconds the BGO is expected to run, None if there is no estimate.
+        :param estimated_memory: peak bytes the BGO is expected to use, None if there is no estimate.
+        :param cached: whether the result cache already holds the result, so the step will not run.
+        """
+        self.name = name
+        self.implementation_id = implementation_id
+        self.input_handle = input_handle
+        self.output_handle = output_handle
+        self.input_bytes = input_bytes
+        self.estimated_runtime = estimated_runtime
+        self.estimated_memory = estimated_memory
+        self.cached = cached
+
+    def get_runtime(self) -> float:
+        """Estimated runtime counted in the plan: 0 for cached steps and steps without an estimate."""
+        return 0.0 if self.cached or self.estimated_runtime is None else self.estimated_runtime
+
+
+class ExecutionPlan:
+    """Dry-run result of a Workflow: what every step reads and writes and what it is expected to cost."""
+
+    def __init__(self, steps: list, dependencies: dict = None):
+        """
+        :param steps: PlanSteps in execution (topological) order.
+        :param dependencies: maps a PlanStep to the PlanSteps it depends on.
+        """
+        self.steps = steps
+        self.dependencies = dependencies or {}
+
+    def get_total_runtime(self) -> float:
+        """Estimated compute time summed over all steps that have to run."""
+        return sum(step.get_runtime() for step in self.steps)
+
+    def get_critical_path_runtime(self) -> float:
+        """Estimated runtime of the slowest chain of dependent steps, a lower bound for the wall time."""
+        finish = {}
+        for step in self.steps:
+            finish[step] = step.get_runtime() + max((finish[p] for p in self.dependencies.get(step, [])), default=0.0)
+        return max(finish.values(), default=0.0)
+
+    def get_peak_memory(self) -> int:
+        """Largest memory estimate of a step that has to run, 0 without estimates."""
+        return max((step.estimated_memory for step in self.steps
+                    if not step.cached and step.estimated_memory is not None), default=0)
+
+    def exceeds(self, max_runtime=None, max_memory=None) -> bool:
+        """Whether the plan is expected to take longer than ``max_runtime`` seconds or more than ``max_memory`` bytes."""
+        if max_runtime is not None and self.get_critical_path_runtime() > max_runtime:
+            return True
+        return max_memory is not None and self.get_peak_memory() > max_memory
+
+    def summary(self) -> str:
+        def number(value, scale=1.0, unit=""):
+            return "?" if value is None else f"{value / scale:.3f}{unit}"
+
+        lines = [f"{'step':<32} {'input MB':>9} {'runtime':>10} {'memory MB':>10} {'cached':>6}  output"]
+        for step in self.steps:
+            lines.append(f"{step.name:<32} {number(step.input_bytes, 1e6):>9} {number(step.estimated_runtime, unit='s'):>10} "
+                         f"{number(step.estimated_memory, 1e6):>10} {'yes' if step.cached else 'no':>6}  "
+                         f"{step.output_handle.get_object_path()}")
+        lines.append(f"total runtime {self.get_total_runtime():.3f}s, critical path {self.get_critical_path_runtime():.3f}s, "
+                     f"peak memory {self.get_peak_memory() / 1e6:.3f}MB")
+        return "\n".join(lines)
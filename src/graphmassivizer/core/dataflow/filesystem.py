@@ -0,0 +1,17 @@
+import re
+
+import pyarrow.fs as pafs
+
+HDFS_NAMENODE_PATTERN = r'hdfs://([^:]+):(\d+)'
+
+
+def get_fs(hdfs_namenode: str) -> pafs.HadoopFileSystem:
+    """The HDFS filesystem of a namenode URI such as ``hdfs://namenode:8020``, e.g. for a DataManager.
+
+    :raises ValueError: if the URI has no host and port.
+    """
+    match = re.match(HDFS_NAMENODE_PATTERN, hdfs_namenode)
+    if not match:
+        raise ValueError(f"Could not parse HDFS_NAMENODE={hdfs_namenode}")
+    hdfs_host, hdfs_port = match.groups()
+    return pafs.HadoopFileSystem(host=hdfs_host, port=int(hdfs_port))
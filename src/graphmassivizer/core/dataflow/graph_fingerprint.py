@@ -0,0 +1,207 @@
+import hashlib
+import struct
+
+import numpy as np
+
+MASK = (1 << 64) - 1
+# salts of the two independent 64 bit lanes that are summed up
+LANES = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F))
+
+
+def mix(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, applied element wise to an uint64 array."""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def canonical(value) -> bytes:
+    """Type tagged encoding of a label or attribute value that is the same in every process.
+
+    Unlike ``repr`` it does not depend on the insertion order of dicts and sets, nor on memory
+    addresses: objects without a ``__repr__`` of their own are encoded by their type and ``vars``.
+    """
+    if value is None:
+        return b"n"
+    if isinstance(value, bool):
+        return b"T" if value else b"F"
+    if isinstance(value, int):
+        return b"i%d;" % value
+    if isinstance(value, float):
+        return b"f" + repr(value).encode() + b";"
+    if isinstance(value, str):
+        encoded = value.encode()
+        return b"s%d:" % len(encoded) + encoded
+    if isinstance(value, (bytes, bytearray)):
+        return b"b%d:" % len(value) + bytes(value)
+    if isinstance(value, np.generic):
+        return canonical(value.item())
+    if isinstance(value, (tuple, list)):
+        return (b"t" if isinstance(value, tuple) else b"l") + b"%d:" % len(value) + b"".join(map(canonical, value))
+    if isinstance(value, (set, frozenset)):
+        return b"S%d:" % len(value) + b"".join(sorted(map(canonical, value)))
+    if isinstance(value, dict):
+        return b"d%d:" % len(value) + b"".join(sorted(canonical(k) + canonical(v) for k, v in value.items()))
+    name = canonical(f"{type(value).__module__}.{type(value).__qualname__}")
+    if type(value).__repr__ is not object.__repr__:
+        return b"r" + name + canonical(repr(value))
+    if hasattr(value, "__dict__"):
+        return b"o" + name + canonical(vars(value))
+    raise TypeError(f"Cannot fingerprint values of type {type(value).__name__}")
+
+
+class GraphFingerprint:
+    """Order independent fingerprint of a graph.
+
+    Every node and edge is hashed on its own and the hashes are summed up modulo 2^64
+    (in two independent lanes). Sums do not depend on the order of the elements, can be
+    computed in chunks and merged, and are updated incrementally by adding the hashes of
+    new elements and subtracting the hashes of removed ones.
+
+    Node labels (and attributes) are hashed once per node, edges are hashed with vectorized
+    NumPy operations on the hashes of their endpoints.
+    """
+
+    def __init__(self, directed=False):
+        self.directed = directed
+        self.node_sums = [0, 0]
+        self.edge_sums = [0, 0]
+        self.num_nodes = 0
+        self.num_edges = 0
+
+    @staticmethod
+    def hash_value(value) -> int:
+        return int.from_bytes(hashlib.blake2b(canonical(value), digest_size=8).digest(), "little")
+
+    @staticmethod
+    def hash_labels(labels) -> np.ndarray:
+        """Stable (not salted per process) 64 bit hashes of node labels."""
+        return np.fromiter((GraphFingerprint.hash_value(label) for label in labels), dtype=np.uint64)
+
+    @staticmethod
+    def hash_attributes(attribute_dicts) -> np.ndarray:
+        """Hashes of attribute dictionaries, 0 for elements without attributes."""
+        return np.fromiter((GraphFingerprint.hash_value(data) if data else 0
+                            for data in attribute_dicts), dtype=np.uint64)
+
+    def __add(self, sums, hashes: np.ndarray, sign: int):
+        for lane, salt in enumerate(LANES):
+            lane_sum = int(np.sum(mix(hashes ^ salt), dtype=np.uint64)) if len(hashes) else 0
+            sums[lane] = (sums[lane] + sign * lane_sum) & MASK
+
+    def add_node_hashes(self, label_hashes: np.ndarray, attribute_hashes: np.ndarray = None, sign=1):
+        hashes = mix(label_hashes)
+        if attribute_hashes is not None:
+            hashes = hashes ^ attribute_hashes
+        self.__add(self.node_sums, hashes, sign)
+        self.num_nodes += sign * len(label_hashes)
+
+    def add_edge_hashes(self, source_hashes: np.ndarray, target_hashes: np.ndarray,
+                        attribute_hashes: np.ndarray = None, sign=1):
+        """Add (or with ``sign=-1`` remove) edges given the label hashes of their endpoints."""
+        if not self.directed:
+            source_hashes, target_hashes = np.minimum(source_hashes, target_hashes), np.maximum(source_hashes, target_hashes)
+        hashes = source_hashes ^ mix(target_hashes + LANES[0])
+        hashes = mix(hashes if attribute_hashes is None else hashes ^ attribute_hashes)
+        self.__add(self.edge_sums, hashes, sign)
+        self.num_edges += sign * len(source_hashes)
+
+    def add_nodes(self, nodes, sign=1):
+        """Add ``(node, data)`` pairs."""
+        nodes = list(nodes)
+        self.add_node_hashes(self.hash_labels(node for node, _ in nodes),
+                             self.hash_attributes(data for _, data in nodes), sign)
+
+    def add_edges(self, edges, sign=1):
+        """Add ``(u, v, data)`` triples."""
+        edges = list(edges)
+        self.add_edge_hashes(self.hash_labels(edge[0] for edge in edges),
+                             self.hash_labels(edge[1] for edge in edges),
+                             self.hash_attributes(edge[2] for edge in edges), sign)
+
+    def remove_nodes(self, nodes):
+        self.add_nodes(nodes, sign=-1)
+
+    def remove_edges(self, edges):
+        self.add_edges(edges, sign=-1)
+
+    def merge(self, other: 'GraphFingerprint') -> 'GraphFingerprint':
+        """Combine with the fingerprint of a disjoint chunk of the same graph."""
+        for lane in range(2):
+            self.node_sums[lane] = (self.node_sums[lane] + other.node_sums[lane]) & MASK
+            self.edge_sums[lane] = (self.edge_sums[lane] + other.edge_sums[lane]) & MASK
+        self.num_nodes += other.num_nodes
+        self.num_edges += other.num_edges
+        return self
+
+    def copy(self) -> 'GraphFingerprint':
+        return GraphFingerprint(self.directed).merge(self)
+
+    def hexdigest(self) -> str:
+        packed = struct.pack("<4Q2q?", *self.node_sums, *self.edge_sums, self.num_nodes, self.num_edges, self.directed)
+        return hashlib.blake2b(packed, digest_size=16).hexdigest()
+
+    @staticmethod
+    def of_graph(graph, chunk_size=1 << 16) -> 'GraphFingerprint':
+        """Fingerprint of a NetworkX graph in a single pass over its adjacency.
+
+        The adjacency is split into chunks of ``chunk_size`` nodes whose partial fingerprints are
+        merged, so that the hashes of only one chunk are held at a time. Hashing the elements holds
+        the GIL, threads would not speed it up.
+        """
+        directed = graph.is_directed()
+        multigraph = graph.is_multigraph()
+        fingerprint = GraphFingerprint(directed)
+        labels = list(graph.nodes)
+        label_hashes = GraphFingerprint.hash_labels(labels)
+        fingerprint.add_node_hashes(label_hashes, GraphFingerprint.hash_attributes(data for _, data in graph.nodes(data=True)))
+
+        index = dict(zip(labels, label_hashes.tolist()))
+        position = {label: i for i, label in enumerate(labels)}
+        adjacency = graph.adj
+
+        def edge_hashes(nodes):
+            # flat (source hash, target hash, attribute hash) triples; undirected edges are visited once
+            for u in nodes:
+                hu = index[u]
+                pu = position[u]
+                for v, data in adjacency[u].items():
+                    if not directed and position[v] < pu:
+                        continue
+                    hv = index[v]
+                    for d in (data.values() if multigraph else (data,)):
+                        yield hu
+                        yield hv
+                        yield GraphFingerprint.hash_value(d) if d else 0
+
+        def chunk_fingerprint(start):
+            triples = np.fromiter(edge_hashes(labels[start:start + chunk_size]), dtype=np.uint64).reshape(-1, 3)
+            partial = GraphFingerprint(directed)
+            partial.add_edge_hashes(triples[:, 0], triples[:, 1], triples[:, 2])
+            return partial
+
+        for start in range(0, len(labels), chunk_size):
+            fingerprint.merge(chunk_fingerprint(start))
+        return fingerprint
+
+    @staticmethod
+    def of_csr(graph) -> 'GraphFingerprint':
+        """Fingerprint of a CSRGraph, equal to the one of ``graph.to_networkx()``.
+
+        Only the node labels (and edge weights) are hashed per element, edges are hashed straight
+        from the index arrays.
+        """
+        fingerprint = GraphFingerprint(graph.directed)
+        label_hashes = GraphFingerprint.hash_labels(graph.get_labels())
+        fingerprint.add_node_hashes(label_hashes)
+
+        sources = graph.sources()
+        keep = slice(None) if graph.directed else sources <= graph.indices
+        attribute_hashes = None
+        if graph.weights is not None:
+            attribute_hashes = GraphFingerprint.hash_attributes({graph.weight_attribute: weight}
+                                                                for weight in graph.weights[keep].tolist())
+        fingerprint.add_edge_hashes(label_hashes[sources[keep]], label_hashes[graph.indices[keep]], attribute_hashes)
+        return fingerprint
@@ -0,0 +1,355 @@
+from bisect import bisect_right
+import json
+import os
+
+import networkx as nx
+import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.fs as pafs
+
+from graphmassivizer.core.dataflow.codecs import ipc_write_options
+from graphmassivizer.core.dataflow.csr_graph import CSRGraph
+from graphmassivizer.core.dataflow.graph_fingerprint import GraphFingerprint
+
+
+class ArrowGraphFormat:
+    """Columnar on-disk layout for NetworkX graphs.
+
+    A graph is stored as two Arrow IPC (Feather V2) files, ``nodes.arrow`` and
+    ``edges.arrow``, next to a ``manifest.json`` describing the graph type, the
+    graph level attributes and the columns of both tables. Node and edge
+    attributes become columns, so readers can project single columns and
+    memory-map the files without deserializing the whole graph.
+
+    Graphs can also be split into partitions by source vertex, each with its own
+    ``nodes-<i>.arrow`` and ``edges-<i>.arrow`` file, so a reader only loads the partitions
+    it processes. A partition holds its vertices and the edges leaving them (for undirected
+    graphs, the edges whose first endpoint is one of them).
+    """
+
+    FORMAT = "arrow-graph"
+    VERSION = 1
+    MANIFEST = "manifest.json"
+    NODES = "nodes.arrow"
+    EDGES = "edges.arrow"
+
+    GRAPH_TYPES = {cls.__name__: cls for cls in (nx.Graph, nx.DiGraph, nx.MultiGraph, nx.MultiDiGraph)}
+    STRUCTURAL_COLUMNS = {"nodes": ("id",), "edges": ("source", "target", "key")}
+    PARTITIONING = ("hash", "range")
+
+    @staticmethod
+    def supports(obj) -> bool:
+        """Only the plain NetworkX graph classes are stored columnar, everything else is pickled."""
+        return type(obj) in ArrowGraphFormat.GRAPH_TYPES.values()
+
+    @staticmethod
+    def to_tables(graph: nx.Graph) -> tuple[pa.Table, pa.Table]:
+        """Convert a graph into a node table and an edge table.
+
+        :raises ValueError: if node ids or attributes cannot be represented losslessly as primitive columns.
+        """
+        multigraph = graph.is_multigraph()
+
+        node_ids = []
+        node_attributes = []
+        for node, data in graph.nodes(data=True):
+            node_ids.append(node)
+            node_attributes.append(data)
+
+        sources = []
+        targets = []
+        keys = []
+        edge_attributes = []
+        edges = graph.edges(keys=True, data=True) if multigraph else graph.edges(data=True)
+        for edge in edges:
+            sources.append(edge[0])
+            targets.append(edge[1])
+            if multigraph:
+                keys.append(edge[2])
+            edge_attributes.append(edge[-1])
+
+        nodes = ArrowGraphFormat.__build_table({"id": node_ids}, node_attributes, "nodes")
+        structural = {"source": sources, "target": targets}
+        if multigraph:
+            structural["key"] = keys
+        edges = ArrowGraphFormat.__build_table(structural, edge_attributes, "edges")
+
+        id_type = nodes.schema.field("id").type
+        if len(node_ids) and not ArrowGraphFormat.__is_id_type(id_type):
+            raise ValueError(f"Node ids of type {id_type} are not supported by the columnar format")
+        return nodes, edges
+
+    @staticmethod
+    def from_tables(graph_type: str, graph_attributes: dict, nodes: pa.Table, edges: pa.Table) -> nx.Graph:
+        """Rebuild a graph from its node and edge tables. Missing (null) attribute values are skipped."""
+        graph = ArrowGraphFormat.GRAPH_TYPES[graph_type]()
+        graph.graph.update(graph_attributes)
+
+        node_columns = [name for name in nodes.column_names if name != "id"]
+        graph.add_nodes_from(zip(nodes.column("id").to_pylist(),
+                                 ArrowGraphFormat.__attribute_dicts(nodes, node_columns)))
+
+        edge_columns = [name for name in edges.column_names if name not in ArrowGraphFormat.STRUCTURAL_COLUMNS["edges"]]
+        sources = edges.column("source").to_pylist()
+        targets = edges.column("target").to_pylist()
+        attributes = ArrowGraphFormat.__attribute_dicts(edges, edge_columns)
+        if graph.is_multigraph() and "key" in edges.column_names:
+            graph.add_edges_from(zip(sources, targets, edges.column("key").to_pylist(), attributes))
+        else:
+            graph.add_edges_from(zip(sources, targets, attributes))
+        return graph
+
+    @staticmethod
+    def exists(fs, directory: str) -> bool:
+        info = fs.get_file_info(os.path.join(directory, ArrowGraphFormat.MANIFEST))
+        return info.type != pafs.FileType.NotFound
+
+    @staticmethod
+    def assign_partitions(node_ids: list, partitions: int, partitioning="hash") -> tuple[np.ndarray, list]:
+        """Partition of every node and, for range partitioning, the upper bounds of all but the last partition.
+
+        Hash partitioning uses a stable hash of the node id, range partitioning splits the sorted ids
+        into partitions of (about) equal size.
+        """
+        if partitioning not in ArrowGraphFormat.PARTITIONING:
+            raise ValueError(f"Unknown partitioning '{partitioning}', expected one of {ArrowGraphFormat.PARTITIONING}")
+        if partitions < 1:
+            raise ValueError("A graph needs at least one partition")
+        if partitioning == "hash":
+            hashes = GraphFingerprint.hash_labels(node_ids)
+            return (hashes % np.uint64(partitions)).astype(np.int64), []
+
+        ordered = sorted(node_ids)
+        boundaries = [ordered[len(ordered) * i // partitions] for i in range(1, partitions)] if ordered else []
+        return np.fromiter((bisect_right(boundaries, node) for node in node_ids), dtype=np.int64,
+                           count=len(node_ids)), boundaries
+
+    @staticmethod
+    def write(fs, directory: str, graph: nx.Graph, partitions=None, partitioning="hash", codec="none") -> dict:
+        """Write ``graph`` into ``directory``, optionally split into ``partitions``, and return the manifest."""
+        nodes, edges = ArrowGraphFormat.to_tables(graph)
+        manifest = {
+            "format": ArrowGraphFormat.FORMAT,
+            "version": ArrowGraphFormat.VERSION,
+            "compression": codec,
+            "graph_type": type(graph).__name__,
+            "graph": graph.graph,
+            "tables": {
+                "nodes": {"columns": nodes.column_names, "rows": nodes.num_rows},
+                "edges": {"columns": edges.column_names, "rows": edges.num_rows},
+            },
+        }
+
+        files = {}
+        if partitions is None:
+            for name, table in (("nodes", nodes), ("edges", edges)):
+                file = ArrowGraphFormat.NODES if name == "nodes" else ArrowGraphFormat.EDGES
+                manifest["tables"][name]["file"] = file
+                files[file] = table
+        else:
+            node_ids = nodes.column("id").to_pylist()
+            node_partitions, boundaries = ArrowGraphFormat.assign_partitions(node_ids, partitions, partitioning)
+            partition_of = dict(zip(node_ids, node_partitions.tolist()))
+            edge_partitions = np.fromiter((partition_of[source] for source in edges.column("source").to_pylist()),
+                                          dtype=np.int64, count=edges.num_rows)
+            manifest["partitioning"] = {"scheme": partitioning, "count": partitions, "boundaries": boundaries}
+            for name, table, assigned in (("nodes", nodes, node_partitions), ("edges", edges, edge_partitions)):
+                manifest["tables"][name]["partitions"] = []
+                for i in range(partitions):
+                    part = table.filter(pa.array(assigned == i))
+                    file = f"{name}-{i:05d}.arrow"
+                    manifest["tables"][name]["partitions"].append({"file": file, "rows": part.num_rows})
+                    files[file] = part
+
+        # fail before anything is written if the graph attributes are not serializable (or not as they are,
+        # e.g. tuples that would load as lists)
+        encoded_manifest = json.dumps(manifest).encode("utf-8")
+        if json.loads(encoded_manifest)["graph"] != graph.graph:
+            raise ValueError("The graph attributes do not survive a JSON round trip")
+
+        for file, table in files.items():
+            ArrowGraphFormat.write_table(fs, os.path.join(directory, file), table, codec)
+        # the manifest is written last, so a graph is only visible once it is complete
+        with fs.open_output_stream(os.path.join(directory, ArrowGraphFormat.MANIFEST)) as f:
+            f.write(encoded_manifest)
+        return manifest
+
+    @staticmethod
+    def partition_count(manifest: dict) -> int:
+        """Number of partitions of a stored graph, 1 if it is not partitioned."""
+        return manifest.get("partitioning", {}).get("count", 1)
+
+    @staticmethod
+    def write_table(fs, path: str, table: pa.Table, codec="none") -> None:
+        # Uncompressed IPC buffers can be memory-mapped without any copy on the reader side,
+        # compressed ones are decompressed into memory when they are read.
+        with fs.open_output_stream(path) as sink:
+            with pa.ipc.new_file(sink, table.schema, options=ipc_write_options(codec)) as writer:
+                writer.write_table(table)
+
+    @staticmethod
+    def read_manifest(fs, directory: str) -> dict:
+        with fs.open_input_stream(os.path.join(directory, ArrowGraphFormat.MANIFEST)) as f:
+            return json.loads(f.read().decode("utf-8"))
+
+    @staticmethod
+    def read_table(fs, directory: str, manifest: dict, table: str, columns=None, memory_map=False,
+                   partitions=None) -> pa.Table:
+        """Read one of the tables, optionally restricted to ``columns`` (structural columns are always read).
+
+        With ``memory_map`` the file is mapped straight from the local disk instead of being streamed through ``fs``.
+        For partitioned graphs, ``partitions`` selects the partitions to read (all if None).
+        """
+        description = manifest["tables"][table]
+        selected = None
+        if columns is not None:
+            wanted = set(columns) | set(ArrowGraphFormat.STRUCTURAL_COLUMNS[table])
+            selected = [name for name in description["columns"] if name in wanted]
+
+        if "partitions" not in description:
+            if partitions is not None:
+                raise ValueError("The graph is not partitioned")
+            files = [description["file"]]
+        else:
+            if partitions is None:
+                partitions = range(len(description["partitions"]))
+            files = [description["partitions"][i]["file"] for i in sorted(set(partitions))]
+            if not files:
+                raise ValueError("At least one partition has to be read")
+
+        parts = []
+        for file in files:
+            path = os.path.join(directory, file)
+            if memory_map:
+                parts.append(feather.read_table(path, columns=selected, memory_map=True, use_threads=True))
+            else:
+                with fs.open_input_file(path) as f:
+                    parts.append(feather.read_table(f, columns=selected, use_threads=True))
+        return parts[0] if len(parts) == 1 else pa.concat_tables(parts)
+
+    @staticmethod
+    def read(fs, directory: str, columns=None, memory_map=False, manifest=None, partitions=None) -> nx.Graph:
+        """Load the graph stored in ``directory``, keeping only the attribute ``columns`` if given.
+
+        With ``partitions``, only their vertices and the edges leaving them are loaded. Targets of those
+        edges in other partitions are added without attributes.
+        """
+        manifest = manifest or ArrowGraphFormat.read_manifest(fs, directory)
+        nodes = ArrowGraphFormat.read_table(fs, directory, manifest, "nodes", columns, memory_map, partitions)
+        edges = ArrowGraphFormat.read_table(fs, directory, manifest, "edges", columns, memory_map, partitions)
+        return ArrowGraphFormat.from_tables(manifest["graph_type"], manifest["graph"], nodes, edges)
+
+    @staticmethod
+    def __build_table(structural: dict, attributes: list, table: str) -> pa.Table:
+        names = []
+        for data in attributes:
+            for name in data:
+                if name not in names:
+                    names.append(name)
+
+        columns = {}
+        for name, values in structural.items():
+            columns[name] = ArrowGraphFormat.__to_column(name, values)
+        for name in names:
+            if name in ArrowGraphFormat.STRUCTURAL_COLUMNS[table]:
+                raise ValueError(f"Attribute '{name}' clashes with a structural column of the {table} table")
+            if any(name in data and data[name] is None for data in attributes):
+                # a null reads back as a missing attribute
+                raise ValueError(f"Attribute '{name}' is explicitly set to None")
+            column = ArrowGraphFormat.__to_column(name, [data.get(name) for data in attributes])
+            if not ArrowGraphFormat.__is_attribute_type(column.type):
+                raise ValueError(f"Attribute '{name}' of type {column.type} is not supported by the columnar format")
+            columns[name] = column
+        return pa.table(columns)
+
+    @staticmethod
+    def __to_column(name: str, values: list) -> pa.Array:
+        """A column of ``values`` that reads back as the same Python values.
+
+        :raises ValueError: for values of mixed types (Arrow would coerce e.g. ints to floats) or integers outside int64.
+        """
+        types = {type(value) for value in values if value is not None}
+        if len(types) > 1:
+            raise ValueError(f"Column '{name}' mixes values of types {sorted(t.__name__ for t in types)}")
+        try:
+            return pa.array(values)
+        except OverflowError as e:
+            raise ValueError(f"Column '{name}' has integers outside the int64 range") from e
+
+    @staticmethod
+    def __attribute_dicts(table: pa.Table, names: list) -> list:
+        if not names:
+            return [{} for _ in range(table.num_rows)]
+        columns = [table.column(name).to_pylist() for name in names]
+        return [{name: value for name, value in zip(names, row) if value is not None} for row in zip(*columns)]
+
+    @staticmethod
+    def __is_id_type(arrow_type) -> bool:
+        return pa.types.is_integer(arrow_type) or pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type)
+
+    @staticmethod
+    def __is_attribute_type(arrow_type) -> bool:
+        return (ArrowGraphFormat.__is_id_type(arrow_type) or pa.types.is_floating(arrow_type)
+                or pa.types.is_boolean(arrow_type) or pa.types.is_null(arrow_type))
+
+
+class CSRGraphFormat:
+    """On-disk layout of a CSRGraph.
+
+    The offsets, the adjacency (indices and optional weights) and the node labels are stored as
+    separate Arrow IPC files next to the same ``manifest.json`` as the columnar NetworkX format.
+    The arrays are read back without any conversion, so memory-mapped loads of uncompressed
+    graphs do not copy them.
+    """
+
+    FORMAT = "csr-graph"
+    VERSION = 1
+    FILES = {"offsets": "offsets.arrow", "adjacency": "adjacency.arrow", "labels": "labels.arrow"}
+
+    @staticmethod
+    def to_tables(graph: CSRGraph) -> dict:
+        adjacency = {"index": pa.array(graph.indices)}
+        if graph.weights is not None:
+            adjacency["weight"] = pa.array(graph.weights)
+        tables = {"offsets": pa.table({"offset": pa.array(graph.offsets)}), "adjacency": pa.table(adjacency)}
+        if graph.labels is not None:
+            tables["labels"] = pa.table({"label": graph.labels})
+        return tables
+
+    @staticmethod
+    def write(fs, directory: str, graph: CSRGraph, codec="none") -> dict:
+        """Write ``graph`` into ``directory`` and return the manifest."""
+        tables = CSRGraphFormat.to_tables(graph)
+        manifest = {
+            "format": CSRGraphFormat.FORMAT,
+            "version": CSRGraphFormat.VERSION,
+            "compression": codec,
+            "directed": graph.directed,
+            "weight_attribute": graph.weight_attribute,
+            "tables": {name: {"file": CSRGraphFormat.FILES[name], "columns": table.column_names, "rows": table.num_rows}
+                       for name, table in tables.items()},
+        }
+        for name, table in tables.items():
+            ArrowGraphFormat.write_table(fs, os.path.join(directory, CSRGraphFormat.FILES[name]), table, codec)
+        with fs.open_output_stream(os.path.join(directory, ArrowGraphFormat.MANIFEST)) as f:
+            f.write(json.dumps(manifest).encode("utf-8"))
+        return manifest
+
+    @staticmethod
+    def read(fs, directory: str, manifest: dict, memory_map=False) -> CSRGraph:
+        def column(table, name):
+            path = os.path.join(directory, manifest["tables"][table]["file"])
+            if memory_map:
+                data = feather.read_table(path, columns=[name], memory_map=True)
+            else:
+                with fs.open_input_file(path) as f:
+                    data = feather.read_table(f, columns=[name])
+            return data.column(name).combine_chunks()
+
+        adjacency = manifest["tables"]["adjacency"]["columns"]
+        return CSRGraph(column("offsets", "offset").to_numpy(),
+                        column("adjacency", "index").to_numpy(),
+                        column("adjacency", "weight").to_numpy() if "weight" in adjacency else None,
+                        column("labels", "label") if "labels" in manifest["tables"] else None,
+                        manifest["directed"], manifest["weight_attribute"])
@@ -1,31 +1,174 @@
 import networkx as nx
-import hashlib
-import json
+
+from graphmassivizer.core.dataflow.csr_graph import CSRGraph
+from graphmassivizer.core.dataflow.graph_fingerprint import GraphFingerprint
 
 
 class GraphWrapper:
-    def __init__(self, graph: nx.Graph):
-        """Initialize GraphWrapper with a NetworkX graph."""
+    def __init__(self, graph: nx.Graph | CSRGraph, version=0, parent_id=None, delta=None, fingerprint=None):
+        """Initialize GraphWrapper with a NetworkX graph or an (immutable) CSRGraph.
+
+        :param version: position of the graph in its lineage, 0 for a graph without parent.
+        :param parent_id: graph_id of the version the graph was derived from.
+        :param delta: GraphDelta turning the parent into this graph, recorded by add/remove_edges_from.
+        :param fingerprint: GraphFingerprint of ``graph`` if it is already known.
+        """
         # TODO: we are prototyping with NetworkX - replace with adequate abstraction
         self.graph = graph
+        self.version = version
+        self.parent_id = parent_id
+        self.delta = delta if delta is not None else GraphDelta(graph.is_directed())
+        self.fingerprint = fingerprint
         self.graph_metadata = self.compute_metadata()
 
     def compute_metadata(self):
         """Computes a unique ID based on the graph's structure and content."""
-        # TODO: this must be reworked - it does not scale
-        graph_data = {
-            "nodes": sorted(self.graph.nodes()),
-            "edges": sorted(self.graph.edges(data=True))  # Include edge attributes if any
-        }
-        graph_json = json.dumps(graph_data, sort_keys=True)
-        return GraphMetadata(hashlib.md5(graph_json.encode()).hexdigest())
+        if self.fingerprint is None:
+            if isinstance(self.graph, CSRGraph):
+                self.fingerprint = GraphFingerprint.of_csr(self.graph)
+            else:
+                self.fingerprint = GraphFingerprint.of_graph(self.graph)
+        return GraphMetadata(self.fingerprint.hexdigest(), self.version, self.parent_id)
+
+    def derive(self):
+        """A new version of the graph: a copy whose edge changes are recorded in its delta against this one."""
+        self.__check_mutable()
+        return GraphWrapper(self.graph.copy(), self.version + 1, self.graph_metadata.graph_id,
+                            fingerprint=self.fingerprint.copy())
 
     def get_metadata(self):
         """Returns the graph metadata."""
         return self.graph_metadata
 
+    def add_edges_from(self, edges):
+        """Adds ``(u, v)`` or ``(u, v, data)`` edges and updates the metadata incrementally."""
+        self.__check_mutable()
+        edges = [(edge[0], edge[1], edge[2] if len(edge) > 2 else {}) for edge in edges]
+
+        new_nodes = {node for u, v, _ in edges for node in (u, v) if node not in self.graph}
+        self.fingerprint.add_nodes((node, {}) for node in new_nodes)
+        if not self.graph.is_multigraph():
+            # re-adding an edge updates its attributes, so its old contribution is replaced
+            self.fingerprint.remove_edges((u, v, self.graph.edges[u, v]) for u, v, _ in self.__unique(edges)
+                                          if self.graph.has_edge(u, v))
+
+        self.graph.add_edges_from(edges)
+        if self.graph.is_multigraph():
+            self.fingerprint.add_edges(edges)
+        else:
+            self.fingerprint.add_edges((u, v, self.graph.edges[u, v]) for u, v, _ in self.__unique(edges))
+        for u, v, data in edges:
+            self.delta.add_edge(u, v, data)
+        self.graph_metadata = GraphMetadata(self.fingerprint.hexdigest(), self.version, self.parent_id)
+
+    def remove_edges_from(self, edges):
+        """Removes ``(u, v)`` edges (the nodes are kept) and updates the metadata incrementally."""
+        self.__check_mutable()
+        edges = [(edge[0], edge[1], None) for edge in edges]
+        if not self.graph.is_multigraph():
+            edges = self.__unique(edges)
+
+        removed = []
+        for u, v, _ in edges:
+            if self.graph.has_edge(u, v):
+                data = self.graph.get_edge_data(u, v)
+                if self.graph.is_multigraph():
+                    # like nx.MultiGraph.remove_edges_from, removes the most recently added parallel edge
+                    data = data[list(data)[-1]]
+                removed.append((u, v, dict(data)))
+                self.graph.remove_edge(u, v)
+                self.delta.remove_edge(u, v)
+        self.fingerprint.remove_edges(removed)
+        self.graph_metadata = GraphMetadata(self.fingerprint.hexdigest(), self.version, self.parent_id)
+
+    def __check_mutable(self):
+        if isinstance(self.graph, CSRGraph):
+            raise TypeError("CSRGraph is immutable, convert it with to_networkx() to modify it")
+
+    def __unique(self, edges):
+        seen = set()
+        unique = []
+        for u, v, data in edges:
+            key = (u, v) if self.graph.is_directed() else frozenset((u, v))
+            if key not in seen:
+                seen.add(key)
+                unique.append((u, v, data))
+        return unique
+
     def __eq__(self, other) -> bool:
         """Checks if two GraphWrapper objects are the same based on their ID."""
         if not isinstance(other, GraphWrapper):
             return False
         return self.graph_metadata.graph_id == other.get_metadata().graph_id
+
+
+class GraphMetadata:
+    def __init__(self, graph_id: str, version=0, parent_id=None):
+        """Metadata describing the content of a graph.
+        :param graph_id: Content derived identifier, equal for graphs with equal structure and attributes.
+        :param version: position of the graph in its lineage.
+        :param parent_id: graph_id of the version the graph was derived from, None for an original graph.
+        """
+        self.graph_id = graph_id
+        self.version = version
+        self.parent_id = parent_id
+
+
+class GraphDelta:
+    """Edge changes turning one version of a graph into the next.
+
+    Only the net effect is kept: an edge is either added (with its attributes) or removed.
+    The endpoints of added edges are added as nodes, removed edges keep their nodes.
+    """
+
+    def __init__(self, directed=False):
+        self.directed = directed
+        self.added = {}
+        self.removed = {}
+        # endpoints of added edges, kept if the edge is removed again (like in the graph)
+        self.nodes = {}
+
+    def __key(self, u, v):
+        return (u, v) if self.directed else frozenset((u, v))
+
+    def add_edge(self, u, v, data=None):
+        key = self.__key(u, v)
+        self.removed.pop(key, None)
+        self.added[key] = (u, v, dict(data or {}))
+        self.nodes.update(dict.fromkeys((u, v)))
+
+    def remove_edge(self, u, v):
+        key = self.__key(u, v)
+        self.added.pop(key, None)
+        self.removed[key] = (u, v)
+
+    def get_added_edges(self) -> list:
+        """Added (or updated) edges as ``(u, v, data)``."""
+        return list(self.added.values())
+
+    def get_removed_edges(self) -> list:
+        return list(self.removed.values())
+
+    def apply(self, graph: nx.Graph) -> nx.Graph:
+        """Applies the changes to ``graph`` in place and returns it."""
+        graph.add_nodes_from(self.nodes)
+        graph.remove_edges_from([edge for edge in self.removed.values() if graph.has_edge(*edge)])
+        graph.add_edges_from(self.added.values())
+        return graph
+
+    @staticmethod
+    def between(old: nx.Graph, new: nx.Graph):
+        """The delta turning ``old`` into ``new``, both simple graphs (not multigraphs)."""
+        delta = GraphDelta(new.is_directed())
+        delta.nodes.update(dict.fromkeys(node for node in new if node not in old))
+        for u, v, data in new.edges(data=True):
+            if not old.has_edge(u, v) or old.edges[u, v] != data:
+                delta.add_edge(u, v, data)
+        for u, v in old.edges:
+            if not new.has_edge(u, v):
+                delta.remove_edge(u, v)
+        return delta
+
+    def __len__(self) -> int:
+        """Number of changed edges."""
+        return len(self.added) + len(self.removed)
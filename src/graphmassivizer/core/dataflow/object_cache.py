@@ -0,0 +1,149 @@
+from collections import OrderedDict
+import os
+import threading
+
+import pyarrow.fs as pafs
+
+from graphmassivizer.core.dataflow.data_manager import DataManager
+from graphmassivizer.core.dataflow.object_handle import ObjectHandle
+from graphmassivizer.core.dataflow.object_wrapper import ObjectWrapper, estimate_size
+
+
+class TieredObjectCache:
+    """Read-through cache of loaded objects in front of the (remote) store of a DataManager.
+
+    The first tier keeps loaded objects in memory, least recently used first evicted beyond
+    ``memory_bytes``. The optional second tier mirrors the stored files of objects into
+    ``local_dir``, from where they are memory-mapped, within ``disk_bytes``. Entries are
+    validated against the content hash recorded in the store, so objects rewritten by other
+    Task Managers are never served stale.
+
+    Objects served from memory are shared between callers and must not be modified in place.
+    """
+
+    def __init__(self, memory_bytes=256 << 20, local_dir=None, disk_bytes=None):
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.local = None if local_dir is None else DataManager(local_dir, pafs.LocalFileSystem())
+        self.lock = threading.Lock()
+        # (object path, columns) -> (content hash, object, size)
+        self.memory = OrderedDict()
+        self.memory_size = 0
+        # object path -> size of the local copy
+        self.disk = OrderedDict()
+        self.disk_size = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0,
+                      "memory_evictions": 0, "disk_evictions": 0, "invalidations": 0}
+        if self.local is not None:
+            self.__scan_local()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return dict(self.stats)
+
+    def load(self, data_manager, object_handle: ObjectHandle, columns=None) -> ObjectWrapper:
+        path = object_handle.get_object_path()
+        key = (path, None if columns is None else tuple(columns))
+        content_hash = data_manager.get_content_hash(object_handle)
+
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and entry[0] == content_hash:
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return ObjectWrapper(entry[1], object_handle)
+
+        if self.local is None:
+            self.__count("misses")
+            obj = data_manager.load_from_store(object_handle, columns).get_object()
+            size = data_manager.get_object_size(object_handle)
+        else:
+            if path in self.disk and self.local.get_content_hash(object_handle) == content_hash:
+                self.__count("disk_hits")
+                with self.lock:
+                    self.disk.move_to_end(path)
+            else:
+                self.__count("misses")
+                self.__copy_to_local(data_manager, object_handle)
+            obj = self.local.load_object(object_handle, columns).get_object()
+            size = self.disk.get(path, 0)
+
+        self.put(object_handle, obj, content_hash, columns, size)
+        return ObjectWrapper(obj, object_handle)
+
+    @staticmethod
+    def estimate_size(obj, stored_size=0) -> int:
+        """Approximate memory footprint of a loaded object, see object_wrapper.estimate_size."""
+        return estimate_size(obj, stored_size)
+
+    def put(self, object_handle: ObjectHandle, obj, content_hash: str, columns=None, size=0):
+        """Keep a loaded (or just persisted) object in memory.
+
+        The memory tier is charged its estimate_size, ``size`` is the stored size of the object.
+        """
+        size = self.estimate_size(obj, size)
+        if size > self.memory_bytes:
+            return
+        key = (object_handle.get_object_path(), None if columns is None else tuple(columns))
+        with self.lock:
+            if key in self.memory:
+                self.memory_size -= self.memory.pop(key)[2]
+            self.memory[key] = (content_hash, obj, size)
+            self.memory_size += size
+            while self.memory_size > self.memory_bytes:
+                _, (_, _, evicted_size) = self.memory.popitem(last=False)
+                self.memory_size -= evicted_size
+                self.stats["memory_evictions"] += 1
+
+    def invalidate(self, object_handle: ObjectHandle):
+        """Drop all cached copies of the object, e.g. because it is being rewritten."""
+        path = object_handle.get_object_path()
+        with self.lock:
+            for key in [key for key in self.memory if key[0] == path]:
+                self.memory_size -= self.memory.pop(key)[2]
+                self.stats["invalidations"] += 1
+            size = self.disk.pop(path, None)
+            if size is not None:
+                self.disk_size -= size
+                self.stats["invalidations"] += 1
+        if size is not None:
+            self.local.delete_object(object_handle)
+
+    def __count(self, counter):
+        with self.lock:
+            self.stats[counter] += 1
+
+    def __copy_to_local(self, data_manager, object_handle: ObjectHandle):
+        path = object_handle.get_object_path()
+        self.invalidate(object_handle)
+        directory = self.local.get_object_directory(object_handle, create=True)
+        files = sorted(data_manager.list_object_files(object_handle),
+                       key=lambda info: info.base_name == DataManager.HASH_FILE)
+        # the content hash is copied last, so an interrupted copy is never taken for valid
+        for info in files:
+            pafs.copy_files(info.path, os.path.join(directory, info.base_name),
+                            source_filesystem=data_manager.fs, destination_filesystem=self.local.fs)
+
+        evicted = []
+        with self.lock:
+            self.disk[path] = sum(info.size for info in files)
+            self.disk_size += self.disk[path]
+            while self.disk_bytes is not None and self.disk_size > self.disk_bytes and len(self.disk) > 1:
+                evicted_path, evicted_size = self.disk.popitem(last=False)
+                self.disk_size -= evicted_size
+                self.stats["disk_evictions"] += 1
+                evicted.append(evicted_path)
+        for evicted_path in evicted:
+            self.local.delete_object(ObjectHandle(evicted_path))
+
+    def __scan_local(self):
+        # pick up the copies left by an earlier process, oldest first
+        selector = pafs.FileSelector(self.local.base_dir, recursive=True, allow_not_found=True)
+        entries = []
+        for info in self.local.fs.get_file_info(selector):
+            if info.type == pafs.FileType.File and info.base_name == DataManager.HASH_FILE:
+                handle = ObjectHandle(os.path.relpath(os.path.dirname(info.path), self.local.base_dir))
+                entries.append((info.mtime, handle.get_object_path(), self.local.get_object_size(handle)))
+        for _, path, size in sorted(entries):
+            self.disk[path] = size
+            self.disk_size += size
@@ -1,7 +1,11 @@
+from __future__ import annotations
+
 import hashlib
 import os
 
-from graphmassivizer.core.dataflow import BGO
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from graphmassivizer.core.dataflow.BGO import BGO
 
 
 class ObjectHandle:
@@ -22,4 +26,5 @@ class ObjectHandle:
         """Provides a unique directory name that corresponds the BGO.
         :return: The directory name.
         """
-        return hashlib.md5(bgo.__name__.encode()).hexdigest()
+        name = getattr(bgo, "__name__", type(bgo).__name__)  # BGO classes as well as instances
+        return hashlib.md5(name.encode()).hexdigest()
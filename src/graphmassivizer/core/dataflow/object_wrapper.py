@@ -1,6 +1,33 @@
+import threading
+
+from graphmassivizer.core.dataflow.csr_graph import CSRGraph
+from graphmassivizer.core.dataflow.graph_wrapper import GraphMetadata
 from graphmassivizer.core.dataflow.object_handle import ObjectHandle
 import networkx as nx
 
+# Footprint of NetworkX graphs, measured with tracemalloc on random graphs: a node with its attribute
+# and adjacency dicts, an edge (stored in the adjacency of both endpoints) and one attribute of an edge
+NETWORKX_NODE_BYTES = 270
+NETWORKX_EDGE_BYTES = 140
+NETWORKX_ATTRIBUTE_BYTES = 120
+
+
+def estimate_size(obj, stored_size=0) -> int:
+    """Approximate memory footprint of a loaded object.
+
+    The stored size is only used for objects other than graphs, it may be much smaller than the
+    footprint since stored objects are compressed.
+    """
+    if isinstance(obj, CSRGraph):
+        return obj.nbytes
+    if isinstance(obj, nx.Graph):
+        # attributes are counted as if all nodes and edges had the ones of the first
+        node_attributes = len(next(iter(obj.nodes.values()), {}))
+        edge_attributes = len(next(iter(obj.edges(data=True)), (None, None, {}))[-1])
+        return (obj.number_of_nodes() * (NETWORKX_NODE_BYTES + node_attributes * NETWORKX_ATTRIBUTE_BYTES)
+                + obj.number_of_edges() * (NETWORKX_EDGE_BYTES + edge_attributes * NETWORKX_ATTRIBUTE_BYTES))
+    return stored_size
+
 
 class ObjectWrapper:
     def __init__(self, object: nx.Graph, object_handle: ObjectHandle):
@@ -12,3 +39,39 @@ class ObjectWrapper:
 
     def get_object_handle(self):
         return self.object
+
+
+class LazyObjectWrapper(ObjectWrapper):
+    def __init__(self, data_manager, object_handle: ObjectHandle, columns=None):
+        """Wrapper of a persisted object that is only loaded by the DataManager on the first get_object() call.
+
+        Size, content hash and (for columnar objects) the manifest are read without loading the object.
+        """
+        super().__init__(None, object_handle)
+        self.data_manager = data_manager
+        self.columns = columns
+        self.__object = None
+        self.__loaded = False
+        self.__lock = threading.Lock()
+
+    def get_object(self):
+        if not self.__loaded:
+            with self.__lock:
+                if not self.__loaded:
+                    self.__object = self.data_manager.load_object(self.object, columns=self.columns).get_object()
+                    self.__loaded = True
+        return self.__object
+
+    def is_loaded(self) -> bool:
+        return self.__loaded
+
+    def get_size(self) -> int:
+        """Number of bytes the object occupies in the store."""
+        return self.data_manager.get_object_size(self.object)
+
+    def get_metadata(self) -> GraphMetadata:
+        return GraphMetadata(self.data_manager.get_content_hash(self.object))
+
+    def get_manifest(self):
+        """Manifest of a columnar object (graph type, tables, columns and row counts), None for pickled objects."""
+        return self.data_manager.get_manifest(self.object)
@@ -0,0 +1,91 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from graphmassivizer.core.dataflow.object_wrapper import estimate_size
+
+
+class Prefetcher:
+    """Loads objects ahead of use on a background I/O thread.
+
+    Prefetched objects are held until they are taken, together at most ``memory_bytes``. A fetch
+    reserves the stored size of the object, and is charged the estimated footprint of the loaded object
+    (see object_wrapper.estimate_size) once it is loaded. Objects that do not fit are skipped and loaded
+    on demand as usual.
+    """
+
+    def __init__(self, load, get_size, memory_bytes: int):
+        """
+        :param load: loads an object, called as ``load(object_handle, columns)``.
+        :param get_size: returns the stored size of an object.
+        """
+        self.load = load
+        self.get_size = get_size
+        self.memory_bytes = memory_bytes
+        self.used_bytes = 0
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        self.stats = {"prefetched": 0, "taken": 0, "skipped": 0, "discarded": 0}
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return dict(self.stats)
+
+    def submit(self, object_handle, columns=None):
+        key = (object_handle.get_object_path(), None if columns is None else tuple(columns))
+        with self.lock:
+            if key not in self.pending:
+                self.pending[key] = self.executor.submit(self.__fetch, object_handle, columns)
+
+    def take(self, object_handle, columns=None):
+        """The prefetched ObjectWrapper, waiting for an ongoing fetch. None if nothing was prefetched."""
+        key = (object_handle.get_object_path(), None if columns is None else tuple(columns))
+        with self.lock:
+            future = self.pending.pop(key, None)
+        if future is None:
+            return None
+        try:
+            object_wrapper, size = future.result()
+        except Exception:
+            return None  # the caller's own load reports the error
+        with self.lock:
+            self.used_bytes -= size
+            if object_wrapper is not None:
+                self.stats["taken"] += 1
+        return object_wrapper
+
+    def discard(self, object_handle):
+        """Drop prefetched copies of an object, e.g. because it is being rewritten."""
+        with self.lock:
+            futures = [self.pending.pop(key) for key in list(self.pending) if key[0] == object_handle.get_object_path()]
+        for future in futures:
+            if not future.cancel():
+                _, size = future.result() if future.exception() is None else (None, 0)
+                with self.lock:
+                    self.used_bytes -= size
+            with self.lock:
+                self.stats["discarded"] += 1
+
+    def __fetch(self, object_handle, columns):
+        size = self.get_size(object_handle)
+        with self.lock:
+            if self.used_bytes + size > self.memory_bytes:
+                self.stats["skipped"] += 1
+                return None, 0
+            self.used_bytes += size
+        try:
+            object_wrapper = self.load(object_handle, columns)
+        except Exception:
+            with self.lock:
+                self.used_bytes -= size
+            raise
+        loaded_size = estimate_size(object_wrapper.get_object(), size)
+        with self.lock:
+            # a loaded graph is many times larger than its compressed stored form
+            self.used_bytes += loaded_size - size
+            if self.used_bytes > self.memory_bytes:
+                self.used_bytes -= loaded_size
+                self.stats["skipped"] += 1
+                return None, 0
+            self.stats["prefetched"] += 1
+        return object_wrapper, loaded_size
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+import pyarrow.fs as pafs
+
+from graphmassivizer.core.dataflow.object_handle import ObjectHandle
+
+
+class ResultCache:
+    """Content-addressed cache of BGO results kept in the store of a DataManager.
+
+    An entry is keyed on the content hash of the input object, the BGO's ``implementationId``
+    and its arguments, and points to the ObjectHandle the result was persisted to. Entries are
+    evicted (and their objects deleted) once they are older than ``max_age`` seconds, or least
+    recently used first when more than ``max_entries`` entries or ``max_bytes`` bytes are cached.
+
+    Several processes (e.g. Task Managers) may share the index in the store: it is merged with the
+    stored index before it is written, and replaced atomically. Hits only update the access time in
+    memory, it is persisted with the next write.
+    """
+
+    INDEX = "index.json"
+
+    def __init__(self, data_manager, max_entries=None, max_bytes=None, max_age=None, cache_dir="_cache"):
+        self.data_manager = data_manager
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.index_path = os.path.join(data_manager.base_dir, cache_dir, self.INDEX)
+        self.lock = threading.Lock()
+        self.entries = self.__read_index()
+        # keys removed since the index was last written, so that merging does not bring them back
+        self.removed = set()
+
+    def get_key(self, bgo, input_handle: ObjectHandle) -> str:
+        """Cache key of applying ``bgo`` to the object behind ``input_handle``."""
+        return self.get_content_key(bgo, self.data_manager.get_content_hash(input_handle))
+
+    def get_content_key(self, bgo, content_hash: str) -> str:
+        """Cache key of applying ``bgo`` to an object with the given content hash."""
+        implementation_id = getattr(bgo, "implementationId", None) or type(bgo).__name__
+        args = json.dumps(bgo.get_args(), sort_keys=True, default=str)
+        return hashlib.sha256("|".join([content_hash, implementation_id, args]).encode()).hexdigest()
+
+    def lookup(self, bgo, input_handle: ObjectHandle):
+        """Returns the handle of the cached result, or None if the result has to be computed."""
+        return self.lookup_content(bgo, self.data_manager.get_content_hash(input_handle))
+
+    def peek(self, bgo, input_handle: ObjectHandle):
+        """Like lookup, but without side effects (no eviction, access time or index update), e.g. for planning."""
+        key = self.get_key(bgo, input_handle)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None and key not in self.removed:
+                entry = self.__read_index().get(key)
+        if entry is None or (self.max_age is not None and time.time() - entry["created"] > self.max_age):
+            return None
+        output_handle = ObjectHandle(entry["output"])
+        if (not self.data_manager.exists(output_handle)
+                or self.data_manager.get_content_hash(output_handle) != entry["content_hash"]):
+            return None
+        return output_handle
+
+    def lookup_content(self, bgo, content_hash: str):
+        """Like lookup, for an input that may no longer be stored, e.g. the previous version of a graph."""
+        key = self.get_content_key(bgo, content_hash)
+        with self.lock:
+            if key not in self.entries:
+                # it may have been stored by another process since the index was read
+                self.__merge(self.__read_index())
+            if self.__evict_expired(time.time()):
+                self.__write_index()
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            output_handle = ObjectHandle(entry["output"])
+            # the output path only depends on the BGO name, so it may have been overwritten since
+            if (not self.data_manager.exists(output_handle)
+                    or self.data_manager.get_content_hash(output_handle) != entry["content_hash"]):
+                del self.entries[key]
+                self.removed.add(key)
+                self.__write_index()
+                return None
+
+            entry["last_access"] = time.time()
+            return output_handle
+
+    def store(self, bgo, input_handle: ObjectHandle, output_handle: ObjectHandle):
+        """Record that ``output_handle`` holds the result of applying ``bgo`` to ``input_handle``."""
+        key = self.get_key(bgo, input_handle)
+        now = time.time()
+        entry = {
+            "output": output_handle.get_object_path(),
+            "content_hash": self.data_manager.get_content_hash(output_handle),
+            "size": self.data_manager.get_object_size(output_handle),
+            "created": now,
+            "last_access": now,
+        }
+        with self.lock:
+            self.entries[key] = entry
+            self.removed.discard(key)
+            self.__evict_expired(now)
+            self.__evict_to_capacity(keep=key)
+            self.__write_index()
+
+    def get_size(self) -> int:
+        """Number of bytes held by cached results."""
+        with self.lock:
+            return sum(entry["size"] for entry in self.entries.values())
+
+    def __evict_expired(self, now) -> bool:
+        if self.max_age is None:
+            return False
+        expired = [key for key, entry in self.entries.items() if now - entry["created"] > self.max_age]
+        for key in expired:
+            self.__evict(key)
+        return bool(expired)
+
+    def __evict_to_capacity(self, keep):
+        def over_capacity():
+            if self.max_entries is not None and len(self.entries) > self.max_entries:
+                return True
+            return self.max_bytes is not None and sum(e["size"] for e in self.entries.values()) > self.max_bytes
+
+        while over_capacity():
+            candidates = [key for key in self.entries if key != keep]
+            if not candidates:
+                break
+            self.__evict(min(candidates, key=lambda key: self.entries[key]["last_access"]))
+
+    def __evict(self, key):
+        entry = self.entries.pop(key)
+        self.removed.add(key)
+        # another entry may point to the same output if it was recomputed with identical content
+        if not any(other["output"] == entry["output"] for other in self.entries.values()):
+            self.data_manager.delete_object(ObjectHandle(entry["output"]))
+
+    def __read_index(self) -> dict:
+        if self.data_manager.fs.get_file_info(self.index_path).type == pafs.FileType.NotFound:
+            return {}
+        with self.data_manager.fs.open_input_stream(self.index_path) as f:
+            return json.loads(f.read().decode("utf-8"))
+
+    def __merge(self, stored: dict):
+        """Adds the entries of another process, for keys cached by both the more recent result wins."""
+        for key, other in stored.items():
+            if key in self.removed:
+                continue
+            entry = self.entries.get(key)
+            if entry is None or other["created"] > entry["created"]:
+                if entry is not None:
+                    other["last_access"] = max(other["last_access"], entry["last_access"])
+                self.entries[key] = other
+            else:
+                entry["last_access"] = max(other["last_access"], entry["last_access"])
+
+    def __write_index(self):
+        fs = self.data_manager.fs
+        fs.create_dir(os.path.dirname(self.index_path), recursive=True)
+        self.__merge(self.__read_index())
+        self.removed.clear()
+        # readers (and other writers) never see a partially written index
+        temporary = f"{self.index_path}.{uuid.uuid4().hex}.tmp"
+        with fs.open_output_stream(temporary) as f:
+            f.write(json.dumps(self.entries).encode("utf-8"))
+        fs.move(temporary, self.index_path)
@@ -1,25 +1,126 @@
+from graphmassivizer.core.dataflow.dag_executor import DAGExecutor, ExecutionReport
 from graphmassivizer.core.dataflow.data_manager import DataManager
+from graphmassivizer.core.dataflow.execution_plan import ExecutionPlan, PlanStep
+from graphmassivizer.core.dataflow.object_handle import ObjectHandle
+from graphmassivizer.core.dataflow.result_cache import ResultCache
 from graphmassivizer.core.dataflow.BGO import BGO
 
 class WorkflowStep:
-    def __init__(self, data_manager: DataManager, operation: BGO):
+    def __init__(self, data_manager: DataManager, operation: BGO, result_cache: ResultCache = None, name=None):
         self.data_manager = data_manager
         self.operation = operation
+        self.result_cache = result_cache
+        self.name = name or getattr(operation, "implementationId", None) or type(operation).__name__
+
+    def prefetch(self, input):
+        """Start loading (one of) the input(s) in the background, if the DataManager prefetches."""
+        for handle in input if isinstance(input, list) else [input]:
+            self.data_manager.prefetch(handle)
+
+    def release_prefetch(self, input):
+        """Drop what prefetch loaded but process did not use, e.g. because the result was cached."""
+        for handle in input if isinstance(input, list) else [input]:
+            self.data_manager.release_prefetch(handle)
+
+    def plan(self, input: ObjectHandle, estimator=None, input_bytes=None) -> PlanStep:
+        """Describes the execution without running it, see BGO.plan. Cached steps point to the cached result."""
+        cached_output = None
+        if self.result_cache is not None and not isinstance(input, list) and self.data_manager.exists(input):
+            cached_output = self.result_cache.peek(self.operation, input)
+
+        plan_step = self.operation.plan(self.data_manager, input, estimator, input_bytes, cached_output is not None)
+        plan_step.name = self.name
+        if cached_output is not None:
+            plan_step.output_handle = cached_output
+        return plan_step
 
     def process(self, input: ObjectHandle, dry_run=False) -> ObjectHandle:
-        """Executes the operation and determines output directory."""
-        return self.operation.execute(self.data_manager, input, dry_run)
+        """Executes the operation and determines output directory.
+
+        With a result cache, the handle of an earlier result for the same input content,
+        BGO implementation and arguments is returned without executing the operation. If the input
+        is a new version of a graph whose parent version was processed before, operations that
+        support deltas update the earlier result instead of recomputing it.
+        """
+        if dry_run:
+            return self.plan(input).output_handle
+        if self.result_cache is None or isinstance(input, list):
+            return self.operation.execute(self.data_manager, input)
+
+        cached_output = self.result_cache.lookup(self.operation, input)
+        if cached_output is not None:
+            self.release_prefetch(input)
+            return cached_output
+
+        output = self.__process_delta(input) if self.operation.supports_delta else None
+        if output is None:
+            output = self.operation.execute(self.data_manager, input)
+        self.result_cache.store(self.operation, input, output)
+        return output
+
+    def __process_delta(self, input: ObjectHandle):
+        """Incrementally updates the cached result of the input's parent version, None if there is none."""
+        parent_id = self.data_manager.get_metadata(input).parent_id
+        if parent_id is None:
+            return None
+        previous_output = self.result_cache.lookup_content(self.operation, parent_id)
+        if previous_output is None:
+            return None
+        delta = self.data_manager.load_delta(input)
+        return self.operation.execute_delta(self.data_manager, input, previous_output, delta)
 
 class Workflow:
-    def __init__(self, steps):
+    def __init__(self, steps, dependencies=None, executor: DAGExecutor = None):
+        """A DAG of workflow steps.
+
+        :param dependencies: maps a step to the steps whose outputs it consumes. Without it the steps form a chain in
+            list order. Only steps whose BGO supports multiple inputs (see BGO.process_graphs) can consume several.
+        :param executor: runs independent steps concurrently, a DAGExecutor with a default thread pool if None.
+        :raises ValueError: if a step consumes several outputs its BGO cannot combine.
+        """
         self.steps = steps
+        if dependencies is None:
+            dependencies = {step: [previous] for previous, step in zip(steps, steps[1:])}
+        for step, predecessors in dependencies.items():
+            if len(predecessors) > 1 and not step.operation.supports_multiple_inputs:
+                raise ValueError(f"Step {step.name} depends on {len(predecessors)} steps, "
+                                 f"but {type(step.operation).__name__} does not support multiple inputs")
+        self.dependencies = dependencies
+        self.executor = executor or DAGExecutor()
+        self.last_report = None
+
+    def execute(self, input: ObjectHandle, dry_run=False) -> ExecutionReport:
+        """Runs all steps on the input and reports their outputs and timings."""
+        self.last_report = self.executor.execute(self.steps, self.dependencies, input, dry_run)
+        return self.last_report
+
+    def plan(self, input: ObjectHandle, estimator=None) -> ExecutionPlan:
+        """Plans the workflow on the input without executing anything.
+
+        :param estimator: estimates the runtime and memory of BGOs, see BGO.plan. Steps whose input is not
+            computed yet assume it is as large as the input of the step producing it.
+        """
+        order = DAGExecutor.topological_order(self.steps, self.dependencies)
+        plan_steps = {}
+        for step in order:
+            predecessors = [plan_steps[p] for p in self.dependencies.get(step, [])]
+            if not predecessors:
+                plan_steps[step] = step.plan(input, estimator)
+            elif len(predecessors) == 1:
+                plan_steps[step] = step.plan(predecessors[0].output_handle, estimator, predecessors[0].input_bytes)
+            else:
+                input_bytes = None if any(p.input_bytes is None for p in predecessors) else sum(p.input_bytes for p in predecessors)
+                plan_steps[step] = step.plan([p.output_handle for p in predecessors], estimator, input_bytes)
+        dependencies = {plan_steps[step]: [plan_steps[p] for p in self.dependencies.get(step, [])] for step in order}
+        return ExecutionPlan([plan_steps[step] for step in order], dependencies)
 
-    def run(self, input: ObjectHandle, dry_run=False) -> ObjectHandle:
-        """Runs the workflow on the input file and determines output paths."""
-        current_input = input
+    def run(self, input: ObjectHandle, dry_run=False):
+        """Runs the workflow on the input file and returns the output of the step no other step depends on.
 
-        # TODO: is this meant to be a DAG? Adapt the looping to respect that.
-        for step in self.steps:
-            step_output_dir = step.process(current_input, dry_run=dry_run)
-            current_input = step_output_dir  # Assume next step uses this output
-        return current_input  # Final output directory
+        If there are several such sink steps, the list of their outputs is returned, in the order of ``steps``.
+        With ``dry_run`` nothing is executed and only the output paths are determined, see plan for estimates.
+        """
+        outputs = self.execute(input, dry_run).outputs
+        consumed = {predecessor for predecessors in self.dependencies.values() for predecessor in predecessors}
+        sinks = [outputs[step] for step in self.steps if step not in consumed]
+        return sinks[0] if len(sinks) == 1 else sinks
@@ -0,0 +1,108 @@
+"""Create, register and unregister throughput of mutable and frozen descriptors.
+
+Without --hosts the descriptors are registered through a client that acknowledges every request
+without a server, which measures the client-side cost (ids, encoding, building transactions) only,
+e.g. ``python -m graphmassivizer.core.descriptors.descriptor_benchmark --count 100000``.
+"""
+import argparse
+import time
+import tracemalloc
+
+from graphmassivizer.core.descriptors.descriptors import BGODescriptor, FrozenBGODescriptor
+from graphmassivizer.core.zookeeper.zookeeper_state_manager import ZookeeperStateManager
+
+
+class _Stat:
+	version = 1
+
+
+class _NullTransaction:
+	def __init__(self):
+		self.results = []
+
+	def create(self, path, value=b""):
+		self.results.append(path)
+
+	def set_data(self, path, value, version=-1):
+		self.results.append(_Stat())
+
+	def delete(self, path, version=-1):
+		self.results.append(True)
+
+	def commit(self):
+		return self.results
+
+
+class _NullClient:
+	def add_listener(self, listener):
+		pass
+
+	def ensure_path(self, path):
+		return True
+
+	def transaction(self):
+		return _NullTransaction()
+
+
+VARIANTS = {
+	# mutable descriptors created without a state manager are not registered on creation
+	"mutable": lambda id: BGODescriptor(id, f"input/{id}", f"output/{id}"),
+	"frozen": lambda id: FrozenBGODescriptor(id, f"input/{id}", f"output/{id}"),
+}
+
+
+def benchmark(manager: ZookeeperStateManager, count=100000, variants=None) -> list:
+	"""One result row per variant: operations per second and bytes allocated per descriptor."""
+	rows = []
+	for variant in variants or VARIANTS:
+		create = VARIANTS[variant]
+		tracemalloc.start()
+		start = time.perf_counter()
+		descriptors = [create(id) for id in range(count)]
+		create_time = time.perf_counter() - start
+		allocated, _ = tracemalloc.get_traced_memory()
+		tracemalloc.stop()
+
+		start = time.perf_counter()
+		manager.register_descriptors(descriptors)
+		register_time = time.perf_counter() - start
+
+		start = time.perf_counter()
+		manager.unregister_descriptors(descriptors)
+		unregister_time = time.perf_counter() - start
+
+		rows.append({
+			"variant": variant, "count": count, "create_s": count / create_time,
+			"register_s": count / register_time, "unregister_s": count / unregister_time,
+			"bytes": allocated / count,
+		})
+	return rows
+
+
+def format_rows(rows) -> str:
+	lines = [f"{'variant':<8} {'count':>8} {'create/s':>10} {'register/s':>11} {'unregister/s':>13} {'bytes':>7}"]
+	for row in rows:
+		lines.append(
+			f"{row['variant']:<8} {row['count']:>8} {row['create_s']:>10.0f} {row['register_s']:>11.0f} "
+			f"{row['unregister_s']:>13.0f} {row['bytes']:>7.0f}")
+	return "\n".join(lines)
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--count", type=int, default=100000, help="descriptors per variant")
+	parser.add_argument("--hosts", help="ZooKeeper ensemble to register with, e.g. localhost:2181")
+	parser.add_argument("--compact", action="store_true", help="store descriptors in a single znode each")
+	args = parser.parse_args(argv)
+
+	client = None if args.hosts else _NullClient()
+	manager = ZookeeperStateManager(args.hosts, client=client, compact_descriptors=args.compact)
+	try:
+		print(format_rows(benchmark(manager, args.count)))
+	finally:
+		if args.hosts:
+			manager.stop()
+
+
+if __name__ == "__main__":
+	main()
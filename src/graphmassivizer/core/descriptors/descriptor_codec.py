@@ -0,0 +1,177 @@
+"""Compact binary encoding of a whole descriptor, stored in a single znode.
+
+Layout: ``MAGIC``, a schema version byte and a map. A map is the number of entries followed
+by ``key, value`` pairs, keys are length-prefixed UTF-8. A value is a type tag followed by its
+payload: length-prefixed bytes for strings and blobs, a zigzag varint for integers, 8 bytes for
+floats, nothing for booleans and None, and a length-prefixed map or list for nested values, so
+readers can skip values they do not access.
+"""
+import struct
+from collections.abc import Mapping
+
+MAGIC = b"GMD"
+VERSION = 1
+
+NONE, FALSE, TRUE, INT, FLOAT, STR, BYTES, MAP, LIST = range(9)
+
+
+def is_compact(data) -> bool:
+	return data is not None and bytes(data[:len(MAGIC)]) == MAGIC
+
+
+def encode(values: dict) -> bytes:
+	out = bytearray(MAGIC)
+	out.append(VERSION)
+	_write_map(out, values)
+	return bytes(out)
+
+
+def decode(data) -> "DescriptorView":
+	""":raises ValueError: if ``data`` is not a compact descriptor of a supported version."""
+	if not is_compact(data):
+		raise ValueError("Not a compact descriptor")
+	if data[len(MAGIC)] != VERSION:
+		raise ValueError(f"Unsupported compact descriptor version {data[len(MAGIC)]}")
+	return DescriptorView(memoryview(data)[len(MAGIC) + 1:])
+
+
+def _write_varint(out: bytearray, value: int):
+	while value > 0x7f:
+		out.append((value & 0x7f) | 0x80)
+		value >>= 7
+	out.append(value)
+
+
+def _read_varint(data, offset: int):
+	value = shift = 0
+	while True:
+		byte = data[offset]
+		offset += 1
+		value |= (byte & 0x7f) << shift
+		if byte < 0x80:
+			return value, offset
+		shift += 7
+
+
+def _write_bytes(out: bytearray, value: bytes):
+	_write_varint(out, len(value))
+	out += value
+
+
+def _write_map(out: bytearray, values: dict):
+	_write_varint(out, len(values))
+	for key, value in values.items():
+		_write_bytes(out, str(key).encode())
+		_write_value(out, value)
+
+
+def _write_value(out: bytearray, value):
+	if value is None:
+		out.append(NONE)
+	elif isinstance(value, bool):
+		out.append(TRUE if value else FALSE)
+	elif isinstance(value, int):
+		out.append(INT)
+		_write_varint(out, (value << 1) if value >= 0 else ((-value << 1) - 1))
+	elif isinstance(value, float):
+		out.append(FLOAT)
+		out += struct.pack("<d", value)
+	elif isinstance(value, str):
+		out.append(STR)
+		_write_bytes(out, value.encode())
+	elif isinstance(value, (bytes, bytearray)):
+		out.append(BYTES)
+		_write_bytes(out, bytes(value))
+	elif isinstance(value, (dict, list, tuple)):
+		nested = bytearray()
+		if isinstance(value, dict):
+			out.append(MAP)
+			_write_map(nested, value)
+		else:
+			out.append(LIST)
+			_write_varint(nested, len(value))
+			for item in value:
+				_write_value(nested, item)
+		_write_bytes(out, nested)
+	elif hasattr(value, "to_dict"):
+		# nested descriptor
+		_write_value(out, value.to_dict())
+	else:
+		raise TypeError(f"Cannot encode value of type {type(value).__name__}")
+
+
+def _skip_value(data, offset: int) -> int:
+	tag = data[offset]
+	offset += 1
+	if tag in (NONE, FALSE, TRUE):
+		return offset
+	if tag == INT:
+		return _read_varint(data, offset)[1]
+	if tag == FLOAT:
+		return offset + 8
+	length, offset = _read_varint(data, offset)
+	return offset + length
+
+
+def _read_value(data, offset: int):
+	tag = data[offset]
+	offset += 1
+	if tag in (NONE, FALSE, TRUE):
+		return (None, False, True)[tag]
+	if tag == INT:
+		value, _ = _read_varint(data, offset)
+		return (value >> 1) ^ -(value & 1)
+	if tag == FLOAT:
+		return struct.unpack_from("<d", data, offset)[0]
+	length, offset = _read_varint(data, offset)
+	payload = data[offset:offset + length]
+	if tag == STR:
+		return str(payload, "utf-8")
+	if tag == BYTES:
+		return bytes(payload)
+	if tag == MAP:
+		return DescriptorView(payload)
+	if tag == LIST:
+		count, offset = _read_varint(payload, 0)
+		items = []
+		for _ in range(count):
+			items.append(_read_value(payload, offset))
+			offset = _skip_value(payload, offset)
+		return items
+	raise ValueError(f"Unknown value tag {tag}")
+
+
+class DescriptorView(Mapping):
+	"""Read-only mapping over an encoded map: keys are indexed on first access, values decoded when accessed."""
+
+	def __init__(self, data: memoryview):
+		self.data = data
+		self.offsets = None
+		self.values = {}
+
+	def __index(self):
+		if self.offsets is None:
+			offsets = {}
+			count, offset = _read_varint(self.data, 0)
+			for _ in range(count):
+				length, offset = _read_varint(self.data, offset)
+				key = str(self.data[offset:offset + length], "utf-8")
+				offsets[key] = offset + length
+				offset = _skip_value(self.data, offset + length)
+			self.offsets = offsets
+		return self.offsets
+
+	def __getitem__(self, key):
+		if key not in self.values:
+			self.values[key] = _read_value(self.data, self.__index()[key])
+		return self.values[key]
+
+	def __iter__(self):
+		return iter(self.__index())
+
+	def __len__(self):
+		return len(self.__index())
+
+	def to_dict(self) -> dict:
+		"""Decodes all values, nested maps included."""
+		return {key: value.to_dict() if isinstance(value, DescriptorView) else value for key, value in self.items()}
@@ -35,5 +35,8 @@ class DescriptorListener:
     def get_id(self):
         return self.id
 
+    def is_active(self):
+        return self.callback.active
+
     def set_active(self, active):
         self.callback.set_active(active)
@@ -5,12 +5,18 @@ import hashlib
 import uuid
 from abc import ABC, abstractmethod
 
+from graphmassivizer.core.descriptors import descriptor_codec
 from graphmassivizer.core.zookeeper.zookeeper_state_manager import ZookeeperStateManager
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 import hashlib
 import os
 
+def descriptor_id(dictionary) -> str:
+	"""Content derived id of a descriptor: the MD5 of its ``key=value`` pairs in key order."""
+	return hashlib.md5('-'.join([f"{key}={value}" for key, value in sorted(dictionary.items(), key=lambda item: item[0])]).encode()).hexdigest()
+
+
 class Descriptor(ABC):
 	def __init__(self, zk_state_manager: ZookeeperStateManager):
 		if not isinstance(zk_state_manager, ZookeeperStateManager):
@@ -19,16 +25,13 @@ class Descriptor(ABC):
 		self.zk_state_manager.register_descriptor(self)
 
 	def __del__(self):
-		if hasattr(self, 'zk_state_manager'): self.zk_state_manager.unregister_descriptor(self)
+		if getattr(self, 'zk_state_manager', None) is not None: self.zk_state_manager.unregister_descriptor(self)
 
 	def to_dict(self) -> dict[str, str]:
 		return self.__dict__
 
 	def get_id(self) -> str:
-		dictionary = self.to_dict()
-		sorted_by_values = sorted(dictionary.items(), key=lambda item: str(item[1]))  # Ensure all values are str
-		sorted_tuples = sorted(sorted_by_values, key=lambda item: item[0])
-		return hashlib.md5('-'.join([f"{key}={value}" for key, value in sorted_tuples]).encode()).hexdigest()
+		return descriptor_id(self.to_dict())
 
 	@abstractmethod
 	def get_descriptor_category(self):
@@ -36,7 +39,9 @@ class Descriptor(ABC):
 		pass
 
 	def register_listener(self, listener):
-		return None  # TODO: implement
+		"""Calls the listener's callback whenever the watched property of this descriptor changes in ZooKeeper."""
+		self.zk_state_manager.register_descriptor_listener(listener)
+		return listener
 
 
 @dataclass
@@ -153,10 +158,12 @@ class BGODescriptor(Descriptor):
 	ID: int
 	input_path: str #TODO replace by ObjectHandle
 	output_path: str #TODO replace by ObjectHandle
-	zk_state_manager: ZookeeperStateManager = field(init=False)
+	zk_state_manager: ZookeeperStateManager = field(init=False, default=None)
 
 	def __post_init__(self):
-		super().__init__(self.zk_state_manager)  # Initialize superclass
+		# registered by create() once the state manager is assigned
+		if self.zk_state_manager is not None:
+			super().__init__(self.zk_state_manager)  # Initialize superclass
 
 	def get_descriptor_category(self):
 		return "job"
@@ -218,10 +225,12 @@ class DeploymentDescriptor(Descriptor):
 @dataclass
 class TaskManagerDescriptor(Descriptor):
 	machine: Machine
-	zk_state_manager: ZookeeperStateManager = field(init=False)
+	zk_state_manager: ZookeeperStateManager = field(init=False, default=None)
 
 	def __post_init__(self):
-		super().__init__(self.zk_state_manager)  # Initialize superclass
+		# registered by create() once the state manager is assigned
+		if self.zk_state_manager is not None:
+			super().__init__(self.zk_state_manager)  # Initialize superclass
 
 	def get_descriptor_category(self):
 		return "taskmanagers"
@@ -241,3 +250,104 @@ class TaskManagerDescriptor(Descriptor):
 		instance.zk_state_manager = zk_state_manager  # Ensure proper assignment
 		instance.__post_init__()  # Automatically initialize superclass
 		return instance
+
+
+class FrozenDescriptor(ABC):
+	"""Immutable, slotted counterpart of a Descriptor whose id and encodings are computed once.
+
+	Frozen descriptors are not bound to a ZookeeperStateManager: register and unregister them in
+	batches with ZookeeperStateManager.register_descriptors/unregister_descriptors. They are stored
+	at the same place as the mutable ``descriptor_class`` with the same content.
+	"""
+	__slots__ = ("_id", "_utf8", "_compact")
+	descriptor_class = None
+
+	def __cached(self, slot, compute):
+		try:
+			return getattr(self, slot)
+		except AttributeError:
+			value = compute()
+			object.__setattr__(self, slot, value)  # frozen dataclasses reject plain assignment
+			return value
+
+	@abstractmethod
+	def to_dict(self) -> dict:
+		pass
+
+	@abstractmethod
+	def get_descriptor_category(self):
+		pass
+
+	def get_id(self) -> str:
+		return self.__cached("_id", lambda: descriptor_id(self.to_dict()))
+
+	def to_utf8(self) -> bytes:
+		return self.__cached("_utf8", lambda: json.dumps(self.to_dict()).encode("utf-8"))
+
+	def to_compact(self) -> bytes:
+		"""The descriptor_codec encoding, as stored by a state manager with compact descriptors."""
+		return self.__cached("_compact", lambda: descriptor_codec.encode(self.to_dict()))
+
+
+@dataclass(frozen=True, slots=True)
+class FrozenMachineDescriptor(FrozenDescriptor):
+	descriptor_class = "MachineDescriptor"
+	address: str
+	host_name: str
+	hardware: str
+	cpu_cores: int
+	ram_size: int
+	hdd: int
+
+	def __post_init__(self) -> None:
+		if self.cpu_cores < 1:
+			raise ValueError("CPU cores must be at least 1")
+		if self.ram_size < 1:
+			raise ValueError("Size of RAM must be positive")
+
+	def to_dict(self) -> dict[str, str]:
+		return {
+			"address": self.address,
+			"host_name": self.host_name,
+			"hardware": self.hardware,
+			"cpu_cores": str(self.cpu_cores),
+			"ram_size": str(self.ram_size),
+			"hdd": str(self.hdd)
+		}
+
+	def get_descriptor_category(self):
+		return "env"
+
+
+@dataclass(frozen=True, slots=True)
+class FrozenBGODescriptor(FrozenDescriptor):
+	descriptor_class = "BGODescriptor"
+	ID: int
+	input_path: str
+	output_path: str
+
+	def to_dict(self) -> dict:
+		return {
+			"ID": self.ID,
+			"input_path": self.input_path,
+			"output_path": self.output_path,
+		}
+
+	def get_descriptor_category(self):
+		return "job"
+
+
+@dataclass(frozen=True, slots=True)
+class FrozenDeploymentDescriptor(FrozenDescriptor):
+	descriptor_class = "DeploymentDescriptor"
+	machine: FrozenMachineDescriptor
+	BGO: FrozenBGODescriptor
+
+	def to_dict(self) -> dict:
+		return {
+			"machine": self.machine.to_dict(),
+			"bgo": self.BGO.to_dict()
+		}
+
+	def get_descriptor_category(self):
+		return "deploy"
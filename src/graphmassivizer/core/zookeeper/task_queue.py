@@ -0,0 +1,161 @@
+from kazoo.exceptions import NodeExistsError, NoNodeError
+import threading
+import time
+import uuid
+
+TASK_QUEUE_PATH = "/taskqueue"
+
+
+class TaskQueue:
+	"""Distributed priority queue of tasks that Task Managers pull work from.
+
+	The layout is the one of kazoo's LockingQueue: entries ``{path}/entries/entry-{priority}-{sequence}``,
+	claimed by creating the ephemeral lock ``{path}/taken/{entry}``. Unlike LockingQueue, which claims one
+	entry per call, claim takes up to ``max_items`` entries with a fixed number of pipelined round-trips.
+	A claimed entry stays in the queue until it is consumed. Entries claimed by a Task Manager whose session
+	ends are requeued by ZooKeeper, which removes the lock with the session, release requeues them explicitly.
+	Lower priority values are claimed first, entries of the same priority in the order they were put.
+	"""
+
+	# operations per transaction and requests kept in flight, see ZookeeperStateManager
+	MAX_TRANSACTION_OPS = 256
+	MAX_PENDING_REQUESTS = 512
+	ENTRY_PREFIX = "entry"
+
+	def __init__(self, client, path=TASK_QUEUE_PATH):
+		"""
+		:param client: a started KazooClient.
+		"""
+		self.client = client
+		self.path = path.rstrip("/")
+		self.entries_path = self.path + "/entries"
+		self.taken_path = self.path + "/taken"
+		self.id = uuid.uuid4().hex.encode()
+		self.changed = threading.Event()
+		self.paths_ensured = False
+
+	def __ensure_paths(self):
+		if not self.paths_ensured:
+			self.client.ensure_path(self.entries_path)
+			self.client.ensure_path(self.taken_path)
+			self.paths_ensured = True
+
+	@staticmethod
+	def __check_priority(priority):
+		if not isinstance(priority, int) or not 0 <= priority <= 999:
+			raise ValueError("priority must be an int between 0 and 999")
+
+	def __entry_prefix(self, priority) -> str:
+		return f"{self.entries_path}/{self.ENTRY_PREFIX}-{priority:03d}-"
+
+	def put(self, value: bytes, priority=100) -> str:
+		"""Adds a task, returns the name of its entry."""
+		self.__check_priority(priority)
+		self.__ensure_paths()
+		return self.client.create(self.__entry_prefix(priority), value, sequence=True).rsplit("/", 1)[1]
+
+	def put_all(self, values, priority=100) -> list:
+		"""Adds tasks in transactions of up to MAX_TRANSACTION_OPS entries, returns the names of their entries."""
+		self.__check_priority(priority)
+		self.__ensure_paths()
+		names = []
+		for start in range(0, len(values), self.MAX_TRANSACTION_OPS):
+			transaction = self.client.transaction()
+			for value in values[start:start + self.MAX_TRANSACTION_OPS]:
+				transaction.create(self.__entry_prefix(priority), value, sequence=True)
+			for result in transaction.commit():
+				if isinstance(result, Exception):
+					raise result
+				names.append(result.rsplit("/", 1)[1])
+		return names
+
+	def __on_change(self, event):
+		self.changed.set()
+
+	def __try_claim(self, max_items) -> list:
+		self.changed.clear()
+		# the watches wake up a waiting claim when entries are put or released
+		entries = self.client.get_children_async(self.entries_path, watch=self.__on_change)
+		taken = self.client.get_children_async(self.taken_path, watch=self.__on_change)
+		taken = set(taken.get())
+		# entry names sort by priority, then by sequence number
+		candidates = sorted(entry for entry in entries.get() if entry not in taken)[:max_items]
+
+		locks = [(entry, self.client.create_async(f"{self.taken_path}/{entry}", self.id, ephemeral=True))
+				 for entry in candidates]
+		claimed = []
+		for entry, lock in locks:
+			try:
+				lock.get()
+				claimed.append(entry)
+			except NodeExistsError:
+				pass  # claimed by another Task Manager in the meantime
+
+		values = [(entry, self.client.get_async(f"{self.entries_path}/{entry}")) for entry in claimed]
+		tasks = []
+		for entry, value in values:
+			try:
+				tasks.append((entry, value.get()[0]))
+			except NoNodeError:
+				# consumed after the lock of its previous owner was removed
+				self.client.delete(f"{self.taken_path}/{entry}")
+		return tasks
+
+	def claim(self, max_items=1, timeout=None) -> list:
+		"""Locks up to ``max_items`` of the highest-priority unclaimed tasks.
+
+		Blocks until at least one task could be claimed, or for up to ``timeout`` seconds.
+
+		:returns: ``(entry, value)`` of the claimed tasks, empty on timeout.
+		"""
+		self.__ensure_paths()
+		deadline = None if timeout is None else time.monotonic() + timeout
+		while True:
+			tasks = self.__try_claim(max_items)
+			if tasks:
+				return tasks
+			remaining = None if deadline is None else deadline - time.monotonic()
+			if remaining is not None and remaining <= 0:
+				return []
+			self.changed.wait(remaining)
+
+	def __delete(self, paths):
+		# pipelined instead of a transaction, so that nodes which are already gone do not roll back the others.
+		# ZooKeeper applies the requests of a session in order, entries are removed before their locks.
+		for start in range(0, len(paths), self.MAX_PENDING_REQUESTS):
+			deletes = [self.client.delete_async(path) for path in paths[start:start + self.MAX_PENDING_REQUESTS]]
+			for delete in deletes:
+				try:
+					delete.get()
+				except NoNodeError:
+					pass
+
+	def consume(self, entries) -> bool:
+		"""Acknowledges finished tasks, removing them from the queue.
+
+		:returns: False if the lock of an entry was lost, e.g. with the session, and the task may run again elsewhere.
+		"""
+		owned = self.owns(entries)
+		self.__delete([f"{self.entries_path}/{entry}" for entry in owned] + [f"{self.taken_path}/{entry}" for entry in owned])
+		return len(owned) == len(entries)
+
+	def release(self, entries):
+		"""Requeues claimed tasks that were not finished, e.g. because they failed or the Task Manager shuts down."""
+		self.__delete([f"{self.taken_path}/{entry}" for entry in self.owns(entries)])
+
+	def owns(self, entries) -> list:
+		"""The entries this queue still holds the lock of."""
+		locks = [(entry, self.client.get_async(f"{self.taken_path}/{entry}")) for entry in entries]
+		owned = []
+		for entry, lock in locks:
+			try:
+				if lock.get()[0] == self.id:
+					owned.append(entry)
+			except NoNodeError:
+				pass
+		return owned
+
+	def __len__(self):
+		"""Number of tasks in the queue, claimed ones included."""
+		self.__ensure_paths()
+		return len(self.client.get_children(self.entries_path))
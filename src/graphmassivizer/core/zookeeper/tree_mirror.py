@@ -0,0 +1,89 @@
+from kazoo.recipe.cache import TreeCache, TreeEvent
+import threading
+import time
+
+
+class TreeMirror:
+	"""In-memory copy of a ZooKeeper subtree, kept current by kazoo's TreeCache watches.
+
+	Reads are answered from memory once the initial snapshot is loaded. They may lag behind writes
+	by the time it takes a watch to fire, and while the connection is suspended or lost the mirror
+	keeps serving its last state: get_stats reports how long that has been the case. A node missing
+	from the mirror is reported as a miss (None), as it may just not have arrived yet.
+	"""
+
+	EVENT_NAMES = {getattr(TreeEvent, name): name.lower() for name in (
+		"NODE_ADDED", "NODE_UPDATED", "NODE_REMOVED", "CONNECTION_SUSPENDED",
+		"CONNECTION_RECONNECTED", "CONNECTION_LOST", "INITIALIZED")}
+
+	def __init__(self, client, path, cache=None):
+		self.path = path.rstrip("/") or "/"
+		self.cache = cache if cache is not None else TreeCache(client, self.path)
+		self.initialized = threading.Event()
+		self.lock = threading.Lock()
+		self.events = dict.fromkeys(self.EVENT_NAMES.values(), 0)
+		self.hits = 0
+		self.misses = 0
+		self.last_event = None
+		self.disconnected_since = None
+		self.cache.listen(self.__on_event)
+
+	def start(self):
+		self.cache.start()
+		return self
+
+	def close(self):
+		self.cache.close()
+
+	def __on_event(self, event):
+		now = time.time()
+		with self.lock:
+			name = self.EVENT_NAMES.get(event.event_type, "other")
+			self.events[name] = self.events.get(name, 0) + 1
+			self.last_event = now
+			if event.event_type in (TreeEvent.CONNECTION_SUSPENDED, TreeEvent.CONNECTION_LOST):
+				if self.disconnected_since is None:
+					self.disconnected_since = now
+			elif event.event_type == TreeEvent.CONNECTION_RECONNECTED:
+				self.disconnected_since = None
+		if event.event_type == TreeEvent.INITIALIZED:
+			self.initialized.set()
+
+	def covers(self, path) -> bool:
+		"""Whether ``path`` lies in the mirrored subtree and the mirror can answer reads for it."""
+		if not self.initialized.is_set():
+			return False
+		return self.path == "/" or path == self.path or path.startswith(self.path + "/")
+
+	def wait(self, timeout=None) -> bool:
+		"""Blocks until the initial snapshot is loaded, returns False on timeout."""
+		return self.initialized.wait(timeout)
+
+	def __count(self, result):
+		with self.lock:
+			if result is None:
+				self.misses += 1
+			else:
+				self.hits += 1
+		return result
+
+	def get(self, path):
+		"""``(data, stat)`` of the node like KazooClient.get, None if it is not mirrored."""
+		node = self.cache.get_data(path)
+		return self.__count(None if node is None else (node.data, node.stat))
+
+	def get_children(self, path):
+		children = self.cache.get_children(path)
+		return self.__count(None if children is None else sorted(children))
+
+	def get_staleness(self) -> float:
+		"""Seconds the mirror has been cut off from updates, 0 while it is connected."""
+		with self.lock:
+			return 0.0 if self.disconnected_since is None else time.time() - self.disconnected_since
+
+	def get_stats(self) -> dict:
+		with self.lock:
+			stats = {"initialized": self.initialized.is_set(), "hits": self.hits, "misses": self.misses,
+					 "last_event": self.last_event, "events": dict(self.events)}
+		stats["staleness"] = self.get_staleness()
+		return stats
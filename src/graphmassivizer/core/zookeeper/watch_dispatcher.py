@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+
+class WatchDispatcher:
+	"""Runs watch callbacks on a bounded worker pool instead of kazoo's single event thread.
+
+	Events for the same key arriving within ``debounce`` seconds of the first one are coalesced:
+	only the callback with the latest arguments runs, at the end of the window. Callbacks of one key
+	never run concurrently, an event arriving while its callback runs is dispatched after it.
+	"""
+
+	def __init__(self, max_workers=4, debounce=0.05):
+		self.logger = logging.getLogger(self.__class__.__name__)
+		self.debounce = debounce
+		self.pool = ThreadPoolExecutor(max_workers, thread_name_prefix="watch-dispatcher")
+		self.condition = threading.Condition()
+		# key -> (callback, args) of the latest undispatched event
+		self.pending = {}
+		# (due time, sequence number, key) of pending keys
+		self.deadlines = []
+		self.sequence = itertools.count()
+		self.running = set()
+		self.closed = False
+		self.stats = {"events": 0, "coalesced": 0, "dispatched": 0, "failed": 0}
+		self.thread = threading.Thread(target=self.__run, name="watch-dispatcher-timer", daemon=True)
+		self.thread.start()
+
+	def submit(self, key, callback, *args):
+		with self.condition:
+			self.stats["events"] += 1
+			if key in self.pending:
+				self.stats["coalesced"] += 1
+			else:
+				heapq.heappush(self.deadlines, (time.monotonic() + self.debounce, next(self.sequence), key))
+				self.condition.notify()
+			self.pending[key] = (callback, args)
+
+	def __run(self):
+		with self.condition:
+			while not self.closed:
+				now = time.monotonic()
+				if not self.deadlines or self.deadlines[0][0] > now:
+					self.condition.wait(None if not self.deadlines else self.deadlines[0][0] - now)
+					continue
+				_, _, key = heapq.heappop(self.deadlines)
+				if key in self.running:
+					continue  # rescheduled when the running callback finishes
+				if key not in self.pending:
+					continue  # already dispatched when an earlier callback of the key finished
+				callback, args = self.pending.pop(key)
+				self.running.add(key)
+				self.stats["dispatched"] += 1
+				self.pool.submit(self.__call, key, callback, args)
+
+	def __call(self, key, callback, args):
+		try:
+			callback(*args)
+		except Exception:
+			self.logger.exception(f"Watch callback for {key} failed")
+			with self.condition:
+				self.stats["failed"] += 1
+		finally:
+			with self.condition:
+				self.running.discard(key)
+				if key in self.pending:
+					heapq.heappush(self.deadlines, (time.monotonic(), next(self.sequence), key))
+					self.condition.notify()
+
+	def get_stats(self) -> dict:
+		with self.condition:
+			return dict(self.stats, pending=len(self.pending), running=len(self.running))
+
+	def close(self):
+		with self.condition:
+			self.closed = True
+			self.condition.notify()
+		self.thread.join()
+		self.pool.shutdown(wait=True)
@@ -1,8 +1,16 @@
 from __future__ import annotations
 
-from kazoo.client import KazooClient
+from kazoo.client import KazooClient, KazooState
+from kazoo.exceptions import BadVersionError, NodeExistsError, NoNodeError, RolledBackError
 from kazoo.recipe.watchers import ChildrenWatch
 from kazoo.recipe.watchers import DataWatch
+from graphmassivizer.core.descriptors import descriptor_codec
+from graphmassivizer.core.zookeeper.tree_mirror import TreeMirror
+from graphmassivizer.core.zookeeper.watch_dispatcher import WatchDispatcher
+from collections import OrderedDict
+import json
+import os
+import threading
 import time
 
 from typing import TYPE_CHECKING
@@ -13,60 +21,433 @@ if TYPE_CHECKING:
 
 class ZookeeperStateManager:
 
-	def __init__(self, hosts):
-		self.zk = KazooClient(hosts)
-		self.zk.start()
+	# operations per transaction, keeps a request well below ZooKeeper's default 1MB limit (jute.maxbuffer)
+	MAX_TRANSACTION_OPS = 256
+	# requests get_many and walk keep in flight at once
+	MAX_PENDING_REQUESTS = 512
+	# data of a node whose payload was offloaded to the blob store, followed by the payload's SHA-256 hex digest
+	BLOB_POINTER = b"GMB1:"
+
+	def __init__(self, hosts, client: KazooClient = None, compact_descriptors=False, listener_workers=4, listener_debounce=0.05,
+				 blob_store=None, offload_threshold=64 << 10, blob_cache_bytes=64 << 20):
+		"""
+		:param client: an already started KazooClient to use instead of connecting to ``hosts``.
+		:param compact_descriptors: store each descriptor in a single znode with the binary descriptor_codec
+			encoding, instead of one znode per key. Read them with read_descriptor.
+		:param listener_workers: threads running descriptor listener callbacks.
+		:param listener_debounce: seconds within which changes of a watched descriptor property are coalesced.
+		:param blob_store: store with put_blob/get_blob (e.g. a DataManager). Payloads written through this manager
+			that are larger than ``offload_threshold`` bytes are kept there, the node only holds a content-addressed
+			pointer. Reads through this manager resolve pointers transparently, also without a blob_store if the
+			blob is cached.
+		:param blob_cache_bytes: size of the cache of resolved blobs, least recently used first evicted.
+		"""
+		if client is None:
+			client = KazooClient(hosts)
+			client.start()
+		self.zk = client
+		self.compact_descriptors = compact_descriptors
 		self.watchers = {}
+		# descriptor node path -> (last known value, znode version), to skip unchanged keys and detect concurrent writes
+		self.node_versions = {}
+		self.known_directories = set()
+		self.lock = threading.Lock()
+		# root path -> TreeMirror serving reads below it from memory
+		self.mirrors = {}
+		self.listener_workers = listener_workers
+		self.listener_debounce = listener_debounce
+		self.dispatcher = None
+		self.blob_store = blob_store
+		self.offload_threshold = offload_threshold
+		self.blob_cache_bytes = blob_cache_bytes
+		# digest -> payload of offloaded nodes, blobs are immutable and never stale
+		self.blobs = OrderedDict()
+		self.blobs_size = 0
+		self.blob_lock = threading.Lock()
+		self.blob_stats = {"offloaded": 0, "hits": 0, "misses": 0}
+		self.zk.add_listener(self.__on_connection_state)
+
+	def __on_connection_state(self, state):
+		if state == KazooState.LOST:
+			# directories may have been deleted while the session was gone, ensure them again
+			self.known_directories.clear()
+
+	def __encode_value(self, value) -> bytes:
+		if isinstance(value, bytes):
+			return value
+		if isinstance(value, str):
+			return value.encode()
+		# numbers and nested descriptors, e.g. the machine of a DeploymentDescriptor, decoded as a DescriptorView
+		# from a compact descriptor
+		return json.dumps(value, default=ZookeeperStateManager.__view_to_dict).encode()
 
-	def __set_node_value(self, path, value):
-		self.zk.ensure_path(path)
-		self.zk.set(path, value)
+	@staticmethod
+	def __view_to_dict(value):
+		if isinstance(value, descriptor_codec.DescriptorView):
+			return value.to_dict()
+		raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
 
 	def __get_descriptor_directory(self, descriptor: Descriptor):
 		descriptor_id = descriptor.get_id()
-		descriptor_class = descriptor.__class__.__name__
+		# frozen descriptors are stored like their mutable counterpart
+		descriptor_class = getattr(descriptor, "descriptor_class", None) or descriptor.__class__.__name__
 		descriptor_category = descriptor.get_descriptor_category()
 
-		return "{}/{}/{}".format(descriptor_category, descriptor_class, descriptor_id)
+		return "/{}/{}/{}".format(descriptor_category, descriptor_class, descriptor_id)
 
 	def register_descriptor(self, descriptor: Descriptor):
-		base_directory = self.__get_descriptor_directory(descriptor)
-		descriptor_dict = descriptor.to_dict()
-		for key, value in descriptor_dict.items():
-			self.__set_node_value(f"{base_directory}/{key}", value.encode())
+		self.register_descriptors([descriptor])
+
+	def register_descriptors(self, descriptors):
+		"""Writes the keys of the descriptors, one node per key below the descriptor's directory.
+
+		All changes are written in multi-op transactions of up to MAX_TRANSACTION_OPS operations, i.e. one
+		round-trip for a typical batch of descriptors instead of one per key. Keys whose value is unchanged
+		since this manager last wrote it are skipped. With ``compact_descriptors`` the descriptor's
+		directory node holds the whole encoded descriptor instead, and there are no key nodes.
+
+		Nodes this manager has not written yet, e.g. left by an earlier run, are overwritten.
+
+		:raises BadVersionError: if nodes this manager wrote were changed by another writer since. The
+			transaction of that batch is not applied (earlier batches are), registering again overwrites them.
+		"""
+		nodes = {}
+		parents = {}
+		for descriptor in descriptors:
+			base_directory = self.__get_descriptor_directory(descriptor)
+			parents[os.path.dirname(base_directory)] = None
+			if self.compact_descriptors:
+				nodes[base_directory] = descriptor.to_compact() if hasattr(descriptor, "to_compact") else descriptor_codec.encode(descriptor.to_dict())
+				continue
+			nodes[base_directory] = b""
+			for key, value in descriptor.to_dict().items():
+				nodes[f"{base_directory}/{key}"] = self.__encode_value(value)
+
+		with self.lock:
+			changed = [(path, value) for path, value in nodes.items()
+					   if path not in self.node_versions or self.node_versions[path][0] != value]
+		# large values are written to the blob store before taking the lock again, not while it blocks other writers
+		changed = [(path, value, self.offload(value)) for path, value in changed]
+		with self.lock:
+			# the category and class directories are shared by all descriptors of a class, create them once
+			for directory in parents:
+				if directory not in self.known_directories:
+					self.zk.ensure_path(directory)
+					self.known_directories.add(directory)
+			for start in range(0, len(changed), self.MAX_TRANSACTION_OPS):
+				self.__commit(changed[start:start + self.MAX_TRANSACTION_OPS])
+
+	def __commit(self, batch, retries=1):
+		# batch: (path, value, data of the node), the data is the value or its pointer in the blob store
+		transaction = self.zk.transaction()
+		for path, _, data in batch:
+			known = self.node_versions.get(path)
+			if known is None:
+				transaction.create(path, data)
+			else:
+				# fails if someone else changed the node since we last saw it
+				transaction.set_data(path, data, version=known[1])
+		results = transaction.commit()
+
+		if not any(isinstance(result, Exception) for result in results):
+			for (path, value, _), result in zip(batch, results):
+				# create returns the path, set_data the new stat
+				self.node_versions[path] = (value, 0 if isinstance(result, str) else result.version)
+			return
+		errors = [(path, result) for (path, _, _), result in zip(batch, results)
+				  if isinstance(result, Exception) and not isinstance(result, RolledBackError)]
+		conflicts = [path for path, error in errors if isinstance(error, BadVersionError)]
+		if conflicts:
+			# changed by someone else since this manager wrote them, overwriting would silently drop their change
+			for path in conflicts:
+				self.node_versions.pop(path, None)
+			raise BadVersionError(f"Changed by another writer: {', '.join(conflicts)}")
+		if retries == 0:
+			raise errors[0][1]
+
+		for path, error in errors:
+			directory = os.path.dirname(path)
+			if isinstance(error, NoNodeError) and directory in self.known_directories:
+				# deleted elsewhere
+				self.known_directories.discard(directory)
+				self.zk.ensure_path(directory)
+				self.known_directories.add(directory)
+		# nodes were written or deleted elsewhere, e.g. by an earlier run: fetch their versions in one pipelined round-trip and retry
+		stats = [self.zk.exists_async(path) for path, _, _ in batch]
+		for (path, _, _), stat in zip(batch, stats):
+			stat = stat.get()
+			if stat is None:
+				self.node_versions.pop(path, None)
+			else:
+				self.node_versions[path] = (None, stat.version)
+		self.__commit(batch, retries - 1)
+
+	def offload(self, value):
+		"""``value``, or a pointer to it in the blob store if it is larger than offload_threshold."""
+		if self.blob_store is None or value is None or len(value) <= self.offload_threshold:
+			return value
+		digest = self.blob_store.put_blob(value)
+		self.__cache_blob(digest, value)
+		with self.blob_lock:
+			self.blob_stats["offloaded"] += 1
+		return self.BLOB_POINTER + digest.encode()
+
+	def resolve(self, data):
+		"""The payload of node data, loaded from the blob store (or the local cache of blobs) if it was offloaded.
+
+		:raises ValueError: if the payload is neither cached nor can be loaded, as there is no blob_store.
+		"""
+		if data is None or not data.startswith(self.BLOB_POINTER):
+			return data
+		digest = data[len(self.BLOB_POINTER):].decode()
+		with self.blob_lock:
+			value = self.blobs.get(digest)
+			if value is not None:
+				self.blobs.move_to_end(digest)
+				self.blob_stats["hits"] += 1
+				return value
+			self.blob_stats["misses"] += 1
+		if self.blob_store is None:
+			raise ValueError(f"Payload {digest} was offloaded, but there is no blob store to load it from")
+		value = self.blob_store.get_blob(digest)
+		self.__cache_blob(digest, value)
+		return value
+
+	def __cache_blob(self, digest, value):
+		if len(value) > self.blob_cache_bytes:
+			return
+		with self.blob_lock:
+			if digest in self.blobs:
+				return
+			self.blobs[digest] = value
+			self.blobs_size += len(value)
+			while self.blobs_size > self.blob_cache_bytes:
+				_, evicted = self.blobs.popitem(last=False)
+				self.blobs_size -= len(evicted)
+
+	def get_blob_stats(self) -> dict:
+		"""Payloads offloaded by this manager and reads of offloaded payloads served from (hits) or missing in the cache."""
+		with self.blob_lock:
+			return dict(self.blob_stats, cached=len(self.blobs), cached_bytes=self.blobs_size)
+
+	def get_descriptor_path(self, descriptor: Descriptor) -> str:
+		return self.__get_descriptor_directory(descriptor)
+
+	def read_descriptor(self, path):
+		"""The keys of the descriptor stored at ``path`` in either layout.
+
+		A compact descriptor is returned as a DescriptorView that decodes values when they are accessed,
+		one stored as key nodes as a dict of the UTF-8 decoded node values.
+		"""
+		data, _ = self.get(path)
+		if descriptor_codec.is_compact(data):
+			return descriptor_codec.decode(data)
+		return {key: self.get(f"{path}/{key}")[0].decode() for key in self.get_children(path)}
 
 	def unregister_descriptor(self, descriptor: Descriptor):
-		base_directory = self.__get_descriptor_directory(descriptor)
-		try:
-			self.zk.delete(base_directory, recursive=True)
-			print("Node and its children deleted successfully.")
-		except Exception as e:
-			print(f"Error deleting node: {e}")
+		self.unregister_descriptors([descriptor])
+
+	def unregister_descriptors(self, descriptors):
+		"""Deletes the descriptors' nodes in multi-op transactions of up to MAX_TRANSACTION_OPS operations.
+
+		Descriptors whose nodes are not exactly the expected ones (e.g. already deleted, or with extra keys)
+		are deleted one by one with a recursive delete instead.
+		"""
+		operations = []
+		directories = set()
+		for descriptor in descriptors:
+			base_directory = self.__get_descriptor_directory(descriptor)
+			directories.add(base_directory)
+			if not self.compact_descriptors:
+				operations.extend(f"{base_directory}/{key}" for key in descriptor.to_dict())
+			operations.append(base_directory)
+
+		with self.lock:
+			for path in operations:
+				self.node_versions.pop(path, None)
+
+		failed = []
+		start = 0
+		while start < len(operations):
+			# a descriptor's directory closes its operations, keep them in one transaction
+			end = min(start + self.MAX_TRANSACTION_OPS, len(operations))
+			while operations[end - 1] not in directories:
+				end += 1
+			transaction = self.zk.transaction()
+			for path in operations[start:end]:
+				transaction.delete(path)
+			if any(isinstance(result, Exception) for result in transaction.commit()):
+				failed.extend(path for path in operations[start:end] if path in directories)
+			start = end
+
+		for base_directory in failed:
+			try:
+				self.zk.delete(base_directory, recursive=True)
+			except NoNodeError:
+				pass
+			except Exception as e:
+				print(f"Error deleting node: {e}")
 
 	def register_descriptor_listener(self, descriptorListener: DescriptorListener):
+		"""Watches the property of the listener's descriptor and calls back on every change.
+
+		The callback gets the property value as the bytes of its key node (None if it does not exist)
+		and the node's stat. It runs on the dispatcher's worker pool, with bursts of changes coalesced.
+		"""
 		self.watchers[descriptorListener.get_id()] = descriptorListener
+		with self.lock:
+			if self.dispatcher is None:
+				self.dispatcher = WatchDispatcher(self.listener_workers, self.listener_debounce)
+		dispatcher = self.dispatcher
+
+		key = descriptorListener.callback.get_property_key(descriptorListener.descriptor)
+		directory = self.__get_descriptor_directory(descriptorListener.descriptor)
+
+		def watch(data, stat):
+			if not descriptorListener.is_active():
+				return False  # stops the DataWatch
+			data = self.resolve(data)
+			if self.compact_descriptors and data is not None:
+				values = descriptor_codec.decode(data)
+				data = self.__encode_value(values[key]) if key in values else None
+			dispatcher.submit(descriptorListener.get_id(), descriptorListener.callback.execute, data, stat)
+
+		self.zk.DataWatch(directory if self.compact_descriptors else f"{directory}/{key}", watch)
 
 	def unregister_descriptor_listener(self, descriptorListener: DescriptorListener):
 		self.watchers[descriptorListener.get_id()].set_active(False)
 
+	def mirror(self, path, timeout=None) -> TreeMirror:
+		"""Keep a local copy of the subtree at ``path``, from which get, exists and get_children are answered.
+
+		The copy is maintained by watches, so reads are served from memory but may briefly lag behind
+		changes. Nodes not (yet) in the copy, and all reads until the initial snapshot is loaded (waited
+		for up to ``timeout`` seconds), still go to the ensemble.
+		"""
+		with self.lock:
+			mirror = self.mirrors.get(path)
+			if mirror is None:
+				mirror = self.mirrors[path] = TreeMirror(self.zk, path).start()
+		mirror.wait(timeout)
+		return mirror
+
+	def unmirror(self, path):
+		with self.lock:
+			mirror = self.mirrors.pop(path, None)
+		if mirror is not None:
+			mirror.close()
+
+	def get_mirror_stats(self) -> dict:
+		"""Per mirrored path: whether it is initialized, reads served and missed, watch events by type and staleness in seconds."""
+		with self.lock:
+			mirrors = dict(self.mirrors)
+		return {path: mirror.get_stats() for path, mirror in mirrors.items()}
+
+	def __find_mirror(self, path):
+		for mirror in list(self.mirrors.values()):
+			if mirror.covers(path):
+				return mirror
+		return None
+
 	def exists(self,path):
-		return self.zk.exists(path)
+		mirror = self.__find_mirror(path)
+		node = mirror.get(path) if mirror else None
+		return node[1] if node is not None else self.zk.exists(path)
 
 	def get(self,path):
-		return self.zk.get(path)
+		mirror = self.__find_mirror(path)
+		node = mirror.get(path) if mirror else None
+		data, stat = node if node is not None else self.zk.get(path)
+		return self.resolve(data), stat
 
 	def get_children(self,path):
-		return self.zk.get_children(path)
+		mirror = self.__find_mirror(path)
+		children = mirror.get_children(path) if mirror else None
+		return children if children is not None else self.zk.get_children(path)
+
+	def get_many(self, paths, children=False) -> dict:
+		"""Reads many nodes at once: ``{path: (data, stat)}``, or ``(data, stat, children)`` with ``children``.
+
+		The requests are pipelined, up to MAX_PENDING_REQUESTS at a time, instead of waiting for each
+		reply before sending the next request. Missing nodes map to None. Mirrored nodes are read from memory.
+		"""
+		results = {}
+		requests = []
+		for path in dict.fromkeys(paths):
+			mirror = self.__find_mirror(path)
+			node = mirror.get(path) if mirror else None
+			if node is not None and children:
+				node_children = mirror.get_children(path)
+				node = None if node_children is None else node + (node_children,)
+			if node is None:
+				requests.append(path)
+			else:
+				results[path] = node
+
+		for start in range(0, len(requests), self.MAX_PENDING_REQUESTS):
+			batch = requests[start:start + self.MAX_PENDING_REQUESTS]
+			pending = [(path, self.zk.get_async(path), self.zk.get_children_async(path) if children else None)
+					   for path in batch]
+			for path, node, node_children in pending:
+				try:
+					data, stat = node.get()
+					results[path] = (data, stat, sorted(node_children.get())) if children else (data, stat)
+				except NoNodeError:
+					# deleted since it was listed
+					results[path] = None
+		return {path: None if results[path] is None else (self.resolve(results[path][0]),) + results[path][1:]
+				for path in dict.fromkeys(paths)}
+
+	def walk(self, path="/") -> dict:
+		"""Loads the subtree at ``path``: ``{path: (data, stat, children)}`` in breadth-first order.
+
+		Every level is fetched with one pipelined get_many, so the tree loads in about as many
+		round-trips as it is deep rather than one per node. Nodes deleted during the walk are left out.
+		"""
+		tree = {}
+		level = [path]
+		while level:
+			nodes = self.get_many(level, children=True)
+			next_level = []
+			for node_path, node in nodes.items():
+				if node is None:
+					continue
+				tree[node_path] = node
+				next_level.extend(f"{node_path.rstrip('/')}/{child}" for child in node[2])
+			level = next_level
+		return tree
 
 	def set(self,path,machine=None):
-		return self.zk.set(path,machine)
+		return self.zk.set(path,self.offload(machine))
+
+	def create(self, path, machine=None, makepath=False, ephemeral=False):
+		if machine: return self.zk.create(path, self.offload(machine), makepath=makepath, ephemeral=ephemeral)
+		else: return self.zk.create(path, makepath=makepath, ephemeral=ephemeral)
+
+	def create_ephemeral(self, path, value=b""):
+		"""Creates ``path`` as an ephemeral node, removed by ZooKeeper when this client's session ends.
+
+		A node left at ``path`` by an earlier session (or a persistent one) is replaced.
+		"""
+		try:
+			return self.zk.create(path, value, makepath=True, ephemeral=True)
+		except NodeExistsError:
+			self.zk.delete(path)
+			return self.zk.create(path, value, makepath=True, ephemeral=True)
 
-	def create(self, path, machine=None, makepath=False):
-		if machine: return self.zk.create(path, machine, makepath=makepath)
-		else: return self.zk.create(path, makepath=makepath)
+	def delete(self, path, recursive=False):
+		with self.lock:
+			prefix = path.rstrip("/") + "/"
+			self.known_directories = {directory for directory in self.known_directories
+									  if directory != path and not directory.startswith(prefix)}
+		return self.zk.delete(path, recursive=recursive)
 
 	def ChildrenWatch(self,path,fun):
 		return self.zk.ChildrenWatch(path,fun)
 
 	def stop(self):
+		for path in list(self.mirrors):
+			self.unmirror(path)
+		if self.dispatcher is not None:
+			self.dispatcher.close()
 		return self.zk.stop()
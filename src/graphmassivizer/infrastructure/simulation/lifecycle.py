@@ -21,6 +21,7 @@ from graphmassivizer.runtime.workload_manager.input.userInputHandler import User
 from graphmassivizer.runtime.workload_manager.parallelizer import Parallelizer
 from graphmassivizer.runtime.workload_manager.optimization_1 import Optimizer_1
 from graphmassivizer.runtime.workload_manager.optimization_2 import Optimizer_2
+from graphmassivizer.runtime.workload_manager.fusion import Fuser
 from graphmassivizer.core.zookeeper.zookeeper_state_manager import ZookeeperStateManager
 
 class LifecycleState(StateMachine):
@@ -258,6 +259,7 @@ class Simulation:
 		self.parallelize()
 		self.optimize()
 		self.greenify()
+		self.fuse()
 		self.run()
 		self.complete()
 
@@ -278,6 +280,11 @@ class Simulation:
 		Optimizer_2.optimize(self.DAG)
 		self.state.greenify()
 
+	def fuse(self) -> None:
+		# chains of tasks that can share a Task Manager run as one task, keeping intermediates in memory
+		for chain in Fuser.fuse(self.DAG):
+			self.logger.info(f"Fused tasks {chain}")
+
 	def run(self) -> None:
 		self.state.run()
 		task = self.firstTask
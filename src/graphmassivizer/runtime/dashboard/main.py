@@ -25,15 +25,24 @@ import dash_bootstrap_components as dbc
 from datetime import datetime, timezone
 from data_loader import workflow_DAG_to_graph_elements
 from graphmassivizer.runtime.workload_manager.infrastructure_manager import InfrastructureManager
+from graphmassivizer.core.dataflow.data_manager import DataManager
+from graphmassivizer.core.dataflow.filesystem import get_fs
 from graphmassivizer.core.descriptors.descriptors import Machine
 from graphmassivizer.core.zookeeper.zookeeper_state_manager import ZookeeperStateManager
 
 class Dashboard:
 
-	def __init__(self, zookeeper_host, docker_network_name) -> None:
+	def __init__(self, zookeeper_host, docker_network_name, hdfs_filesystem) -> None:
 		self.logger = logging.getLogger(self.__class__.__name__)
 		self.zookeeper_host = zookeeper_host
 		self.zk = ZookeeperStateManager(hosts=self.zookeeper_host)
+		# explore_znodes reads nodes the Workload Manager offloaded to its blob store
+		self.fs = hdfs_filesystem
+		self.dataManager = DataManager('/dm', self.fs)
+		self.zk.blob_store = self.dataManager
+		# explore_znodes walks the whole tree on every refresh, ZK_MIRROR_PATHS=/ serves it from memory
+		for path in filter(None, os.environ.get('ZK_MIRROR_PATHS', '').split(',')):
+			self.zk.mirror(path.strip(), timeout=10)
 		self.machine = Machine.parse_from_env(self.zk,prefix="DASHBOARD_")
 		self.register_self()
 		self.docker_network_name = docker_network_name
@@ -512,11 +521,15 @@ class Dashboard:
 
 	# temporarily here
 	# tocheck the code
-	def explore_znodes(self, path, znodes_data_dic, znodes_hierarchy_graph_nodes, znodes_hierarchy_graph_edges, id_hierarchy_graph = '0', level=0):
+	def explore_znodes(self, path, znodes_data_dic, znodes_hierarchy_graph_nodes, znodes_hierarchy_graph_edges, id_hierarchy_graph = '0', level=0, tree=None):
 		'''
 		parent_id_hierarchy: is the id of parent node in the hierarchy graph representation.
+		tree: the subtree loaded by ZookeeperStateManager.walk, loaded with one pipelined read per level if None.
 		'''
 		if path == '/env':return
+		if tree is None:
+			tree = self.zk.walk(path)
+		if path not in tree:return  # deleted while walking
 		#znodes_hierarchy_info = ""
 		#self.logger.info("Exploring znodes.")
 		indent = "  " * level  # Indentation to visualize hierarchy
@@ -525,7 +538,7 @@ class Dashboard:
 		znodes_hierarchy_graph_nodes.append({"data": {"id": id_hierarchy_graph, "label": path}})
 
 		# Get the node data (optional)
-		data, stat = self.zk.get(path)
+		data, stat, children = tree[path]
 		node_data = ast.literal_eval(data.decode('utf-8')) if data else None
 
 		#self.logger.info(f"data at {path} with type {type(node_data)} is: {data}")
@@ -558,8 +571,7 @@ class Dashboard:
 		#self.logger.info(f"{indent} - {path} (Data: {node_data}, Children: {stat.numChildren})")
 
 
-		# Get children and recurse into them
-		children = self.zk.get_children(path)
+		# Recurse into the children
 
 		child_indx = 0
 		for child in children:
@@ -567,7 +579,7 @@ class Dashboard:
 			child_indx += 1
 			znodes_hierarchy_graph_edges.append({"data": {"source": id_hierarchy_graph, "target": child_id_hierarchy_graph}})
 			child_path = path.rstrip('/') + '/' + child  # Ensure correct path format
-			self.explore_znodes(child_path, znodes_data_dic, znodes_hierarchy_graph_nodes=znodes_hierarchy_graph_nodes, znodes_hierarchy_graph_edges=znodes_hierarchy_graph_edges , level=level + 1, id_hierarchy_graph=child_id_hierarchy_graph)
+			self.explore_znodes(child_path, znodes_data_dic, znodes_hierarchy_graph_nodes=znodes_hierarchy_graph_nodes, znodes_hierarchy_graph_edges=znodes_hierarchy_graph_edges , level=level + 1, id_hierarchy_graph=child_id_hierarchy_graph, tree=tree)
 
 		return
 
@@ -578,7 +590,8 @@ def main() -> None:
 		# Initialize logging using our helper
 		zookeeper_host = os.environ.get('ZOOKEEPER_HOST', 'zookeeper:2181')
 		docker_network_name = 'graphmassivizer_simulation_net'
-		dashboard = Dashboard(zookeeper_host, docker_network_name)
+		fs = get_fs(os.environ.get('HDFS_NAMENODE', 'hdfs://namenode:8020'))
+		dashboard = Dashboard(zookeeper_host, docker_network_name, fs)
 		dashboard.logger.debug(f"{os.environ}")
 		config.dashboard_obj = dashboard
 		dashboard.logger.info("I am Dashboard " + str(dashboard.machine.ID))
@@ -6,6 +6,7 @@ import sys
 
 import networkx as nx
 
+from graphmassivizer.core.dataflow.csr_graph import CSRGraph
 from graphmassivizer.runtime.task_manager.task_execution_unit import BGO
 
 class ToNetworkX(BGO):
@@ -14,7 +15,10 @@ class ToNetworkX(BGO):
 
  def run(args={}):
 
-  args['graph'] = nx.read_edgelist(args['graph'],delimiter=',',create_using=nx.Graph)
+  if isinstance(args['graph'],CSRGraph):
+   args['graph'] = args['graph'].to_networkx()
+  else:
+   args['graph'] = nx.read_edgelist(args['graph'],delimiter=',',create_using=nx.Graph)
 
   return args['graph']
 
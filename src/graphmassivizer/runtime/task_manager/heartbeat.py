@@ -0,0 +1,91 @@
+# Publishes the headroom of a Task Manager to ZooKeeper.
+# - The heartbeat node /heartbeats/{ID} is ephemeral: it disappears when the Task Manager's session ends.
+# - Every interval the node is overwritten with a few compactly encoded metrics (free slots, load average,
+#   free memory), a single small write the Infrastructure Manager uses to rank Task Managers.
+
+import logging
+import os
+import threading
+
+from kazoo.exceptions import NoNodeError
+
+from graphmassivizer.core.descriptors import descriptor_codec
+
+HEARTBEAT_ROOT = '/heartbeats'
+
+
+def read_free_memory() -> int:
+	"""Bytes of memory available to new processes."""
+	try:
+		with open('/proc/meminfo') as f:
+			for line in f:
+				if line.startswith('MemAvailable:'):
+					return int(line.split()[1]) * 1024
+	except OSError:
+		pass
+	return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+
+
+def encode_metrics(metrics: dict) -> bytes:
+	return descriptor_codec.encode(metrics)
+
+
+def decode_metrics(data: bytes) -> dict:
+	return descriptor_codec.decode(data).to_dict()
+
+
+class Heartbeat:
+
+	def __init__(self, zk, task_manager_id, free_slots, interval=2.0, on_session_lost=None) -> None:
+		"""
+		:param zk: ZookeeperStateManager of the Task Manager.
+		:param free_slots: returns the number of tasks the Task Manager can currently accept.
+		:param on_session_lost: called before the heartbeat node is recreated after the session expired,
+			e.g. to register the Task Manager again.
+		"""
+		self.logger = logging.getLogger(self.__class__.__name__)
+		self.zk = zk
+		self.path = f'{HEARTBEAT_ROOT}/{task_manager_id}'
+		self.free_slots = free_slots
+		self.interval = interval
+		self.on_session_lost = on_session_lost
+		self.sequence = 0
+		self.stopped = threading.Event()
+		self.thread = None
+
+	def metrics(self) -> dict:
+		return {
+			"free_slots": int(self.free_slots()),
+			"load": os.getloadavg()[0],
+			"free_memory": read_free_memory(),
+			"sequence": self.sequence,
+		}
+
+	def beat(self) -> None:
+		data = encode_metrics(self.metrics())
+		try:
+			self.zk.set(self.path, data)
+		except NoNodeError:
+			# the session expired and ZooKeeper removed the ephemeral nodes
+			if self.on_session_lost is not None:
+				self.on_session_lost()
+			self.zk.create_ephemeral(self.path, data)
+		self.sequence += 1
+
+	def start(self) -> "Heartbeat":
+		self.zk.create_ephemeral(self.path, encode_metrics(self.metrics()))
+		self.thread = threading.Thread(target=self.__run, name="heartbeat", daemon=True)
+		self.thread.start()
+		return self
+
+	def __run(self) -> None:
+		while not self.stopped.wait(self.interval):
+			try:
+				self.beat()
+			except Exception as e:
+				self.logger.warning(f"Heartbeat failed: {e}")
+
+	def stop(self) -> None:
+		self.stopped.set()
+		if self.thread is not None:
+			self.thread.join()
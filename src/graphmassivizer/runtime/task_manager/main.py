@@ -3,6 +3,7 @@
 # - Connects to ZooKeeper to retrieve the Workload Manager's information.
 # - Implements the IWM2TMProtocol to handle communication with the Workload Manager.
 # - installTask: Installs and schedules a task (BGOs) received from the Workload Manager.
+# - Pulls tasks from the ZooKeeper task queue whenever it has free slots, a batch per round-trip.
 # - addOutputBinding: Adds output bindings to datasets, specifying how data is transferred to subsequent tasks.
 # - getDataset, getMutableDataset: Provides access to datasets managed by the Task Manager.
 
@@ -11,13 +12,18 @@ import json
 import logging
 import socket
 import uuid
-import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from kazoo.client import KazooClient
 import pyarrow as pa
-import pyarrow.fs as pafs
 
+from graphmassivizer.core.dataflow.data_manager import DataManager
+from graphmassivizer.core.dataflow.filesystem import get_fs
 from graphmassivizer.core.descriptors.descriptors import Machine
+from graphmassivizer.core.zookeeper.task_queue import TASK_QUEUE_PATH, TaskQueue
 from graphmassivizer.core.zookeeper.zookeeper_state_manager import ZookeeperStateManager
+from graphmassivizer.runtime.task_manager.heartbeat import Heartbeat
+from graphmassivizer.runtime.task_manager.task_execution_unit import TaskExecutionUnit
 
 logging.basicConfig(level=logging.INFO)
 
@@ -29,28 +35,69 @@ class TaskManager:
 		self.zk = ZookeeperStateManager(hosts=self.zookeeper_host)
 		self.machine = Machine.parse_from_env(self.zk,prefix="TM_")
 		self.fs = hdfs_filesystem
+		# the store of the Workload Manager, tasks read their inputs from and write their outputs to it
+		self.dataManager = DataManager('/dm', self.fs)
+		# nodes offloaded by the Workload Manager are read from the same blob store
+		self.zk.blob_store = self.dataManager
+		self.execution_unit = TaskExecutionUnit(self.dataManager)
+		# tasks currently executing, each occupies one slot (core)
+		self.running_tasks = 0
+		self.slots_lock = threading.Lock()
+		self.slot_freed = threading.Event()
+		self.stopped = threading.Event()
 		self.register_self()
+		self.heartbeat = Heartbeat(self.zk, self.machine.ID, self.free_slots,
+								   float(os.environ.get('TM_HEARTBEAT_INTERVAL', '2.0')), on_session_lost=self.register_self).start()
+		self.task_queue = TaskQueue(self.zk.zk, os.environ.get('TM_TASK_QUEUE', TASK_QUEUE_PATH))
+		self.executor = ThreadPoolExecutor(max(self.machine.descriptor.cpu_cores, 1), thread_name_prefix="task")
+		self.puller = threading.Thread(target=self.pull_tasks, name="task-puller", daemon=True)
+		self.puller.start()
 
 	def register_self(self) -> None:
 		node_path = f'/taskmanagers/{self.machine.ID}'
 		mashine_utf8 = self.machine.to_utf8()
-		if self.zk.exists(node_path):
-			self.zk.set(node_path, mashine_utf8)
-		else:
-			self.zk.create(node_path, mashine_utf8, makepath=True)
+		# ephemeral, so the node of a dead Task Manager disappears with its session and is not scheduled onto
+		self.zk.create_ephemeral(node_path, mashine_utf8)
 		self.logger.info(f"Registered TaskManager {self.machine.ID} with ZooKeeper.")
 
-	def get_fs(node):
-
-		pattern = r'hdfs://([^:]+):(\d+)'
-		match = re.match(pattern, node)
-		if not match:
-			raise ValueError(f"Could not parse HDFS_NAMENODE={node}")
-		hdfs_host, hdfs_port = match.groups()
-		hdfs_port = int(hdfs_port)
+	def free_slots(self) -> int:
+		return max(self.machine.descriptor.cpu_cores - self.running_tasks, 0)
+
+	def pull_tasks(self) -> None:
+		"""Claims as many queued tasks as there are free slots, instead of having them pushed by the Workload Manager."""
+		while not self.stopped.is_set():
+			self.slot_freed.clear()
+			free_slots = self.free_slots()
+			if free_slots == 0:
+				self.slot_freed.wait(1.0)
+				continue
+			try:
+				tasks = self.task_queue.claim(free_slots, timeout=1.0)
+			except Exception as e:
+				self.logger.warning(f"Failed to claim tasks: {e}")
+				self.stopped.wait(1.0)
+				continue
+			for entry, task in tasks:
+				with self.slots_lock:
+					self.running_tasks += 1
+				self.executor.submit(self.run_task, entry, task)
+
+	def run_task(self, entry, task: bytes) -> None:
+		try:
+			self.execute_task(task)
+		except Exception as e:
+			self.logger.error(f"Task {entry} failed, requeueing it: {e}")
+			self.task_queue.release([entry])
+		else:
+			self.task_queue.consume([entry])
+		finally:
+			with self.slots_lock:
+				self.running_tasks -= 1
+			self.slot_freed.set()
 
-		# Create a PyArrow HadoopFileSystem
-		return pafs.HadoopFileSystem(host=hdfs_host, port=hdfs_port)
+	def execute_task(self, task: bytes) -> None:
+		output_handle = self.execution_unit.execute(task)
+		self.logger.info(f"Executed task, output stored at {output_handle.get_object_path()}")
 
 	def demo_hdfs_io(self) -> None:
 		file_path = f"/tmp/task_manager_hello_{self.machine.ID}.txt"
@@ -75,6 +122,11 @@ class TaskManager:
 		# self.logger.info(f"Read from HDFS: {contents}")
 
 	def shutdown(self) -> None:
+			self.stopped.set()
+			self.puller.join()
+			# running tasks finish and are consumed, claimed ones return to the queue with the session
+			self.executor.shutdown(wait=True)
+			self.heartbeat.stop()
 			self.zk.stop()
 			self.logger.info("Shutdown TaskManager.")
 
@@ -88,7 +140,7 @@ def main() -> None:
 		# Retrieve HDFS endpoint from environment
 		hdfs_namenode = os.environ.get('HDFS_NAMENODE', 'hdfs://hdfs2name:8020')
 		logger.info(f"HDFS_NAMENODE = {hdfs_namenode}")
-		fs = TaskManager.get_fs(hdfs_namenode)
+		fs = get_fs(hdfs_namenode)
 
 		task_manager = TaskManager(zookeeper_host, fs)
 		logger.info("I am Task Manager " + str(task_manager.machine.ID))
@@ -96,9 +148,8 @@ def main() -> None:
 		# Optional: demonstrate HDFS I/O
 		#task_manager.demo_hdfs_io()
 
-		# Keep the Task Manager running
-		while True:
-			pass
+		# Keep the Task Manager running, without spinning a core (it would show up in the load average)
+		threading.Event().wait()
 	except Exception as e:
 		logging.error(f"An error occurred: {e}")
 		raise e
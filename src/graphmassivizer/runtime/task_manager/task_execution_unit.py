@@ -3,10 +3,18 @@
 # - enqueueTask: Adds a task to the execution unit's queue.
 # - stop: Stops the execution unit.
 # - eraseDataset: Signals the execution unit to erase a dataset.
+# - TaskExecutionUnit: Runs the dataflow BGOs of the tasks pulled from the task queue.
 
 
+import json
 from abc import ABC
 
+from graphmassivizer.core.dataflow.bfs import DepthLimitedBFS
+from graphmassivizer.core.dataflow.object_handle import ObjectHandle
+
+# dataflow BGOs Task Managers execute unless given others
+DEFAULT_BGOS = (DepthLimitedBFS,)
+
 
 class BGO(ABC):
     def __init__(self) -> None:
@@ -14,3 +22,64 @@ class BGO(ABC):
 
     def run(self):
         pass
+
+
+class TaskExecutionUnit:
+    """Executes queued tasks: a dataflow BGO (graphmassivizer.core.dataflow.BGO) applied to stored objects.
+
+    A task is JSON naming a registered BGO by its implementationId, with the arguments to construct it and
+    the paths of its input objects, see encode. Only registered BGOs are run, whoever can write to the task
+    queue cannot execute arbitrary code. Inputs and outputs are resolved by the DataManager of the Task
+    Manager, which has to share its store with the Workload Manager.
+    """
+
+    def __init__(self, data_manager, bgos=DEFAULT_BGOS) -> None:
+        """
+        :param bgos: the BGO classes tasks may run, each is constructed with the keyword arguments of its get_args().
+        """
+        self.data_manager = data_manager
+        self.bgos = {self.get_implementation_id(bgo): bgo for bgo in bgos}
+
+    @staticmethod
+    def get_implementation_id(bgo) -> str:
+        """Name of a BGO (class or instance) in tasks."""
+        return bgo.implementationId or (bgo.__name__ if isinstance(bgo, type) else type(bgo).__name__)
+
+    @staticmethod
+    def encode(bgo, object_handle) -> bytes:
+        """Serializes a task for InfrastructureManager.submit_tasks.
+
+        :param object_handle: the input, a list of handles if the BGO supports multiple inputs.
+        """
+        if isinstance(object_handle, list):
+            paths = [handle.get_object_path() for handle in object_handle]
+        else:
+            paths = object_handle.get_object_path()
+        return json.dumps({"bgo": TaskExecutionUnit.get_implementation_id(bgo), "args": bgo.get_args(),
+                           "input": paths}).encode()
+
+    def decode(self, task: bytes):
+        """The BGO and input handle(s) of an encoded task.
+
+        :raises ValueError: if the task is malformed or its BGO is not registered.
+        """
+        try:
+            task = json.loads(task)
+            bgo_class = self.bgos.get(task["bgo"])
+            args, paths = task["args"], task["input"]
+        except (ValueError, TypeError, KeyError) as e:
+            raise ValueError(f"Malformed task: {e}") from e
+        if bgo_class is None:
+            raise ValueError(f"BGO {task['bgo']} is not registered")
+        try:
+            bgo = bgo_class(**args)
+        except TypeError as e:
+            raise ValueError(f"Invalid arguments for BGO {task['bgo']}: {e}") from e
+        if isinstance(paths, list):
+            return bgo, [ObjectHandle(path) for path in paths]
+        return bgo, ObjectHandle(paths)
+
+    def execute(self, task: bytes) -> ObjectHandle:
+        """Runs the task and returns the handle of its persisted output."""
+        bgo, object_handle = self.decode(task)
+        return bgo.execute(self.data_manager, object_handle)
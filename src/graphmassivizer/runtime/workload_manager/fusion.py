@@ -0,0 +1,102 @@
+# Fuses linear chains of BGOs in the workflow DAG into single tasks.
+# - Two consecutive tasks are fused if the first only feeds the second, the second only reads the first
+#   and their selected implementations can be placed on the same Task Manager.
+# - A fused task runs its members one after the other in the same process, so intermediate results
+#   stay in memory and only the output of the chain leaves the Task Manager.
+
+from graphmassivizer.runtime.task_manager.task_execution_unit import BGO
+
+
+class FusedBGO(BGO):
+	"""Runs the BGOs of a fused chain in order on the same arguments, returning the output of the last one."""
+
+	def __init__(self, members) -> None:
+		self.members = members
+		self.implementationId = "+".join(member.implementationId for member in members)
+
+	def run(self, args={}):
+		output = None
+		for member in self.members:
+			output = member.run(args)
+		return output
+
+
+class Fuser:
+
+	# implementation properties that determine where a task can run. Only deterministic ones: 'greenified' is
+	# chosen at random by Optimizer_2, comparing it would make the fused chains differ between runs.
+	placement_keys = ('platform', 'language', 'hardwareRequirement')
+
+	def selected_implementation(node):
+		"""The implementation a task runs with, the first one like in Simulation.run."""
+		return next(iter(node['implementations'].items()))
+
+	def compatible(first, second):
+		_, first_impl = Fuser.selected_implementation(first)
+		_, second_impl = Fuser.selected_implementation(second)
+		return all(first_impl.get(key) == second_impl.get(key) for key in Fuser.placement_keys)
+
+	def predecessors(DAG):
+		predecessors = {id: [] for id in DAG['nodes']}
+		for id, node in DAG['nodes'].items():
+			for next_id in node.get('next', ()):
+				predecessors[next_id].append(id)
+		return predecessors
+
+	def chains(DAG):
+		"""Maximal linear chains of fusible tasks, as lists of task ids from head to tail."""
+		predecessors = Fuser.predecessors(DAG)
+
+		def fusible(id):
+			# the single successor of id, if id can be fused with it
+			next_ids = list(DAG['nodes'][id].get('next', ()))
+			if len(next_ids) != 1 or len(predecessors[next_ids[0]]) != 1:
+				return None
+			if not Fuser.compatible(DAG['nodes'][id], DAG['nodes'][next_ids[0]]):
+				return None
+			return next_ids[0]
+
+		continued = {fusible(id) for id in DAG['nodes']} - {None}
+		chains = []
+		for id in DAG['nodes']:
+			if id in continued:
+				continue  # not the head of a chain
+			chain = [id]
+			while (next_id := fusible(chain[-1])) is not None:
+				chain.append(next_id)
+			if len(chain) > 1:
+				chains.append(chain)
+		return chains
+
+	def fuse(DAG):
+		"""Replace every fusible chain by its head task running a FusedBGO, returns the fused chains.
+
+		The head node is updated in place, so references to it (e.g. to the first task) stay valid.
+		"""
+		chains = Fuser.chains(DAG)
+		for chain in chains:
+			head = DAG['nodes'][chain[0]]
+			members = [DAG['nodes'][id] for id in chain]
+			implementations = [Fuser.selected_implementation(member) for member in members]
+
+			fused = FusedBGO([implementation['class'] for _, implementation in implementations])
+			metadata = {key: value for key, value in implementations[0][1].items() if key != 'optimized'}
+			metadata['class'] = fused
+			if all('optimized' in implementation for _, implementation in implementations):
+				# per hardware, the estimates of all members
+				metadata['optimized'] = {hardware: [implementation['optimized'].get(hardware) for _, implementation in implementations]
+										 for hardware in implementations[0][1]['optimized']}
+
+			head['implementations'] = {fused.implementationId: metadata}
+			head['fused'] = chain
+			tail = members[-1]
+			if 'next' in tail:
+				head['next'] = tail['next']
+				DAG['edges'][chain[0]] = tail['next']
+			else:
+				head.pop('next', None)
+				DAG['edges'].pop(chain[0], None)
+			for id in chain[1:]:
+				del DAG['nodes'][id]
+				DAG['edges'].pop(id, None)
+		return chains
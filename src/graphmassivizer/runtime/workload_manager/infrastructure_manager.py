@@ -1,17 +1,46 @@
 # - Manages the infrastructure, including Task Manager discovery and resource allocation.
 # - Uses ZooKeeper to track available Task Managers and their resources.
 # - Implements the getMachine method, which selects a suitable Task Manager for execution nodes based on resource availability and location preferences.
+# - Task Managers register ephemeral nodes and publish their headroom in heartbeats, dead ones disappear with their session.
 # - Reclaims execution units when tasks are finished or datasets are erased.
 
 import threading
 import logging
 import json
+import os
+import time
+from enum import Enum
 from kazoo.client import KazooClient
 from kazoo.protocol.states import WatchedEvent, EventType
 from graphmassivizer.core.descriptors.descriptors import Machine, MachineDescriptor
+from graphmassivizer.core.zookeeper.task_queue import TaskQueue
+from graphmassivizer.runtime.task_manager.heartbeat import HEARTBEAT_ROOT, decode_metrics
+
+
+class LocationPreference:
+	"""Machines a task should (PREFERRED) or must (REQUIRED) be placed on, e.g. to be co-located with another task."""
+
+	class PreferenceLevel(Enum):
+		PREFERRED = "preferred"
+		REQUIRED = "required"
+
+	def __init__(self, machines, level=PreferenceLevel.PREFERRED) -> None:
+		"""
+		:param machines: a MachineDescriptor, or a list of alternatives.
+		"""
+		self.machines = list(machines) if isinstance(machines, (list, tuple, set)) else [machines]
+		self.level = level
+
+	def is_required(self) -> bool:
+		return self.level == LocationPreference.PreferenceLevel.REQUIRED
 
 
 class InfrastructureManager:
+	# Task Managers whose heartbeat did not change for that many seconds are not scheduled onto
+	heartbeat_timeout = 10.0
+	# get_machine re-reads the heartbeats if they are older than that many seconds
+	refresh_interval = 1.0
+
 	def __init__(self, workload_manager) -> None:
 
 		self.logger = logging.getLogger(self.__class__.__name__)
@@ -20,13 +49,18 @@ class InfrastructureManager:
 		self.machine = workload_manager.machine
 
 		self.node_info_lock = threading.Lock()
+		# live Task Manager id -> its machine (the data of its node)
 		self.tm_machine_map = {}
-		self.available_execution_units_map = {}
-		self.machine_idx = 0
+		# Task Manager id -> {"metrics": latest heartbeat, "version": of its node, "updated": when it last changed}
+		self.task_manager_health = {}
+		self.last_refresh = 0.0
 
 		self.zk = workload_manager.zk
 
 		self.init_zookeeper_directories()
+		# opt-in local copies of subtrees that are read often, e.g. ZK_MIRROR_PATHS=/taskmanagers,/environment,/deploy
+		for path in filter(None, os.environ.get('ZK_MIRROR_PATHS', '').split(',')):
+			self.zk.mirror(path.strip(), timeout=10)
 
 		self.machine_descriptors = {}  # Store MachineDescriptors
 		# self.store_machine_descriptor()
@@ -35,42 +69,40 @@ class InfrastructureManager:
 
 		# Watch for changes in task managers
 		self.zk.ChildrenWatch('/taskmanagers', self.zookeeper_task_manager_watcher)
+		self.zk.ChildrenWatch(HEARTBEAT_ROOT, self.zookeeper_heartbeat_watcher)
+
+		# Task Managers pull their tasks from this queue when they have free slots
+		self.task_queue = TaskQueue(self.zk.zk)
 
 		self.input_split_manager = None  # Placeholder for actual implementation
 
 	def print_zookeeper_subtree(self, path: str = "/", indent: int = 0) -> None:
 		"""
-		Recursively print (or log) the ZooKeeper nodes under `path`.
+		Print (or log) the ZooKeeper nodes under `path`.
 		"""
-		prefix = "  " * indent  # indentation for visual clarity
-
 		try:
-			# Get data and children for the current node
-			data, stat = self.zk.get(path)
-			children = self.zk.get_children(path)
+			# the whole subtree in one pipelined read per level
+			tree = self.zk.walk(path)
 		except Exception as e:
 			self.logger.warning(f"Failed to get info for path '{path}': {e}")
 			return
 
-		# Print path and data
-		# Note: data is raw bytes. You might want to decode them or just print length.
-		data_str = data.decode('utf-8', errors='replace') if data else ""
-		node_name = path if path != "" else "/"
-		self.logger.info(f"{prefix}{node_name} -> '{data_str}'")
-
-		# Recurse for each child
-		for child in children:
-			# Construct child path carefully
-			# If path == "/", then child_path = "/" + child
-			# else child_path = path + "/" + child
-			if path == "/":
-				child_path = f"/{child}"
-			else:
-				child_path = f"{path}/{child}"
-			self.print_zookeeper_subtree(child_path, indent + 1)
+		def print_node(node_path, depth):
+			data, stat, children = tree[node_path]
+			prefix = "  " * depth  # indentation for visual clarity
+			# Note: data is raw bytes. You might want to decode them or just print length.
+			data_str = data.decode('utf-8', errors='replace') if data else ""
+			self.logger.info(f"{prefix}{node_path} -> '{data_str}'")
+			for child in children:
+				child_path = f"{node_path.rstrip('/')}/{child}"
+				if child_path in tree:
+					print_node(child_path, depth + 1)
+
+		if path in tree:
+			print_node(path, indent)
 
 	def init_zookeeper_directories(self) -> None:
-		paths = ['/workloadmanager', '/taskmanagers', '/environment']
+		paths = ['/workloadmanager', '/taskmanagers', '/environment', HEARTBEAT_ROOT]
 		for path in paths:
 			if not self.zk.exists(path):
 				self.zk.create(path)
@@ -107,9 +139,14 @@ class InfrastructureManager:
 		with self.node_info_lock:
 			self.logger.debug(f"Task Manager nodes: {task_manager_nodes}")
 			# Update machine descriptors based on task manager nodes
-			for node in task_manager_nodes:
-				node_path = f'/taskmanagers/{node}'
-				data, stat = self.zk.get(node_path)
+			nodes = self.zk.get_many([f'/taskmanagers/{node}' for node in task_manager_nodes])
+			# the nodes are ephemeral, Task Managers whose session ended are no longer listed
+			self.tm_machine_map = {}
+			for node_path, node in nodes.items():
+				if node is None:
+					continue  # gone since the watch fired
+				data, stat = node
+				self.tm_machine_map[node_path.rsplit('/', 1)[1]] = self.parse_machine(data)
 				# if data:
 				#	 machine_info = json.loads(data.decode('utf-8'))
 				#	 self.update_machine_descriptors(machine_info)
@@ -119,15 +156,88 @@ class InfrastructureManager:
 			self.logger.info("ZK tree updated with task manager nodes")
 			#self.print_zookeeper_subtree("/")
 
-	def get_machine(self, location_preference=None):
+	def parse_machine(self, data: bytes):
+		"""The MachineDescriptor of a Task Manager node (see Machine.to_utf8), None if the node has none."""
+		descriptor = json.loads(data.decode('utf-8')).get("descriptor") if data else None
+		if descriptor is None:
+			return None
+		machine = MachineDescriptor(descriptor["address"], descriptor["host_name"], descriptor["hardware"],
+									int(descriptor["cpu_cores"]), int(descriptor["ram_size"]), int(descriptor["hdd"]))
+		machine.zk_state_manager = self.zk
+		return machine
+
+	def zookeeper_heartbeat_watcher(self, heartbeat_nodes) -> None:
+		self.refresh_task_manager_health(heartbeat_nodes)
+
+	def refresh_task_manager_health(self, heartbeat_nodes=None) -> None:
+		"""Reads the latest heartbeats of all Task Managers, in one pipelined round-trip."""
+		if heartbeat_nodes is None:
+			heartbeat_nodes = self.zk.get_children(HEARTBEAT_ROOT)
+		nodes = self.zk.get_many([f'{HEARTBEAT_ROOT}/{node}' for node in heartbeat_nodes])
+		now = time.monotonic()
+		with self.node_info_lock:
+			health = {}
+			for node_path, node in nodes.items():
+				if node is None:
+					continue
+				data, stat = node
+				task_manager_id = node_path.rsplit('/', 1)[1]
+				previous = self.task_manager_health.get(task_manager_id)
+				if previous is not None and previous["version"] == stat.version:
+					health[task_manager_id] = previous  # no heartbeat since the last refresh
+				else:
+					health[task_manager_id] = {"metrics": decode_metrics(data), "version": stat.version, "updated": now}
+			self.task_manager_health = health
+			self.last_refresh = now
+
+	def rank_task_managers(self) -> list:
+		"""Ids of live Task Managers with a recent heartbeat, most headroom first: free slots, free memory, then lowest load."""
+		now = time.monotonic()
+		with self.node_info_lock:
+			live = [(task_manager_id, health["metrics"]) for task_manager_id, health in self.task_manager_health.items()
+					if self.tm_machine_map.get(task_manager_id) is not None and now - health["updated"] <= self.heartbeat_timeout]
+		live.sort(key=lambda item: (-item[1]["free_slots"], -item[1]["free_memory"], item[1]["load"]))
+		return [task_manager_id for task_manager_id, _ in live]
+
+	def __preferred_task_managers(self, location_preference) -> set:
+		"""Ids of the live Task Managers on the preferred machines, matched by address."""
+		if isinstance(location_preference, (str, int)):
+			return {str(location_preference)}  # the id of a Task Manager
+		addresses = {machine.address for machine in location_preference.machines}
+		return {task_manager_id for task_manager_id, machine in self.tm_machine_map.items()
+				if machine is not None and machine.address in addresses}
+
+	def get_machine(self, location_preference=None) -> MachineDescriptor:
+		"""The machine of the Task Manager a task is placed on, the one with the most headroom by default.
+
+		:param location_preference: a LocationPreference, or the id of a preferred Task Manager. A preferred
+			Task Manager is chosen if it has a free slot, a required one as long as it is live.
+		:raises Exception: if no Task Manager is available, or none on the machines of a required preference.
+		"""
+		if time.monotonic() - self.last_refresh > self.refresh_interval:
+			self.refresh_task_manager_health()
+		ranked = self.rank_task_managers()
+		required = isinstance(location_preference, LocationPreference) and location_preference.is_required()
 		with self.node_info_lock:
-			worker_machines = list(self.tm_machine_map.values())
-			if not worker_machines:
+			preferred = [] if location_preference is None else \
+				[task_manager_id for task_manager_id in ranked if task_manager_id in self.__preferred_task_managers(location_preference)]
+			if required and not preferred:
+				raise Exception(f"None of the required machines {[m.address for m in location_preference.machines]} is available.")
+			if not ranked:
 				raise Exception("No available machines.")
-			self.machine_idx = (self.machine_idx + 1) % len(worker_machines)
-			selected_machine = worker_machines[self.machine_idx]
-			self.available_execution_units_map[selected_machine.uid] -= 1
-			return selected_machine
+			free = [task_manager_id for task_manager_id in preferred
+					if self.task_manager_health[task_manager_id]["metrics"]["free_slots"] > 0]
+			selected = (free or preferred)[0] if required else (free or ranked)[0]
+			# the task occupies a slot until the next heartbeat reports it
+			self.task_manager_health[selected]["metrics"]["free_slots"] -= 1
+			return self.tm_machine_map[selected]
+
+	def submit_tasks(self, tasks, priority=100) -> list:
+		"""Queues serialized tasks for the Task Managers, lower priority values are claimed first.
+
+		Tasks are serialized with TaskExecutionUnit.encode.
+		"""
+		return self.task_queue.put_all(list(tasks), priority)
 
 	def shutdown_infrastructure_manager(self) -> None:
 		self.print_zookeeper_subtree("/")
@@ -2,6 +2,7 @@ from graphmassivizer.runtime.workload_manager.input.userInputHandler import User
 from graphmassivizer.runtime.workload_manager.parallelizer import Parallelizer
 from graphmassivizer.runtime.workload_manager.optimization_1 import Optimizer_1
 from graphmassivizer.runtime.workload_manager.optimization_2 import Optimizer_2
+from graphmassivizer.runtime.workload_manager.fusion import Fuser
 import graphmassivizer.runtime.task_manager.BGO.networkx_bgos
 import tarfile
 
@@ -15,7 +16,7 @@ class InputPipeline:
 				 metaphactoryAddress="http://localhost:10214/",
 				 workflowIRI="https://ontologies.metaphacts.com/bgo-ontology/instances/workflow-deae5723-dafb-4e79-8648-0510f0312958",
 				 availableBGOs={x[1].implementationId:{'name':x[0],'class':x[1]} for x in inspect.getmembers(sys.modules['graphmassivizer.runtime.task_manager.BGO.networkx_bgos'], inspect.isclass) if x[0] != "BGO"}):
-		self.userInputHandler = UserInputHandler(metaphactoryAddress=metaphactoryAddress)
+		self.userInputHandler = UserInputHandler(metaphactoryAddress=metaphactoryAddress,workflowIRI=workflowIRI)
 		self.workflowIRI = workflowIRI
 		self.availableBGOs = availableBGOs
 		self.state = state
@@ -42,4 +43,6 @@ class InputPipeline:
 
 		Optimizer_2.optimize(DAG)
 
+		Fuser.fuse(DAG)
+
 		return DAG,firstTask
@@ -1,26 +1,49 @@
+import asyncio
 import json
 import re
-import io
+from concurrent.futures import ThreadPoolExecutor
 from functools import reduce
 
-from graphmassivizer.core.connectors.metaphactory import MetaphactoryConnector
+from graphmassivizer.core.connectors.metaphactory import AsyncMetaphactoryConnector, MetaphactoryConnector
 from graphmassivizer.core.descriptors.descriptors import BGODescriptor
 
 class UserInputHandler:
 
 	def __init__(self,
 				 metaphactoryAddress="http://localhost:10214/",
-				 bgoArgs={'inputNode':'https://semopenalex.org/author/A5006947708','topic':'https://semopenalex.org/concept/C41008148','author':'https://semopenalex.org/author/A5006947708'}):
+				 bgoArgs={'inputNode':'https://semopenalex.org/author/A5006947708','topic':'https://semopenalex.org/concept/C41008148','author':'https://semopenalex.org/author/A5006947708'},
+				 workflowIRI=None):
+		"""
+		:param workflowIRI: the workflow getWorkflow will be called with. If given, it is queried concurrently with the default graph.
+		"""
 		self.metaphactory = MetaphactoryConnector(metaphactoryAddress=metaphactoryAddress)
 		self.DAG = {"args":bgoArgs, "directed": False, "multigraph": False, "nodes":{}, "edges":{}}
+		self.workflowResults = {}
 		if 'graph' not in self.DAG['args']:
-			self.DAG['args']['graph'] = self.defaultGraph()
+			if workflowIRI is None:
+				self.DAG['args']['graph'] = self.defaultGraph()
+			else:
+				workflow,graph = self.runQueries(AsyncMetaphactoryConnector(connector=self.metaphactory).workflowAndCoauthorGraph(workflowIRI,self.DAG['args']['topic'],self.DAG['args']['author']))
+				self.workflowResults[workflowIRI] = workflow
+				self.DAG['args']['graph'] = graph
+
+	@staticmethod
+	def runQueries(coroutine):
+		"""Runs the coroutine to completion, in an event loop on a thread of its own if called from a running loop."""
+		try:
+			asyncio.get_running_loop()
+		except RuntimeError:
+			return asyncio.run(coroutine)
+		# asyncio.run cannot be nested, and the constructor blocks the calling loop either way
+		with ThreadPoolExecutor(1) as executor:
+			return executor.submit(asyncio.run,coroutine).result()
 
 	def getWorkflow(self,workflowIRI,availableBGOs):
-		return self.formatWorkflow(json.loads(self.metaphactory.workflowQuery(workflowIRI)),workflowIRI,availableBGOs)
+		result = self.workflowResults.pop(workflowIRI,None) or self.metaphactory.workflowQuery(workflowIRI)
+		return self.formatWorkflow(json.loads(result),workflowIRI,availableBGOs)
 
 	def defaultGraph(self):
-		return io.TextIOWrapper(io.BytesIO(self.metaphactory.coauthorQuery(self.DAG['args']['topic'],self.DAG['args']['author'])[17:]))
+		return self.metaphactory.coauthorGraph(self.DAG['args']['topic'],self.DAG['args']['author'])
 
 	def formatIRI(self,iriString):
 		return re.split(r"/",iriString)[-1]
@@ -90,8 +90,10 @@ class WorkloadManager:
 		self.zk = ZookeeperStateManager(self.zookeeper_host)
 		self.machine = Machine.parse_from_env(self.zk,prefix="WM_")
 		self.register_self()
+		self.dataManager = DataManager('/dm', self.fs)
+		# large payloads, e.g. the environment model of a big cluster, are kept in HDFS instead of ZooKeeper
+		self.zk.blob_store = self.dataManager
 		self.infrastructure_manager = InfrastructureManager(workload_manager=self)
-		self.dataManager = DataManager('/dm', self.zk)
 
 	# def __enter__(self) -> "WorkloadManager":
 	#	 self.start()
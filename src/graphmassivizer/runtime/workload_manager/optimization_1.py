@@ -48,6 +48,18 @@ class Optimizer_1:
 						 "A5080187829": 0.000031, "A5109650481": 0.000027, "A5001795601": 0.000033,
 						 "A5003105325": 0.000032, "A5043437297": 0.000025, "A5100392487": 0.000030 }}
 
+	# Bytes a NetworkX graph takes in memory per byte of its columnar stored form: loading the coauthor graph
+	# tests/resources/subgraph.edgelist (263 kB stored) allocates 3.1 MB according to tracemalloc, 11.8 per byte
+	NETWORKX_BYTES_PER_STORED_BYTE = 12
+
+	def estimate(implementationId, input_bytes=None):
+		"""Estimated runtime (seconds, from the benchmarks) and peak memory (bytes) of a BGO, None if unknown."""
+		runtime = Optimizer_1.benchmarks.get(implementationId)
+		if isinstance(runtime, dict):
+			runtime = max(runtime.values())
+		memory = None if input_bytes is None else input_bytes * Optimizer_1.NETWORKX_BYTES_PER_STORED_BYTE
+		return runtime, memory
+
 	def get_optimization_result(alg,algorithmDict,hardwareID):
 		valForAlg = Optimizer_1.benchmarks[alg]
 		if 'optimized' not in algorithmDict: algorithmDict['optimized'] = {}
@@ -1,6 +1,8 @@
 import logging
 import random
 
+from graphmassivizer.runtime.workload_manager.infrastructure_manager import LocationPreference
+
 # Now, define the Scheduler class
 from collections import deque
 
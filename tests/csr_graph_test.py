@@ -0,0 +1,92 @@
+import tempfile
+from unittest import TestCase
+
+import networkx as nx
+import numpy as np
+import pyarrow.fs as pafs
+
+from graphmassivizer.core.dataflow.csr_graph import CSRGraph
+from graphmassivizer.core.dataflow.csv_ingest import read_edge_csv
+from graphmassivizer.core.dataflow.data_manager import DataManager
+from graphmassivizer.core.dataflow.graph_wrapper import GraphWrapper
+from graphmassivizer.core.dataflow.object_handle import ObjectHandle
+from graphmassivizer.core.dataflow.object_wrapper import ObjectWrapper
+
+
+class CSRGraphTest(TestCase):
+
+    def setUp(self) -> None:
+        self.graph = nx.read_edgelist("./tests/resources/subgraph.edgelist")
+
+    def test_networkx_round_trip(self) -> None:
+        csr = CSRGraph.from_networkx(self.graph)
+        self.assertEqual(csr.number_of_nodes(), self.graph.number_of_nodes())
+        self.assertEqual(csr.number_of_edges(), self.graph.number_of_edges())
+        self.assertTrue(nx.utils.graphs_equal(csr.to_networkx(), self.graph))
+        self.assertEqual(GraphWrapper(csr), GraphWrapper(self.graph))
+
+        weighted = nx.DiGraph([(0, 1, {"w": 2.0}), (1, 2, {"w": 0.5}), (2, 2, {"w": 1.0})])
+        csr = CSRGraph.from_networkx(weighted, weight="w")
+        self.assertTrue(nx.utils.graphs_equal(csr.to_networkx(), weighted))
+        self.assertEqual(GraphWrapper(csr), GraphWrapper(weighted))
+
+    def test_unsupported_labels(self) -> None:
+        for graph in (nx.grid_2d_graph(2, 2), nx.Graph([(1, "a")]), nx.Graph([(1 << 64, 1)])):
+            with self.assertRaises(ValueError):
+                CSRGraph.from_networkx(graph)
+        relabeled = nx.convert_node_labels_to_integers(nx.grid_2d_graph(2, 2))
+        self.assertEqual(CSRGraph.from_networkx(relabeled).number_of_edges(), 4)
+
+    def test_from_edge_arrays(self) -> None:
+        csr = CSRGraph.from_edge_arrays([0, 1, 2, 3], [1, 2, 0, 3], num_nodes=5)
+        self.assertEqual(sorted(csr.neighbors(0).tolist()), [1, 2])
+        self.assertEqual(csr.neighbors(3).tolist(), [3])
+        self.assertEqual(csr.number_of_edges(), 4)
+        self.assertEqual(csr.bfs_levels(1).tolist(), [1, 0, 1, -1, -1])
+        self.assertEqual(csr.bfs_levels(1, depth_limit=0).tolist(), [-1, 0, -1, -1, -1])
+        for sources, targets in (([0, 5], [1, 2]), ([0], [-1])):
+            with self.assertRaises(ValueError):
+                CSRGraph.from_edge_arrays(sources, targets, num_nodes=5)
+
+    def test_bfs_levels_match_networkx(self) -> None:
+        csr = CSRGraph.from_networkx(self.graph)
+        source = next(iter(self.graph.nodes))
+        expected = nx.single_source_shortest_path_length(self.graph, source, cutoff=3)
+        levels = csr.bfs_levels(csr.index_of(source), depth_limit=3)
+        labels = csr.get_labels()
+        self.assertEqual({labels[i]: int(levels[i]) for i in np.flatnonzero(levels >= 0)}, expected)
+
+    def test_persisted_without_conversion(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            data_manager = DataManager(tmp, pafs.LocalFileSystem())
+            handle = ObjectHandle("csr")
+            csr = CSRGraph.from_networkx(self.graph)
+            data_manager.persist_object(ObjectWrapper(csr, handle))
+
+            loaded = data_manager.load_object(handle).get_object()
+            self.assertIsInstance(loaded, CSRGraph)
+            np.testing.assert_array_equal(loaded.offsets, csr.offsets)
+            np.testing.assert_array_equal(loaded.indices, csr.indices)
+            self.assertEqual(loaded.get_labels(), csr.get_labels())
+            self.assertEqual(data_manager.get_content_hash(handle), GraphWrapper(self.graph).get_metadata().graph_id)
+
+    def test_read_edge_csv(self) -> None:
+        with open("./tests/resources/subgraph.edgelist") as f:
+            lines = [",".join(line.split()[:2]) for line in f if line.strip()]
+        data = ("author,coauthor\r\n" + "\r\n".join(lines) + "\r\n").encode()
+        chunks = [data[i:i + 1000] for i in range(0, len(data), 1000)]
+        csr = read_edge_csv(iter(chunks), block_size=4096)
+        self.assertTrue(nx.utils.graphs_equal(csr.to_networkx(), self.graph))
+
+        # labels that look like numbers stay strings, edges listed in both directions are stored once
+        csr = read_edge_csv(b"a,b\n1,2\n2,1\n2,x\n")
+        self.assertEqual(["1", "2", "x"], csr.get_labels())
+        self.assertEqual(2, csr.number_of_edges())
+        self.assertEqual(3, read_edge_csv(b"a,b\n1,2\n2,1\n2,x\n", directed=True).number_of_edges())
+
+    def test_read_empty_edge_csv(self) -> None:
+        for data in (b"author,coauthor\n", b"author,coauthor", iter([b"author,", b"coauthor\r\n"])):
+            csr = read_edge_csv(data)
+            self.assertEqual(0, csr.number_of_nodes())
+            self.assertEqual(0, csr.number_of_edges())
+            self.assertEqual([], csr.get_labels())
@@ -0,0 +1,250 @@
+import os
+import pickle
+import tempfile
+from unittest import TestCase
+
+import networkx as nx
+import pyarrow.fs as pafs
+
+from graphmassivizer.core.dataflow.codecs import CodecPolicy
+from graphmassivizer.core.dataflow.csr_graph import CSRGraph
+from graphmassivizer.core.dataflow.data_manager import DataManager
+from graphmassivizer.core.dataflow.graph_format import ArrowGraphFormat
+from graphmassivizer.core.dataflow.object_cache import TieredObjectCache
+from graphmassivizer.core.dataflow.object_handle import ObjectHandle
+from graphmassivizer.core.dataflow.object_wrapper import ObjectWrapper
+
+
+class DataManagerTest(TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_manager = DataManager(self.tmp.name, pafs.LocalFileSystem())
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def persist(self, obj, path="graph"):
+        handle = ObjectHandle(path)
+        self.data_manager.persist_object(ObjectWrapper(obj, handle))
+        return handle
+
+    def test_graph_is_stored_columnar(self) -> None:
+        graph = nx.read_edgelist("./tests/resources/subgraph.edgelist")
+        handle = self.persist(graph)
+
+        directory = os.path.join(self.tmp.name, "graph")
+        self.assertTrue(os.path.exists(os.path.join(directory, ArrowGraphFormat.EDGES)))
+        self.assertFalse(os.path.exists(os.path.join(directory, "object.pkl")))
+
+        loaded = self.data_manager.load_object(handle).get_object()
+        self.assertEqual(set(graph.nodes), set(loaded.nodes))
+        self.assertEqual({frozenset(e) for e in graph.edges}, {frozenset(e) for e in loaded.edges})
+
+    def test_attributes_and_column_selection(self) -> None:
+        graph = nx.MultiDiGraph(name="test")
+        graph.add_node(1, label="a")
+        graph.add_edge(1, 2, weight=0.5, kind="x")
+        graph.add_edge(1, 2, weight=1.5)
+        handle = self.persist(graph)
+
+        loaded = self.data_manager.load_object(handle).get_object()
+        self.assertIsInstance(loaded, nx.MultiDiGraph)
+        self.assertEqual(loaded.graph, {"name": "test"})
+        self.assertEqual(loaded.nodes[1], {"label": "a"})
+        self.assertEqual(sorted(loaded.edges(keys=True, data=True)), sorted(graph.edges(keys=True, data=True)))
+
+        projected = self.data_manager.load_object(handle, columns=["weight"]).get_object()
+        self.assertEqual(projected.nodes[1], {})
+        self.assertEqual(sorted(d["weight"] for _, _, d in projected.edges(data=True)), [0.5, 1.5])
+        self.assertEqual(self.data_manager.load_table(handle, columns=[]).column_names, ["source", "target", "key"])
+
+    def test_pickle_fallback(self) -> None:
+        graph = nx.Graph()
+        graph.add_edge((0, 1), (1, 2))
+        for obj in [{"betweenness": [("a", 0.5)]}, graph]:
+            handle = self.persist(obj)
+            self.assertEqual(self.data_manager.load_object(handle).get_object().__class__, obj.__class__)
+        self.assertEqual(set(self.data_manager.load_object(handle).get_object().nodes), {(0, 1), (1, 2)})
+
+    def test_graphs_without_exact_columns_are_pickled(self) -> None:
+        handle = self.persist(nx.path_graph(3))
+        huge = nx.Graph()
+        huge.add_edge(2 ** 63 + 5, 2 ** 64)
+        mixed = nx.Graph()
+        mixed.add_edge(1, 2, w=1)
+        mixed.add_edge(2, 3, w=0.5)
+        unset = nx.Graph()
+        unset.add_node(1, label=None)
+        unset.add_node(2, label="b")
+        loaded = {}
+        for name, graph in (("huge", huge), ("mixed", mixed), ("unset", unset)):
+            # overwrites the columnar graph stored before
+            self.persist(graph)
+            self.assertIsNone(self.data_manager.get_manifest(handle))
+            loaded[name] = self.data_manager.load_object(handle).get_object()
+            self.assertTrue(nx.utils.graphs_equal(loaded[name], graph))
+        self.assertIs(type(loaded["mixed"].edges[1, 2]["w"]), int)
+        self.assertEqual(loaded["unset"].nodes[1], {"label": None})
+
+    def test_missing_content_hash_is_recomputed(self) -> None:
+        for name, graph in {"columnar": nx.path_graph(5), "pickled": nx.Graph([(1, 2, {"w": None})])}.items():
+            handle = self.persist(graph, name)
+            content_hash = self.data_manager.get_content_hash(handle)
+            directory = os.path.join(self.tmp.name, name)
+            os.remove(os.path.join(directory, DataManager.HASH_FILE))
+            modified = {file: os.stat(os.path.join(directory, file)).st_mtime_ns for file in os.listdir(directory)}
+
+            self.assertEqual(content_hash, self.data_manager.get_content_hash(handle))
+            # reading the hash writes nothing
+            self.assertEqual(modified, {file: os.stat(os.path.join(directory, file)).st_mtime_ns
+                                        for file in os.listdir(directory)})
+            self.assertFalse(os.path.exists(os.path.join(directory, DataManager.HASH_FILE)))
+
+    def test_lazy_load(self) -> None:
+        graph = nx.read_edgelist("./tests/resources/subgraph.edgelist")
+        handle = self.persist(graph)
+
+        lazy = self.data_manager.load_object(handle, lazy=True)
+        self.assertFalse(lazy.is_loaded())
+        self.assertEqual(lazy.get_manifest()["tables"]["edges"]["rows"], graph.number_of_edges())
+        self.assertGreater(lazy.get_size(), 0)
+        self.assertEqual(lazy.get_metadata().graph_id, self.data_manager.get_content_hash(handle))
+        self.assertFalse(lazy.is_loaded())
+
+        self.assertEqual(lazy.get_object().number_of_edges(), graph.number_of_edges())
+        self.assertTrue(lazy.is_loaded())
+        self.assertIs(lazy.get_object(), lazy.get_object())
+        self.assertIsNone(self.data_manager.load_object(self.persist({"a": 1}, "dict"), lazy=True).get_manifest())
+
+    def test_tiered_cache(self) -> None:
+        with tempfile.TemporaryDirectory() as local_dir:
+            cache = TieredObjectCache(memory_bytes=1 << 20, local_dir=local_dir)
+            store = DataManager(self.tmp.name, pafs.LocalFileSystem())
+            data_manager = DataManager(self.tmp.name, pafs.LocalFileSystem(), cache)
+            handle = ObjectHandle("graph")
+            store.persist_object(ObjectWrapper(nx.path_graph(10), handle))
+
+            self.assertEqual(data_manager.load_object(handle).get_object().number_of_nodes(), 10)
+            self.assertEqual(data_manager.load_object(handle).get_object().number_of_nodes(), 10)
+            self.assertEqual(cache.get_stats()["misses"], 1)
+            self.assertEqual(cache.get_stats()["memory_hits"], 1)
+            self.assertTrue(os.path.exists(os.path.join(local_dir, "graph", DataManager.HASH_FILE)))
+
+            # a restarted process still has the local copy, rewritten objects are not served stale
+            cache = TieredObjectCache(memory_bytes=1 << 20, local_dir=local_dir, disk_bytes=1)
+            data_manager = DataManager(self.tmp.name, pafs.LocalFileSystem(), cache)
+            data_manager.load_object(handle)
+            self.assertEqual(cache.get_stats()["disk_hits"], 1)
+            store.persist_object(ObjectWrapper(nx.path_graph(5), handle))
+            self.assertEqual(data_manager.load_object(handle).get_object().number_of_nodes(), 5)
+            self.assertEqual(cache.get_stats()["misses"], 1)
+
+            # only one local copy fits the quota
+            other = ObjectHandle("other")
+            data_manager.persist_object(ObjectWrapper(nx.path_graph(3), other))
+            self.assertEqual(data_manager.load_object(other).get_object().number_of_nodes(), 3)
+            self.assertEqual(cache.get_stats()["memory_hits"], 1)
+            cache.invalidate(other)
+            data_manager.load_object(other)
+            self.assertEqual(cache.get_stats()["disk_evictions"], 1)
+            self.assertFalse(os.path.exists(os.path.join(local_dir, "graph", DataManager.HASH_FILE)))
+
+    def test_memory_tier_is_charged_the_loaded_size(self) -> None:
+        graph = nx.path_graph(1000)
+        handle = self.persist(graph)
+        stored_size = self.data_manager.get_object_size(handle)
+        self.assertGreater(TieredObjectCache.estimate_size(graph, stored_size), 2 * stored_size)
+
+        # the graph is only kept in memory if its estimated footprint fits
+        cache = TieredObjectCache(memory_bytes=2 * stored_size)
+        data_manager = DataManager(self.tmp.name, pafs.LocalFileSystem(), cache)
+        data_manager.load_object(handle)
+        data_manager.load_object(handle)
+        self.assertEqual(cache.get_stats()["memory_hits"], 0)
+
+    def test_prefetch(self) -> None:
+        handle = self.persist(nx.path_graph(10))
+        data_manager = DataManager(self.tmp.name, pafs.LocalFileSystem(), prefetch_bytes=1 << 20)
+        data_manager.prefetch(handle)
+        self.assertEqual(data_manager.load_object(handle).get_object().number_of_nodes(), 10)
+        self.assertEqual(data_manager.prefetcher.get_stats()["taken"], 1)
+        self.assertEqual(data_manager.prefetcher.used_bytes, 0)
+
+        # rewritten objects are not served from the prefetched copy
+        data_manager.prefetch(handle)
+        data_manager.persist_object(ObjectWrapper(nx.path_graph(4), handle))
+        self.assertEqual(data_manager.load_object(handle).get_object().number_of_nodes(), 4)
+
+        small = DataManager(self.tmp.name, pafs.LocalFileSystem(), prefetch_bytes=1)
+        small.prefetch(handle)
+        self.assertEqual(small.load_object(handle).get_object().number_of_nodes(), 4)
+        self.assertEqual(small.prefetcher.get_stats()["skipped"], 1)
+
+        # the budget is charged the footprint of the loaded graph, not its stored size
+        handle = self.persist(nx.path_graph(1000))
+        stored_size = data_manager.get_object_size(handle)
+        small = DataManager(self.tmp.name, pafs.LocalFileSystem(), prefetch_bytes=2 * stored_size)
+        small.prefetch(handle)
+        self.assertEqual(small.load_object(handle).get_object().number_of_nodes(), 1000)
+        self.assertEqual(small.prefetcher.get_stats()["skipped"], 1)
+        self.assertEqual(small.prefetcher.used_bytes, 0)
+
+    def test_partitioned_graph(self) -> None:
+        graph = nx.read_edgelist("./tests/resources/subgraph.edgelist")
+        handle = ObjectHandle("graph")
+        self.data_manager.persist_object(ObjectWrapper(graph, handle), partitions=4)
+        self.assertEqual(ArrowGraphFormat.partition_count(self.data_manager.get_manifest(handle)), 4)
+
+        nodes = set()
+        edges = set()
+        for i in range(4):
+            part = self.data_manager.load_table(handle, "nodes", partitions=[i]).column("id").to_pylist()
+            self.assertTrue(nodes.isdisjoint(part))
+            nodes.update(part)
+            edges.update(frozenset(e) for e in self.data_manager.load_object(handle, partitions=[i]).get_object().edges)
+        self.assertEqual(nodes, set(graph.nodes))
+        self.assertEqual(edges, {frozenset(e) for e in graph.edges})
+        self.assertTrue(nx.utils.graphs_equal(self.data_manager.load_object(handle).get_object(), graph))
+
+        # range partitions hold consecutive ids, rewriting removes the files of the earlier layout
+        self.data_manager.persist_object(ObjectWrapper(nx.path_graph(10), handle), partitions=2, partitioning="range")
+        self.assertEqual(sorted(self.data_manager.load_object(handle, partitions=[1]).get_object().nodes), [5, 6, 7, 8, 9])
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, "graph", "edges-00003.arrow")))
+
+        # failed writes leave the stored graph as it was
+        for obj, partitions in (({"a": 1}, 2), (nx.path_graph(3), 0), (lambda: None, None)):
+            with self.assertRaises((ValueError, pickle.PicklingError, AttributeError)):
+                self.data_manager.persist_object(ObjectWrapper(obj, handle), partitions=partitions)
+            self.assertEqual(sorted(self.data_manager.load_object(handle, partitions=[1]).get_object().nodes), [5, 6, 7, 8, 9])
+        self.assertEqual(os.listdir(os.path.join(self.tmp.name, DataManager.STAGING_DIR)), [])
+
+        # only columnar graphs can be loaded by partition
+        for obj in ({"a": 1}, CSRGraph.from_networkx(nx.path_graph(3))):
+            self.data_manager.persist_object(ObjectWrapper(obj, handle))
+            with self.assertRaises(ValueError):
+                self.data_manager.load_object(handle, partitions=[0])
+
+    def test_compression_codecs(self) -> None:
+        graph = nx.read_edgelist("./tests/resources/subgraph.edgelist")
+        policy = CodecPolicy({nx.Graph: "zstd", "dict": "lz4"})
+        data_manager = DataManager(self.tmp.name, pafs.LocalFileSystem(), codec_policy=policy)
+        uncompressed = self.persist(graph, "uncompressed")
+        compressed = ObjectHandle("compressed")
+        data_manager.persist_object(ObjectWrapper(graph, compressed))
+
+        self.assertEqual(data_manager.get_manifest(compressed)["compression"], "zstd")
+        self.assertLess(data_manager.get_object_size(compressed), self.data_manager.get_object_size(uncompressed))
+        self.assertTrue(nx.utils.graphs_equal(data_manager.load_object(compressed).get_object(), graph))
+
+        pickled = ObjectHandle("pickled")
+        data_manager.persist_object(ObjectWrapper({"betweenness": list(range(1000))}, pickled))
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, "pickled", "object.pkl.lz4")))
+        self.assertTrue(data_manager.exists(pickled))
+        self.assertEqual(self.data_manager.load_object(pickled).get_object()["betweenness"][-1], 999)
+
+        # the cost model only compresses if the store is slow compared to the codec
+        self.assertEqual(CodecPolicy(bandwidth=float("inf")).choose(graph), "none")
+        self.assertNotEqual(CodecPolicy(bandwidth=10e6).choose(graph), "none")
+        with self.assertRaises(ValueError):
+            CodecPolicy({nx.Graph: "brotli"})
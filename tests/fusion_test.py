@@ -0,0 +1,59 @@
+from unittest import TestCase
+
+from graphmassivizer.runtime.task_manager.task_execution_unit import BGO
+from graphmassivizer.runtime.workload_manager.fusion import FusedBGO, Fuser
+
+
+class Increment(BGO):
+    implementationId = "Increment"
+
+    def run(args={}):
+        args['value'] = args.get('value', 0) + 1
+        return args['value']
+
+
+class Double(BGO):
+    implementationId = "Double"
+
+    def run(args={}):
+        args['value'] *= 2
+        return args['value']
+
+
+def task(cls, next=None, first=False, platform="python"):
+    node = {"bgo": cls.__name__, "first": first,
+            "implementations": {cls.implementationId: {"class": cls, "platform": platform, "optimized": {"SRV-001": 0.5}}}}
+    if next:
+        node["next"] = {next}
+    return node
+
+
+class FusionTest(TestCase):
+
+    def test_linear_chains_are_fused(self) -> None:
+        # a -> b -> c -> d, d is placed on a different platform
+        DAG = {"args": {}, "nodes": {"a": task(Increment, "b", first=True), "b": task(Double, "c"),
+                                     "c": task(Increment, "d"), "d": task(Double, platform="gpu")},
+               "edges": {"a": {"b"}, "b": {"c"}, "c": {"d"}}}
+        first = DAG["nodes"]["a"]
+
+        # the greenifier's choice does not prevent fusion
+        DAG["nodes"]["b"]["implementations"]["Double"]["greenified"] = 1
+        self.assertEqual(Fuser.fuse(DAG), [["a", "b", "c"]])
+        self.assertEqual(set(DAG["nodes"]), {"a", "d"})
+        self.assertEqual(DAG["edges"], {"a": {"d"}})
+        self.assertIs(DAG["nodes"]["a"], first)
+
+        implementation = next(iter(first["implementations"].values()))
+        self.assertIsInstance(implementation["class"], FusedBGO)
+        self.assertEqual(implementation["optimized"], {"SRV-001": [0.5, 0.5, 0.5]})
+        args = {}
+        self.assertEqual(implementation["class"].run(args), 3)
+        self.assertEqual(args["value"], 3)
+
+    def test_branches_are_not_fused(self) -> None:
+        DAG = {"args": {}, "nodes": {"a": task(Increment, first=True), "b": task(Double), "c": task(Double)},
+               "edges": {}}
+        DAG["nodes"]["a"]["next"] = DAG["edges"]["a"] = {"b", "c"}
+        self.assertEqual(Fuser.fuse(DAG), [])
+        self.assertEqual(set(DAG["nodes"]), {"a", "b", "c"})
@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+from urllib.parse import parse_qs
+
+import requests
+
+from graphmassivizer.core.connectors.graphDatabaseConnector import GraphDatabaseConnector, createSession
+from graphmassivizer.core.connectors.metaphactory import AsyncMetaphactoryConnector, MetaphactoryConnector
+from graphmassivizer.runtime.workload_manager.input.userInputHandler import UserInputHandler
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """Answers with the queued (status, headers) responses, then with 200 and the requested path."""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        # answers are delayed by the seconds given as graph or topic
+        form = parse_qs(body.decode())
+        time.sleep(float(form.get("graph", form.get("topic", ["0"]))[0]))
+        with server.lock:
+            server.active -= 1
+        self.respond()
+
+    def do_GET(self):
+        self.respond()
+
+    def respond(self):
+        server = self.server
+        server.requests.append((self.command, self.path, self.client_address))
+        status, headers = server.responses.pop(0) if server.responses else (200, {})
+        body = (server.body or self.path.encode()) if status == 200 else b""
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GraphDatabaseConnectorTest(TestCase):
+
+    def setUp(self) -> None:
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), QueryHandler)
+        self.server.requests = []
+        self.server.responses = []
+        self.server.lock = threading.Lock()
+        self.server.body = None
+        self.server.active = self.server.max_active = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.connector = GraphDatabaseConnector(f"http://127.0.0.1:{self.server.server_port}/query",
+                                                createSession(backoff=0.01), timeout=(1, 5))
+
+    def tearDown(self) -> None:
+        self.connector.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_long_queries_are_polled(self) -> None:
+        self.server.responses = [(204, {}), (202, {"Location": "/jobs/1"}), (202, {})]
+        self.assertEqual(b"/jobs/1", self.connector.curl(data={"graph": "0"}, checkInterval=0.01))
+        self.assertEqual([("POST", "/query"), ("POST", "/query"), ("GET", "/jobs/1"), ("GET", "/jobs/1")],
+                         [request[:2] for request in self.server.requests])
+        # all on one kept-alive connection
+        self.assertEqual(1, len({request[2] for request in self.server.requests}))
+
+        self.server.responses = [(204, {})] * 100
+        with self.assertRaises(TimeoutError):
+            self.connector.curl(checkInterval=0.01, timeout=0.05)
+
+    def test_unavailable_server_is_retried(self) -> None:
+        self.server.responses = [(503, {}), (503, {})]
+        self.assertEqual(b"/query", self.connector.curl())
+        self.assertEqual(3, len(self.server.requests))
+
+        self.server.responses = [(503, {})] * 4
+        with self.assertRaises(requests.HTTPError):
+            self.connector.curl()
+
+    def test_timed_out_queries_are_not_resent(self) -> None:
+        connector = GraphDatabaseConnector(self.connector.endpoint, createSession(backoff=0.01), timeout=(1, 0.1))
+        with self.assertRaises(requests.ConnectionError):
+            connector.curl(data={"graph": "0.3"})
+        connector.close()
+        # the server answers the query it is still running, it was sent once
+        time.sleep(0.5)
+        self.assertEqual(1, len(self.server.requests))
+
+    def test_async_queries_run_concurrently(self) -> None:
+        address = f"http://127.0.0.1:{self.server.server_port}"
+        connector = AsyncMetaphactoryConnector(concurrency=2, connector=MetaphactoryConnector(address, poolSize=2))
+
+        async def query():
+            workflow, graph = await connector.workflowAndCoauthorQuery("0.1", "0.1", "author")
+            results = [result async for result in connector.coauthorQueries([("0.3", "a"), ("0", "b"), ("0.1", "c")])]
+            return workflow, graph, results
+
+        workflow, graph, results = asyncio.run(query())
+        connector.close()
+        self.assertEqual(workflow, MetaphactoryConnector.workflow.encode())
+        self.assertEqual(graph, MetaphactoryConnector.coauthor.encode())
+        # streamed in the order they complete
+        self.assertEqual([("0", "b"), ("0.1", "c"), ("0.3", "a")], [query for query, _ in results])
+        self.assertEqual(2, self.server.max_active)
+
+    def test_cancelled_queries_hold_their_slot(self) -> None:
+        address = f"http://127.0.0.1:{self.server.server_port}"
+        connector = AsyncMetaphactoryConnector(concurrency=1, connector=MetaphactoryConnector(address, poolSize=2))
+
+        async def query():
+            running = asyncio.ensure_future(connector.coauthorQuery("0.3", "a"))
+            await asyncio.sleep(0.05)
+            running.cancel()
+            # waits for the thread of the cancelled query
+            return await connector.coauthorQuery("0", "b")
+
+        self.assertEqual(MetaphactoryConnector.coauthor.encode(), asyncio.run(query()))
+        connector.close()
+        self.assertEqual(1, self.server.max_active)
+
+    def test_user_input_is_queried_from_a_running_loop(self) -> None:
+        self.server.body = b"author,coauthor\r\na,b\r\n"
+
+        async def create():
+            return UserInputHandler(f"http://127.0.0.1:{self.server.server_port}",
+                                    bgoArgs={"topic": "0", "author": "a"}, workflowIRI="0")
+
+        handler = asyncio.run(create())
+        handler.metaphactory.close()
+        self.assertEqual(["a", "b"], handler.DAG["args"]["graph"].get_labels())
+        self.assertEqual(self.server.body, handler.workflowResults["0"])
+
+    def test_coauthor_graph_is_streamed(self) -> None:
+        connector = MetaphactoryConnector(f"http://127.0.0.1:{self.server.server_port}")
+        self.server.body = b"author,coauthor\r\na,b\r\nb,a\r\nb,c\r\n"
+        graph = connector.coauthorGraph("0", "author")
+        connector.close()
+        self.assertEqual(["a", "b", "c"], graph.get_labels())
+        self.assertEqual(2, graph.number_of_edges())
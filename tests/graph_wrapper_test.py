@@ -0,0 +1,75 @@
+import random
+from unittest import TestCase
+
+import networkx as nx
+
+from graphmassivizer.core.dataflow.graph_fingerprint import GraphFingerprint
+from graphmassivizer.core.dataflow.graph_wrapper import GraphDelta, GraphWrapper
+
+
+class GraphWrapperTest(TestCase):
+
+    def setUp(self) -> None:
+        self.graph = nx.read_edgelist("./tests/resources/subgraph.edgelist")
+
+    def test_fingerprint_is_order_independent(self) -> None:
+        edges = list(self.graph.edges)
+        random.Random(7).shuffle(edges)
+        shuffled = nx.Graph()
+        shuffled.add_nodes_from(reversed(list(self.graph.nodes)))
+        shuffled.add_edges_from((v, u) for u, v in edges)
+
+        self.assertEqual(GraphWrapper(self.graph), GraphWrapper(shuffled))
+        self.assertEqual(GraphFingerprint.of_graph(self.graph, chunk_size=1000).hexdigest(),
+                         GraphWrapper(self.graph).get_metadata().graph_id)
+        self.assertNotEqual(GraphWrapper(self.graph), GraphWrapper(nx.DiGraph(self.graph)))
+
+    def test_attributes_are_part_of_the_fingerprint(self) -> None:
+        weighted = self.graph.copy()
+        u, v = next(iter(weighted.edges))
+        weighted.edges[u, v]["weight"] = 2.0
+        self.assertNotEqual(GraphWrapper(self.graph), GraphWrapper(weighted))
+
+    def test_fingerprint_is_canonical(self) -> None:
+        class Point:
+            def __init__(self, x, y):
+                self.x, self.y = x, y
+
+        first, second = nx.Graph(), nx.Graph()
+        first.add_edge(1, 2, nested={"a": 1, "b": {2, 3}}, point=Point(1, 2))
+        second.add_edge(1, 2, point=Point(1, 2), nested={"b": {3, 2}, "a": 1})
+        self.assertEqual(GraphWrapper(first), GraphWrapper(second))
+
+        # values of different types do not collide, even if they compare equal
+        self.assertNotEqual(GraphFingerprint.hash_value("1"), GraphFingerprint.hash_value(1))
+        self.assertNotEqual(GraphFingerprint.hash_value(1), GraphFingerprint.hash_value(True))
+
+    def test_incremental_updates(self) -> None:
+        wrapper = GraphWrapper(self.graph.copy())
+        removed = list(self.graph.edges)[:100]
+        wrapper.remove_edges_from(removed)
+        wrapper.add_edges_from([("new-a", "new-b", {"weight": 1.0}), (removed[0][0], removed[0][1])])
+        self.assertEqual(wrapper.get_metadata().graph_id, GraphWrapper(wrapper.graph.copy()).get_metadata().graph_id)
+
+        wrapper.remove_edges_from(removed[:1] + [("new-a", "new-b")])
+        wrapper.add_edges_from(removed)
+        expected = self.graph.copy()
+        expected.add_nodes_from(["new-a", "new-b"])
+        self.assertEqual(wrapper, GraphWrapper(expected))
+
+    def test_derived_versions_record_their_delta(self) -> None:
+        parent = GraphWrapper(self.graph.copy())
+        child = parent.derive()
+        removed = list(self.graph.edges)[:10]
+        child.add_edges_from([("new-a", "new-b", {"weight": 1.0}), removed[0]])
+        child.remove_edges_from(removed[:5] + [("new-a", "new-b")])
+        child.add_edges_from([removed[1]])
+
+        self.assertEqual(child.get_metadata().version, 1)
+        self.assertEqual(child.get_metadata().parent_id, parent.get_metadata().graph_id)
+        self.assertEqual(child, GraphWrapper(child.graph.copy()))
+        # removing the new edge is recorded too, it is a no-op on the parent
+        self.assertEqual(len(child.delta), 6)
+        self.assertEqual(GraphWrapper(child.delta.apply(self.graph.copy())), child)
+        self.assertEqual(len(GraphDelta.between(parent.graph, child.graph)), 4)
+        self.assertEqual(parent.graph.number_of_edges(), self.graph.number_of_edges())
@@ -0,0 +1,130 @@
+import os
+from types import SimpleNamespace
+from unittest import TestCase
+
+from kazoo.client import KazooState
+from kazoo.exceptions import NodeExistsError, NoNodeError
+
+from graphmassivizer.core.descriptors.descriptors import Machine, MachineDescriptor
+from graphmassivizer.core.zookeeper.zookeeper_state_manager import ZookeeperStateManager
+from graphmassivizer.runtime.task_manager.heartbeat import Heartbeat, decode_metrics
+from graphmassivizer.runtime.workload_manager.infrastructure_manager import InfrastructureManager, LocationPreference
+from tests.zookeeper_state_manager_test import InMemoryZooKeeper
+
+
+class SessionZooKeeper(InMemoryZooKeeper):
+    """In-memory ZooKeeper with ephemeral nodes, children watches and session expiry."""
+
+    def __init__(self):
+        super().__init__()
+        self.ephemeral = set()
+        self.children_watches = {}
+
+    def create(self, path, value=b"", makepath=False, ephemeral=False):
+        if path in self.nodes:
+            raise NodeExistsError()
+        if makepath:
+            self.ensure_path(os.path.dirname(path))
+        elif os.path.dirname(path) not in self.nodes:
+            raise NoNodeError()
+        self.round_trips += 1
+        self.nodes[path] = [value, 0]
+        if ephemeral:
+            self.ephemeral.add(path)
+        self.fire_children(os.path.dirname(path))
+        return path
+
+    def set(self, path, value):
+        if path not in self.nodes:
+            raise NoNodeError()
+        self.round_trips += 1
+        self.nodes[path] = [value, self.nodes[path][1] + 1]
+
+    def delete(self, path, recursive=False):
+        super().delete(path, recursive)
+        self.ephemeral.discard(path)
+        self.fire_children(os.path.dirname(path))
+
+    def ChildrenWatch(self, path, func):
+        self.children_watches.setdefault(path, []).append(func)
+        func(self.get_children(path))
+
+    def fire_children(self, path):
+        for func in self.children_watches.get(path, []):
+            func(self.get_children(path))
+
+    def expire_session(self):
+        for path in sorted(self.ephemeral):
+            self.delete(path)
+        for listener in self.listeners:
+            listener(KazooState.LOST)
+
+
+class InfrastructureManagerTest(TestCase):
+
+    def setUp(self) -> None:
+        self.client = SessionZooKeeper()
+        self.zk = ZookeeperStateManager(None, client=self.client)
+        machine = SimpleNamespace(ID=0, to_utf8=lambda: b"{}")
+        self.manager = InfrastructureManager(SimpleNamespace(zookeeper_host=None, machine=machine, zk=self.zk))
+
+    def start_task_manager(self, id, free_slots, free_memory, load=0.0) -> Heartbeat:
+        machine = Machine(int(id), MachineDescriptor(f"10.0.0.{id}", f"tm-{id}", "x86", 4, 8, 10))
+        self.zk.create_ephemeral(f"/taskmanagers/{id}", machine.to_utf8())
+        heartbeat = Heartbeat(self.zk, id, lambda: free_slots)
+        heartbeat.metrics = lambda: {"free_slots": free_slots, "load": load, "free_memory": free_memory, "sequence": 0}
+        return heartbeat.start()
+
+    def tearDown(self) -> None:
+        for heartbeat in getattr(self, "heartbeats", []):
+            heartbeat.stop()
+
+    def test_task_managers_are_ranked_by_headroom(self) -> None:
+        self.heartbeats = [self.start_task_manager("1", 2, 100), self.start_task_manager("2", 4, 50),
+                           self.start_task_manager("3", 4, 80)]
+        self.assertEqual(["3", "2", "1"], self.manager.rank_task_managers())
+
+        # every placement takes a slot until the next heartbeat
+        self.assertEqual(["10.0.0.3", "10.0.0.2", "10.0.0.3"], [self.manager.get_machine().address for _ in range(3)])
+        self.assertEqual("10.0.0.1", self.manager.get_machine("1").address)
+
+    def test_location_preferences(self) -> None:
+        self.heartbeats = [self.start_task_manager("1", 1, 100), self.start_task_manager("2", 4, 50)]
+        machine = self.manager.tm_machine_map["1"]
+        required = LocationPreference(machine, LocationPreference.PreferenceLevel.REQUIRED)
+        preferred = LocationPreference([machine])
+
+        self.assertIsInstance(machine, MachineDescriptor)
+        self.assertEqual("10.0.0.1", self.manager.get_machine(preferred).address)
+        # without free slots a preferred machine is passed over, a required one is not
+        self.assertEqual("10.0.0.2", self.manager.get_machine(preferred).address)
+        self.assertEqual("10.0.0.1", self.manager.get_machine(required).address)
+
+        elsewhere = MachineDescriptor("10.0.0.9", "tm-9", "x86", 4, 8, 10)
+        self.assertEqual("10.0.0.2", self.manager.get_machine(LocationPreference(elsewhere)).address)
+        with self.assertRaises(Exception):
+            self.manager.get_machine(LocationPreference(elsewhere, LocationPreference.PreferenceLevel.REQUIRED))
+
+    def test_dead_and_silent_task_managers_are_not_scheduled(self) -> None:
+        self.heartbeats = [self.start_task_manager("1", 2, 100), self.start_task_manager("2", 4, 50)]
+        self.client.delete("/taskmanagers/2")
+        self.client.delete("/heartbeats/2")
+        self.assertEqual(["1"], self.manager.rank_task_managers())
+        self.assertEqual(["1"], list(self.manager.tm_machine_map))
+
+        self.manager.task_manager_health["1"]["updated"] -= self.manager.heartbeat_timeout + 1
+        self.assertEqual([], self.manager.rank_task_managers())
+        self.assertRaises(Exception, self.manager.get_machine)
+
+    def test_heartbeat_recreates_its_node_after_session_loss(self) -> None:
+        registrations = []
+        heartbeat = Heartbeat(self.zk, "1", lambda: 3, interval=60, on_session_lost=lambda: registrations.append(1))
+        self.heartbeats = [heartbeat.start()]
+        heartbeat.beat()
+        self.assertEqual(1, self.client.nodes["/heartbeats/1"][1])
+
+        self.client.expire_session()
+        heartbeat.beat()
+        self.assertEqual([1], registrations)
+        self.assertEqual(3, decode_metrics(self.client.nodes["/heartbeats/1"][0])["free_slots"])
+        self.assertIn("/heartbeats/1", self.client.ephemeral)
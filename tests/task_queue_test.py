@@ -0,0 +1,133 @@
+import pickle
+import tempfile
+import threading
+from unittest import TestCase
+
+import networkx as nx
+import pyarrow.fs as pafs
+from kazoo.exceptions import NoNodeError
+
+from graphmassivizer.core.dataflow.bfs import DepthLimitedBFS
+from graphmassivizer.core.dataflow.data_manager import DataManager
+from graphmassivizer.core.dataflow.object_handle import ObjectHandle
+from graphmassivizer.core.dataflow.object_wrapper import ObjectWrapper
+from graphmassivizer.core.zookeeper.task_queue import TaskQueue
+from graphmassivizer.runtime.task_manager.task_execution_unit import TaskExecutionUnit
+from tests.infrastructure_manager_test import SessionZooKeeper
+from tests.zookeeper_state_manager_test import Result, Transaction
+
+
+class SequentialTransaction(Transaction):
+    def create(self, path, value=b"", sequence=False):
+        super().create(self.zk.sequential(path) if sequence else path, value)
+
+
+class QueueZooKeeper(SessionZooKeeper):
+    """In-memory ZooKeeper with sequential nodes, one-shot children watches and the async calls of the task queue."""
+
+    def __init__(self):
+        super().__init__()
+        self.sequence = 0
+        self.one_shot_watches = {}
+
+    def sequential(self, path):
+        self.sequence += 1
+        return f"{path}{self.sequence:010d}"
+
+    def create(self, path, value=b"", makepath=False, ephemeral=False, sequence=False):
+        return super().create(self.sequential(path) if sequence else path, value, makepath, ephemeral)
+
+    def create_async(self, path, value=b"", ephemeral=False):
+        try:
+            return Result(self.create(path, value, ephemeral=ephemeral))
+        except Exception as e:
+            return Result(None, e)
+
+    def delete_async(self, path):
+        if path not in self.nodes:
+            return Result(None, NoNodeError())
+        return Result(self.delete(path))
+
+    def get_children_async(self, path, watch=None):
+        if watch is not None:
+            self.one_shot_watches.setdefault(path, []).append(watch)
+        return super().get_children_async(path)
+
+    def fire_children(self, path):
+        super().fire_children(path)
+        for watch in self.one_shot_watches.pop(path, []):
+            watch(None)
+
+    def transaction(self):
+        return SequentialTransaction(self)
+
+
+class TaskQueueTest(TestCase):
+
+    def setUp(self) -> None:
+        self.client = QueueZooKeeper()
+        self.queue = TaskQueue(self.client)
+
+    def test_tasks_are_claimed_in_batches_by_priority(self) -> None:
+        self.queue.put_all([b"a", b"b", b"c"], priority=100)
+        self.queue.put(b"urgent", priority=1)
+        self.assertEqual(4, len(self.queue))
+
+        round_trips = self.client.round_trips
+        tasks = self.queue.claim(3)
+        self.assertEqual([b"urgent", b"a", b"b"], [value for _, value in tasks])
+        # the requests of three pipelined round-trips: listing, locking and reading
+        self.assertEqual(2 + 3 + 3, self.client.round_trips - round_trips)
+
+        # claimed entries are not handed out twice
+        other = TaskQueue(self.client)
+        self.assertEqual([b"c"], [value for _, value in other.claim(3)])
+        self.assertEqual([], other.claim(1, timeout=0))
+
+        self.assertTrue(self.queue.consume([entry for entry, _ in tasks]))
+        self.assertEqual(1, len(self.queue))
+
+    def test_unacknowledged_tasks_are_requeued(self) -> None:
+        self.queue.put_all([b"a", b"b"])
+        (entry, _), = self.queue.claim(1)
+        self.queue.release([entry])
+        self.assertEqual([b"a", b"b"], [value for _, value in self.queue.claim(2)])
+
+        # the locks of a Task Manager whose session ended disappear with it
+        self.client.expire_session()
+        other = TaskQueue(self.client)
+        tasks = other.claim(2)
+        self.assertEqual([b"a", b"b"], [value for _, value in tasks])
+        self.assertFalse(self.queue.consume([entry for entry, _ in tasks]))
+        self.assertEqual(2, len(self.queue))
+
+    def test_claim_waits_for_tasks(self) -> None:
+        claimed = []
+        thread = threading.Thread(target=lambda: claimed.extend(self.queue.claim(1, timeout=5)))
+        thread.start()
+        while not self.client.one_shot_watches:
+            thread.join(0.01)
+        self.queue.put(b"a")
+        thread.join()
+        self.assertEqual([b"a"], [value for _, value in claimed])
+
+    def test_claimed_tasks_are_executed(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            data_manager = DataManager(tmp, pafs.LocalFileSystem())
+            input_handle = ObjectHandle("graph")
+            data_manager.persist_object(ObjectWrapper(nx.path_graph(5), input_handle))
+            bgo = DepthLimitedBFS(0, depth_limit=2)
+            self.queue.put(TaskExecutionUnit.encode(bgo, input_handle))
+
+            (entry, task), = self.queue.claim(1)
+            output_handle = TaskExecutionUnit(data_manager).execute(task)
+            self.assertTrue(self.queue.consume([entry]))
+            self.assertEqual(input_handle.get_outcome_paths(bgo).get_object_path(), output_handle.get_object_path())
+            self.assertEqual({0: 0, 1: 1, 2: 2},
+                             dict(data_manager.load_object(output_handle).get_object().nodes(data="depth")))
+
+            # only registered BGOs are run
+            with self.assertRaises(ValueError):
+                TaskExecutionUnit(data_manager, bgos=()).execute(task)
+            with self.assertRaises(ValueError):
+                TaskExecutionUnit(data_manager).execute(pickle.dumps((bgo, "graph")))
@@ -0,0 +1,272 @@
+import json
+import os
+import tempfile
+import threading
+from unittest import TestCase
+
+import networkx as nx
+import pyarrow.fs as pafs
+
+from graphmassivizer.core.dataflow.BGO import BGO
+from graphmassivizer.core.dataflow.bfs import DepthLimitedBFS
+from graphmassivizer.core.dataflow.dag_executor import DAGExecutor
+from graphmassivizer.core.dataflow.data_manager import DataManager
+from graphmassivizer.core.dataflow.graph_wrapper import GraphWrapper
+from graphmassivizer.core.dataflow.object_handle import ObjectHandle
+from graphmassivizer.core.dataflow.object_wrapper import ObjectWrapper
+from graphmassivizer.core.dataflow.result_cache import ResultCache
+from graphmassivizer.core.dataflow.workflow import Workflow, WorkflowStep
+from graphmassivizer.runtime.workload_manager.optimization_1 import Optimizer_1
+
+
+class CountingBFS(BGO):
+    implementationId = "CountingBFS"
+
+    def __init__(self, depth_limit=1):
+        self.depth_limit = depth_limit
+        self.calls = 0
+
+    def get_args(self) -> dict:
+        return {"depth_limit": self.depth_limit}
+
+    def process_graph(self, graph) -> nx.Graph:
+        self.calls += 1
+        return nx.Graph(nx.bfs_tree(graph, source=0, depth_limit=self.depth_limit))
+
+
+class CountingDepthLimitedBFS(DepthLimitedBFS):
+
+    def __init__(self, source, depth_limit=None):
+        super().__init__(source, depth_limit)
+        self.calls = {"full": 0, "delta": 0}
+
+    def process_graph(self, graph) -> nx.Graph:
+        self.calls["full"] += 1
+        return super().process_graph(graph)
+
+    def process_delta(self, graph, previous_result, delta):
+        self.calls["delta"] += 1
+        return super().process_delta(graph, previous_result, delta)
+
+
+class ExtractSubgraph(BGO):
+    barrier = None
+
+    def process_graph(self, graph) -> nx.Graph:
+        # both branches have to be running at the same time to pass the barrier
+        self.barrier.wait()
+        return graph.subgraph(range(5)).copy()
+
+
+class ExtractFeatures(ExtractSubgraph):
+    pass
+
+
+class HeadNodes(BGO):
+    def process_graph(self, graph) -> nx.Graph:
+        return graph.subgraph(range(3)).copy()
+
+
+class TailNodes(BGO):
+    def process_graph(self, graph) -> nx.Graph:
+        return graph.subgraph(range(7, 10)).copy()
+
+
+class Compose(BGO):
+    supports_multiple_inputs = True
+
+    def process_graphs(self, graphs: list) -> nx.Graph:
+        return nx.compose_all(graphs)
+
+
+class WorkflowTest(TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_manager = DataManager(self.tmp.name, pafs.LocalFileSystem())
+        self.input = ObjectHandle("input")
+        self.data_manager.persist_object(ObjectWrapper(nx.path_graph(10), self.input))
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_result_cache_skips_computed_steps(self) -> None:
+        cache = ResultCache(self.data_manager)
+        bfs = CountingBFS()
+        workflow = Workflow([WorkflowStep(self.data_manager, bfs, cache)])
+
+        first = workflow.run(self.input)
+        second = workflow.run(self.input)
+        self.assertEqual(first.get_object_path(), second.get_object_path())
+        self.assertEqual(bfs.calls, 1)
+
+        # a reloaded cache sees the same entries, different arguments miss
+        self.assertIsNotNone(ResultCache(self.data_manager).lookup(bfs, self.input))
+        self.assertIsNone(cache.lookup(CountingBFS(depth_limit=2), self.input))
+
+    def test_result_caches_share_the_index(self) -> None:
+        first, second = ResultCache(self.data_manager), ResultCache(self.data_manager)
+        bfs, other_input = CountingBFS(), ObjectHandle("other")
+        self.data_manager.persist_object(ObjectWrapper(nx.path_graph(5), other_input))
+        first.store(bfs, self.input, bfs.execute(self.data_manager, self.input))
+        second.store(bfs, other_input, bfs.execute(self.data_manager, other_input))
+
+        # neither process lost the entry of the other
+        self.assertIsNotNone(first.lookup(bfs, other_input))
+        self.assertIsNotNone(ResultCache(self.data_manager).lookup(bfs, self.input))
+
+        # hits do not rewrite the index
+        index = os.path.join(self.tmp.name, "_cache", ResultCache.INDEX)
+        modified = os.stat(index).st_mtime_ns
+        second.lookup(bfs, self.input)
+        self.assertEqual(modified, os.stat(index).st_mtime_ns)
+        self.assertEqual([ResultCache.INDEX], os.listdir(os.path.dirname(index)))
+
+    def test_result_cache_eviction(self) -> None:
+        cache = ResultCache(self.data_manager, max_entries=1)
+        small = CountingBFS(depth_limit=1)
+        cache.store(small, self.input, small.execute(self.data_manager, self.input))
+        self.assertIsNotNone(cache.lookup(small, self.input))
+
+        other_input = ObjectHandle("other")
+        self.data_manager.persist_object(ObjectWrapper(nx.path_graph(5), other_input))
+        cache.store(small, other_input, small.execute(self.data_manager, other_input))
+
+        self.assertIsNone(cache.lookup(small, self.input))
+        self.assertFalse(self.data_manager.exists(self.input.get_outcome_paths(small)))
+        self.assertIsNotNone(cache.lookup(small, other_input))
+
+        expiring = ResultCache(self.data_manager, max_age=0)
+        expiring.store(small, other_input, other_input.get_outcome_paths(small))
+        self.assertIsNone(expiring.lookup(small, other_input))
+
+    def test_new_versions_are_processed_incrementally(self) -> None:
+        cache = ResultCache(self.data_manager)
+        bfs = CountingDepthLimitedBFS(source=0, depth_limit=4)
+        workflow = Workflow([WorkflowStep(self.data_manager, bfs, cache)])
+        depths = lambda handle: dict(self.data_manager.load_object(handle).get_object().nodes(data="depth"))
+
+        original = GraphWrapper(nx.path_graph(10))
+        workflow.run(self.input)
+        self.assertEqual(bfs.calls, {"full": 1, "delta": 0})
+
+        # a shortcut and a new branch only shorten distances
+        version = original.derive()
+        version.add_edges_from([(0, 6), (9, 10)])
+        version.remove_edges_from([(8, 9)])
+        self.data_manager.persist_object(ObjectWrapper(version, self.input))
+        self.assertEqual(self.data_manager.get_metadata(self.input).parent_id, original.get_metadata().graph_id)
+        output = workflow.run(self.input)
+        self.assertEqual(bfs.calls, {"full": 1, "delta": 1})
+        self.assertEqual(depths(output), dict(DepthLimitedBFS(0, 4).process_graph(version.graph).nodes(data="depth")))
+        self.assertEqual(self.data_manager.load_delta(output).get_added_edges(), [])
+
+        # the shortcut is on the shortest paths to 5..9, removing it needs a full traversal
+        next_version = version.derive()
+        next_version.remove_edges_from([(0, 6)])
+        self.data_manager.persist_object(ObjectWrapper(next_version, self.input))
+        output = workflow.run(self.input)
+        self.assertEqual(bfs.calls, {"full": 2, "delta": 2})
+        self.assertEqual(depths(output), {node: node for node in range(5)})
+
+        # unchanged content is answered by the cache
+        self.data_manager.persist_object(ObjectWrapper(next_version.graph, self.input))
+        workflow.run(self.input)
+        self.assertEqual(bfs.calls, {"full": 2, "delta": 2})
+
+    def test_independent_branches_run_concurrently(self) -> None:
+        ExtractSubgraph.barrier = threading.Barrier(2, timeout=10)
+        root = WorkflowStep(self.data_manager, CountingBFS(depth_limit=5))
+        subgraph = WorkflowStep(self.data_manager, ExtractSubgraph())
+        features = WorkflowStep(self.data_manager, ExtractFeatures())
+        workflow = Workflow([root, subgraph, features], {subgraph: [root], features: [root]},
+                            DAGExecutor(max_workers=2))
+
+        report = workflow.execute(self.input)
+        self.assertEqual(report.steps[0], root)
+        for step in (subgraph, features):
+            self.assertGreaterEqual(report.timings[step].start, report.timings[root].start)
+            self.assertEqual(self.data_manager.load_object(report.outputs[step]).get_object().number_of_nodes(), 5)
+        self.assertEqual(report.critical_path[0], root)
+        self.assertEqual(len(report.critical_path), 2)
+        self.assertIn("ExtractSubgraph", report.summary())
+
+    def test_fan_in_combines_branches(self) -> None:
+        head = WorkflowStep(self.data_manager, HeadNodes())
+        tail = WorkflowStep(self.data_manager, TailNodes())
+        compose = WorkflowStep(self.data_manager, Compose())
+        workflow = Workflow([compose, head, tail], {compose: [head, tail]})
+
+        # the sink is returned, not the last step in the list
+        output = workflow.run(self.input)
+        self.assertEqual(sorted(self.data_manager.load_object(output).get_object().nodes), [0, 1, 2, 7, 8, 9])
+        self.assertEqual(len(Workflow([head, tail], {}).run(self.input)), 2)
+
+        plan = workflow.plan(self.input)
+        self.assertEqual(plan.steps[-1].output_handle.get_object_path(), output.get_object_path())
+        self.assertEqual(plan.steps[-1].input_bytes,
+                         sum(self.data_manager.get_object_size(step.output_handle) for step in plan.steps[:2]))
+
+        with self.assertRaises(ValueError):
+            Workflow([head, tail, compose], {head: [compose, tail]})
+
+    def test_outputs_are_prefetched_for_successors(self) -> None:
+        data_manager = DataManager(self.tmp.name, pafs.LocalFileSystem(), prefetch_bytes=1 << 20)
+        cache = ResultCache(data_manager)
+        root = WorkflowStep(data_manager, CountingBFS(depth_limit=5))
+        head = WorkflowStep(data_manager, HeadNodes(), cache)
+        tail = WorkflowStep(data_manager, TailNodes(), cache)
+        workflow = Workflow([root, head, tail], {head: [root], tail: [root]})
+
+        workflow.run(self.input)
+        self.assertEqual(data_manager.prefetcher.get_stats()["taken"], 1)
+        # the results of the second run are cached, the prefetched input is not used
+        workflow.run(self.input)
+        self.assertEqual(data_manager.prefetcher.get_stats()["taken"], 1)
+        self.assertEqual(data_manager.prefetcher.used_bytes, 0)
+        self.assertEqual(data_manager.prefetcher.pending, {})
+
+    def test_cyclic_dependencies_are_rejected(self) -> None:
+        first = WorkflowStep(self.data_manager, CountingBFS())
+        second = WorkflowStep(self.data_manager, ExtractSubgraph())
+        with self.assertRaises(ValueError):
+            Workflow([first, second], {first: [second], second: [first]}).run(self.input)
+
+    def test_dry_run_plan(self) -> None:
+        cache = ResultCache(self.data_manager)
+        bfs = WorkflowStep(self.data_manager, CountingBFS(), cache)
+        subgraph = WorkflowStep(self.data_manager, ExtractSubgraph())
+        workflow = Workflow([bfs, subgraph])
+        estimator = lambda implementation_id, input_bytes: (2.0, None if input_bytes is None else 10 * input_bytes)
+
+        output = workflow.run(self.input, dry_run=True)
+        self.assertEqual(bfs.operation.calls, 0)
+        self.assertEqual(output.get_object_path(),
+                         self.input.get_outcome_paths(bfs.operation).get_outcome_paths(subgraph.operation).get_object_path())
+
+        plan = workflow.plan(self.input)
+        self.assertEqual([step.output_handle.get_object_path() for step in plan.steps],
+                         [self.input.get_outcome_paths(bfs.operation).get_object_path(), output.get_object_path()])
+
+        plan = workflow.plan(self.input, estimator)
+        input_bytes = self.data_manager.get_object_size(self.input)
+        self.assertEqual([step.input_bytes for step in plan.steps], [input_bytes, input_bytes])
+        self.assertEqual(plan.get_critical_path_runtime(), 4.0)
+        self.assertEqual(plan.get_peak_memory(), 10 * input_bytes)
+        self.assertTrue(plan.exceeds(max_runtime=3.0))
+        self.assertFalse(plan.steps[0].cached)
+
+        # once computed, the first step is answered by the result cache
+        cache.store(bfs.operation, self.input, bfs.operation.execute(self.data_manager, self.input))
+        index = os.path.join(self.tmp.name, "_cache", ResultCache.INDEX)
+        modified, entries = os.stat(index).st_mtime_ns, json.dumps(cache.entries)
+        plan = workflow.plan(self.input, estimator)
+        self.assertTrue(plan.steps[0].cached)
+        # planning does not count as an access
+        self.assertEqual((modified, entries), (os.stat(index).st_mtime_ns, json.dumps(cache.entries)))
+        self.assertEqual(plan.get_total_runtime(), 2.0)
+        self.assertIn("CountingBFS", plan.summary())
+
+        runtime, memory = Optimizer_1.estimate("BreadthFirstSearch-3926ab10-2af0-4991-b400-0d9b760d004f", 1000)
+        self.assertGreater(runtime, 0)
+        self.assertEqual(memory, 1000 * Optimizer_1.NETWORKX_BYTES_PER_STORED_BYTE)
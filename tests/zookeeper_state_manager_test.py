@@ -0,0 +1,470 @@
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from unittest import TestCase
+
+from dataclasses import FrozenInstanceError
+
+from kazoo.client import KazooState
+from kazoo.exceptions import BadVersionError, NodeExistsError, NoNodeError, NotEmptyError, RolledBackError
+from kazoo.recipe.cache import NodeData, TreeEvent
+import pyarrow.fs as pafs
+
+from graphmassivizer.core.dataflow.data_manager import DataManager
+from graphmassivizer.core.descriptors import descriptor_codec
+from graphmassivizer.core.descriptors.descriptor_listener import DescriptorCallback, DescriptorListener
+from graphmassivizer.core.descriptors import descriptor_benchmark
+from graphmassivizer.core.descriptors.descriptors import BGODescriptor, FrozenBGODescriptor
+from graphmassivizer.core.zookeeper.tree_mirror import TreeMirror
+from graphmassivizer.core.zookeeper.watch_dispatcher import WatchDispatcher
+from graphmassivizer.core.zookeeper.zookeeper_state_manager import ZookeeperStateManager
+
+Stat = namedtuple("Stat", ["version"])
+
+
+class Result:
+    def __init__(self, value, error=None):
+        self.value = value
+        self.error = error
+
+    def get(self):
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class InMemoryZooKeeper:
+    """The part of the KazooClient API the state manager uses, counting round-trips to the server."""
+
+    def __init__(self):
+        self.nodes = {"/": [b"", 0]}
+        self.round_trips = 0
+        self.data_watches = {}
+        self.listeners = []
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def ensure_path(self, path):
+        self.round_trips += 1
+        while path != "/" and path not in self.nodes:
+            self.nodes[path] = [b"", 0]
+            path = os.path.dirname(path)
+
+    def exists(self, path):
+        return self.exists_async(path).get()
+
+    def exists_async(self, path):
+        self.round_trips += 1
+        return Result(Stat(self.nodes[path][1]) if path in self.nodes else None)
+
+    def get(self, path):
+        self.round_trips += 1
+        return self.nodes[path][0], Stat(self.nodes[path][1])
+
+    def get_children(self, path):
+        self.round_trips += 1
+        return [os.path.basename(node) for node in self.nodes if node != path and os.path.dirname(node) == path]
+
+    def get_async(self, path):
+        if path not in self.nodes:
+            return Result(None, NoNodeError())
+        return Result(self.get(path))
+
+    def get_children_async(self, path):
+        if path not in self.nodes:
+            return Result(None, NoNodeError())
+        return Result(self.get_children(path))
+
+    def delete(self, path, recursive=False):
+        self.round_trips += 1
+        for node in [node for node in self.nodes if node == path or node.startswith(path + "/")]:
+            del self.nodes[node]
+
+    def transaction(self):
+        return Transaction(self)
+
+    def DataWatch(self, path, func):
+        self.data_watches.setdefault(path, []).append(func)
+        self.fire(path)
+
+    def fire(self, path):
+        node = self.nodes.get(path)
+        for func in list(self.data_watches.get(path, [])):
+            if func(*(node[0], Stat(node[1])) if node else (None, None)) is False:
+                self.data_watches[path].remove(func)
+
+
+class Transaction:
+    def __init__(self, zk):
+        self.zk = zk
+        self.operations = []
+
+    def create(self, path, value=b""):
+        self.operations.append(("create", path, value, None))
+
+    def set_data(self, path, value, version=-1):
+        self.operations.append(("set", path, value, version))
+
+    def delete(self, path, version=-1):
+        self.operations.append(("delete", path, None, version))
+
+    def commit(self):
+        self.zk.round_trips += 1
+        nodes = {path: list(node) for path, node in self.zk.nodes.items()}
+        results = []
+        for operation, path, value, version in self.operations:
+            if operation == "create":
+                if path in nodes:
+                    return self.__failed(results, NodeExistsError())
+                if os.path.dirname(path) not in nodes:
+                    return self.__failed(results, NoNodeError())
+                nodes[path] = [value, 0]
+                results.append(path)
+            elif operation == "delete":
+                if path not in nodes:
+                    return self.__failed(results, NoNodeError())
+                if any(os.path.dirname(node) == path for node in nodes if node != "/"):
+                    return self.__failed(results, NotEmptyError())
+                del nodes[path]
+                results.append(True)
+            else:
+                if path not in nodes:
+                    return self.__failed(results, NoNodeError())
+                if version != -1 and nodes[path][1] != version:
+                    return self.__failed(results, BadVersionError())
+                nodes[path] = [value, nodes[path][1] + 1]
+                results.append(Stat(nodes[path][1]))
+        self.zk.nodes = nodes
+        for _, path, _, _ in self.operations:
+            self.zk.fire(path)
+        return results
+
+    def __failed(self, results, error):
+        return [RolledBackError()] * len(results) + [error] + [RolledBackError()] * (len(self.operations) - len(results) - 1)
+
+
+class SnapshotTreeCache:
+    """A TreeCache over a copy of the in-memory tree taken at start(), updated by hand."""
+
+    def __init__(self, zk):
+        self.zk = zk
+        self.listeners = []
+
+    def listen(self, listener):
+        self.listeners.append(listener)
+
+    def emit(self, event_type):
+        for listener in self.listeners:
+            listener(TreeEvent.make(event_type, None))
+
+    def start(self):
+        self.nodes = {path: list(node) for path, node in self.zk.nodes.items()}
+        self.emit(TreeEvent.INITIALIZED)
+
+    def get_data(self, path):
+        return NodeData.make(path, *self.nodes[path]) if path in self.nodes else None
+
+    def get_children(self, path):
+        if path not in self.nodes:
+            return None
+        return frozenset(os.path.basename(node) for node in self.nodes if node != path and os.path.dirname(node) == path)
+
+
+class RecordingCallback(DescriptorCallback):
+
+    def __init__(self, key):
+        super().__init__()
+        self.key = key
+        self.values = []
+        self.called = threading.Event()
+
+    def get_property_key(self, descriptor):
+        return self.key
+
+    def callback(self, data, stat):
+        self.values.append(data)
+        self.called.set()
+
+
+class StatusDescriptor:
+    """A descriptor whose id does not change with its content."""
+
+    def __init__(self, status):
+        self.status = status
+
+    def get_id(self):
+        return "status"
+
+    def get_descriptor_category(self):
+        return "job"
+
+    def to_dict(self):
+        return {"status": self.status}
+
+
+class ZookeeperStateManagerTest(TestCase):
+
+    def setUp(self) -> None:
+        self.zk = InMemoryZooKeeper()
+        self.manager = ZookeeperStateManager(None, client=self.zk)
+
+    def tearDown(self) -> None:
+        if self.manager.dispatcher is not None:
+            self.manager.dispatcher.close()
+
+    def test_descriptors_are_written_in_one_transaction(self) -> None:
+        descriptors = [BGODescriptor.create(self.manager, id, f"in/{id}", f"out/{id}") for id in range(3)]
+        directory = f"/job/BGODescriptor/{descriptors[0].get_id()}"
+        self.assertEqual(self.zk.nodes[f"{directory}/input_path"][0], b"in/0")
+        self.assertEqual(self.zk.nodes[f"{directory}/ID"][0], b"0")
+
+        self.zk.round_trips = 0
+        self.manager.register_descriptors(descriptors)
+        self.assertEqual(self.zk.round_trips, 0)  # nothing changed
+
+        descriptors[0].output_path = "moved"
+        descriptors[1].output_path = "moved"
+        self.manager.register_descriptors(descriptors)
+        # the id depends on the content, so both are new descriptor directories, written together
+        self.assertEqual(self.zk.round_trips, 1)
+
+    def test_nodes_written_elsewhere_are_updated(self) -> None:
+        descriptor = BGODescriptor.create(self.manager, 1, "in", "out")
+        directory = f"/job/BGODescriptor/{descriptor.get_id()}"
+        other = ZookeeperStateManager(None, client=self.zk)
+        self.zk.nodes[f"{directory}/input_path"] = [b"stale", 4]
+
+        other.register_descriptor(descriptor)
+        self.assertEqual(self.zk.nodes[f"{directory}/input_path"], [b"in", 5])
+
+    def test_concurrent_changes_are_not_overwritten(self) -> None:
+        descriptor = StatusDescriptor("idle")
+        self.manager.register_descriptor(descriptor)
+        path = f"{self.manager.get_descriptor_path(descriptor)}/status"
+        self.zk.nodes[path] = [b"theirs", self.zk.nodes[path][1] + 1]
+
+        descriptor.status = "ours"
+        with self.assertRaises(BadVersionError):
+            self.manager.register_descriptor(descriptor)
+        self.assertEqual(self.zk.nodes[path][0], b"theirs")
+        # registering again is a decision to overwrite
+        self.manager.register_descriptor(descriptor)
+        self.assertEqual(self.zk.nodes[path][0], b"ours")
+
+    def test_deleted_directories_are_recreated(self) -> None:
+        BGODescriptor.create(self.manager, 1, "in", "out")
+        self.manager.delete("/job", recursive=True)
+        BGODescriptor.create(self.manager, 2, "in", "out")
+        # deleted by another process, or while the session was lost
+        self.zk.delete("/job", recursive=True)
+        BGODescriptor.create(self.manager, 3, "in", "out")
+        self.zk.delete("/job", recursive=True)
+        for listener in self.zk.listeners:
+            listener(KazooState.LOST)
+        self.assertEqual(self.manager.known_directories, set())
+        descriptor = BGODescriptor.create(self.manager, 4, "in", "out")
+        self.assertIn(self.manager.get_descriptor_path(descriptor), self.zk.nodes)
+
+    def test_compact_descriptors(self) -> None:
+        manager = ZookeeperStateManager(None, client=self.zk, compact_descriptors=True)
+        descriptor = BGODescriptor.create(manager, 7, "in", "out")
+        path = manager.get_descriptor_path(descriptor)
+        self.assertEqual([node for node in self.zk.nodes if node.startswith(path)], [path])
+        self.assertEqual(dict(manager.read_descriptor(path)), {"ID": 7, "input_path": "in", "output_path": "out"})
+
+        plain = BGODescriptor.create(self.manager, 7, "in", "out")
+        self.assertEqual(self.manager.read_descriptor(self.manager.get_descriptor_path(plain)),
+                         {"ID": "7", "input_path": "in", "output_path": "out"})
+
+    def test_compact_listeners_on_nested_values(self) -> None:
+        manager = ZookeeperStateManager(None, client=self.zk, compact_descriptors=True, listener_debounce=0.0)
+        descriptor = StatusDescriptor({"state": "running", "machine": {"cpu_cores": 4}})
+        manager.register_descriptors([descriptor])
+        callback = RecordingCallback("status")
+        manager.register_descriptor_listener(DescriptorListener(descriptor, callback))
+        self.assertTrue(callback.called.wait(5))
+        manager.dispatcher.close()
+        # as the key node of a plain descriptor would hold it
+        self.assertEqual(callback.values, [b'{"state": "running", "machine": {"cpu_cores": 4}}'])
+
+    def test_codec_round_trip(self) -> None:
+        values = {"ID": -300, "ratio": 0.5, "name": "bfs \u00e9", "blob": b"\x00\x01", "flags": [True, False, None],
+                  "machine": {"cpu_cores": 16, "nested": {"deep": "value"}}, "empty": {}}
+        view = descriptor_codec.decode(descriptor_codec.encode(values))
+        self.assertEqual(view["machine"]["nested"]["deep"], "value")
+        self.assertEqual(view.to_dict(), values)
+        self.assertEqual(list(view), list(values))
+        with self.assertRaises(ValueError):
+            descriptor_codec.decode(b"plain text")
+
+    def test_mirrored_reads_are_served_from_memory(self) -> None:
+        self.zk.ensure_path("/taskmanagers/1")
+        self.zk.nodes["/taskmanagers/1"][0] = b"tm"
+        cache = SnapshotTreeCache(self.zk)
+        self.manager.mirrors["/taskmanagers"] = TreeMirror(self.zk, "/taskmanagers", cache).start()
+
+        self.zk.round_trips = 0
+        self.assertEqual(self.manager.get_children("/taskmanagers"), ["1"])
+        self.assertEqual(self.manager.get("/taskmanagers/1")[0], b"tm")
+        self.assertEqual(self.zk.round_trips, 0)
+
+        # nodes that have not reached the mirror yet are read from the ensemble
+        self.zk.ensure_path("/taskmanagers/2")
+        self.zk.round_trips = 0
+        self.assertIsNotNone(self.manager.exists("/taskmanagers/2"))
+        self.assertEqual(self.zk.round_trips, 1)
+
+        cache.emit(TreeEvent.CONNECTION_SUSPENDED)
+        stats = self.manager.get_mirror_stats()["/taskmanagers"]
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
+        self.assertEqual(stats["events"]["connection_suspended"], 1)
+        self.assertGreaterEqual(stats["staleness"], 0.0)
+        self.assertTrue(stats["initialized"])
+
+    def test_listeners_fire_on_coalesced_changes(self) -> None:
+        self.manager.listener_debounce = 0.2
+        descriptor = BGODescriptor.create(self.manager, 1, "in", "out")
+        path = f"{self.manager.get_descriptor_path(descriptor)}/output_path"
+        callback = RecordingCallback("output_path")
+        listener = descriptor.register_listener(DescriptorListener(descriptor, callback))
+
+        for value in (b"a", b"b", b"c"):
+            transaction = self.zk.transaction()
+            transaction.set_data(path, value)
+            transaction.commit()
+        self.assertTrue(callback.called.wait(5))
+        time.sleep(0.3)
+        # the initial value and the burst of updates arrive within one debounce window
+        self.assertEqual(callback.values, [b"c"])
+        self.assertEqual(self.manager.dispatcher.get_stats()["coalesced"], 3)
+
+        self.manager.unregister_descriptor_listener(listener)
+        self.zk.fire(path)
+        self.assertEqual(self.zk.data_watches[path], [])
+
+    def test_dispatcher_serializes_callbacks_per_key(self) -> None:
+        dispatcher = WatchDispatcher(max_workers=4, debounce=0.0)
+        running = {"a": 0, "b": 0}
+        overlaps = []
+        calls = []
+
+        def callback(key, value):
+            running[key] += 1
+            overlaps.append(running[key] > 1)
+            time.sleep(0.01)
+            calls.append((key, value))
+            running[key] -= 1
+
+        for value in range(20):
+            for key in ("a", "b"):
+                dispatcher.submit(key, callback, key, value)
+        deadline = time.time() + 5
+        while dispatcher.get_stats()["pending"] or dispatcher.get_stats()["running"]:
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.01)
+        dispatcher.close()
+
+        self.assertFalse(any(overlaps))
+        for key in ("a", "b"):
+            # later events replace pending ones, the last one is always delivered
+            values = [value for k, value in calls if k == key]
+            self.assertEqual(values, sorted(values))
+            self.assertEqual(values[-1], 19)
+
+    def test_dispatcher_survives_events_during_callbacks(self) -> None:
+        dispatcher = WatchDispatcher(max_workers=2, debounce=0.2)
+        started, release, done = threading.Event(), threading.Event(), threading.Semaphore(0)
+        calls = []
+
+        def callback(value):
+            started.set()
+            if value == 1:
+                release.wait(5)
+            calls.append(value)
+            done.release()
+
+        dispatcher.submit("a", callback, 1)
+        self.assertTrue(started.wait(5))
+        # its deadline is still scheduled when the event is dispatched after the running callback
+        dispatcher.submit("a", callback, 2)
+        release.set()
+        for _ in range(2):
+            self.assertTrue(done.acquire(timeout=5))
+        time.sleep(0.3)
+
+        dispatcher.submit("a", callback, 3)
+        self.assertTrue(done.acquire(timeout=5))
+        self.assertEqual(calls, [1, 2, 3])
+        self.assertTrue(dispatcher.thread.is_alive())
+        dispatcher.close()
+
+    def test_walk_and_get_many(self) -> None:
+        for path in ("/taskmanagers/1", "/taskmanagers/2", "/environment/machines"):
+            self.zk.ensure_path(path)
+        self.zk.nodes["/environment/machines"][0] = b"{}"
+
+        tree = self.manager.walk("/")
+        self.assertEqual(list(tree)[:3], ["/", "/environment", "/taskmanagers"])
+        self.assertEqual(tree["/taskmanagers"][2], ["1", "2"])
+        self.assertEqual(tree["/environment/machines"][0], b"{}")
+        self.assertEqual(len(tree), 6)
+
+        nodes = self.manager.get_many(["/taskmanagers/2", "/taskmanagers/3"])
+        self.assertEqual(list(nodes), ["/taskmanagers/2", "/taskmanagers/3"])
+        self.assertEqual(nodes["/taskmanagers/2"][0], b"")
+        self.assertIsNone(nodes["/taskmanagers/3"])
+
+    def test_frozen_descriptors(self) -> None:
+        frozen = FrozenBGODescriptor(1, "in", "out")
+        mutable = BGODescriptor(1, "in", "out")
+        self.assertEqual(frozen.get_id(), mutable.get_id())
+        self.assertFalse(hasattr(frozen, "__dict__"))
+        with self.assertRaises(FrozenInstanceError):
+            frozen.output_path = "moved"
+        self.assertEqual(descriptor_codec.decode(frozen.to_compact()).to_dict(), frozen.to_dict())
+
+        self.manager.register_descriptors([frozen, FrozenBGODescriptor(2, "in", "out")])
+        path = self.manager.get_descriptor_path(frozen)
+        self.assertEqual(path, self.manager.get_descriptor_path(mutable))
+        self.assertEqual(self.manager.read_descriptor(path)["output_path"], "out")
+
+        # a node added by someone else makes the batched delete fail, it falls back to a recursive delete
+        self.zk.ensure_path(f"{path}/status")
+        self.manager.unregister_descriptors([frozen, FrozenBGODescriptor(2, "in", "out")])
+        self.assertEqual([node for node in self.zk.nodes if node.startswith("/job/BGODescriptor/")], [])
+
+    def test_descriptor_benchmark(self) -> None:
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            descriptor_benchmark.main(["--count", "100"])
+        self.assertIn("frozen", output.getvalue())
+
+    def test_large_payloads_are_offloaded(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            store = DataManager(directory, pafs.LocalFileSystem())
+            manager = ZookeeperStateManager(None, client=self.zk, blob_store=store, offload_threshold=16)
+            # blobs are written without holding the lock of the manager
+            put_blob, locked = store.put_blob, []
+            store.put_blob = lambda value: locked.append(manager.lock.locked()) or put_blob(value)
+            descriptor = BGODescriptor.create(manager, 1, "in", "x" * 100)
+            self.assertEqual([False], locked)
+            path = manager.get_descriptor_path(descriptor)
+            pointer = self.zk.nodes[f"{path}/output_path"][0]
+            self.assertTrue(pointer.startswith(ZookeeperStateManager.BLOB_POINTER))
+            self.assertEqual(self.zk.nodes[f"{path}/input_path"][0], b"in")
+            self.assertEqual(manager.read_descriptor(path)["output_path"], "x" * 100)
+
+            # another reader loads the blob once, then serves it from its cache
+            reader = ZookeeperStateManager(None, client=self.zk, blob_store=store)
+            for _ in range(2):
+                self.assertEqual(reader.get_many([f"{path}/output_path"])[f"{path}/output_path"][0], b"x" * 100)
+            self.assertEqual(reader.get_blob_stats()["misses"], 1)
+            self.assertEqual(reader.get_blob_stats()["hits"], 1)
+
+            with self.assertRaises(ValueError):
+                self.manager.get(f"{path}/output_path")